@@ -8,15 +8,22 @@ if not exist dist\lambda mkdir dist\lambda
 
 REM Package Image Uploader
 echo Packaging image_uploader...
-powershell Compress-Archive -Path src\lambda\image_uploader.py -DestinationPath dist\lambda\image_uploader.zip -Force
+powershell Compress-Archive -Path src\lambda\image_uploader.py,src\lambda\aws_clients.py,src\lambda\image_normalizer.py,src\lambda\status_transitions.py,src\lambda\metrics.py -DestinationPath dist\lambda\image_uploader.zip -Force
 
 REM Package Profanity Filter
 echo Packaging profanity_filter...
-powershell Compress-Archive -Path src\lambda\profanity_filter.py -DestinationPath dist\lambda\profanity_filter.zip -Force
+powershell Compress-Archive -Path src\lambda\profanity_filter.py,src\lambda\aws_clients.py,src\lambda\profanity_matcher.py,src\lambda\verdict_cache.py,src\lambda\image_normalizer.py,src\lambda\status_transitions.py,src\lambda\notification_batcher.py,src\lambda\metrics.py,src\lambda\content_prescreen.py,src\lambda\moderation_rules.py,src\lambda\label_classifier.py -DestinationPath dist\lambda\profanity_filter.zip -Force
 
 REM Package Image Retrieval
 echo Packaging image_retrieval...
-powershell Compress-Archive -Path src\lambda\image_retrieval.py -DestinationPath dist\lambda\image_retrieval.zip -Force
+REM url_signer needs cryptography for the signed CloudFront modes (wheel for the Lambda runtime)
+if exist build\image_retrieval rmdir /s /q build\image_retrieval
+pip install --quiet --target build\image_retrieval --platform manylinux2014_x86_64 --implementation cp --python-version 3.12 --only-binary=:all: cryptography
+copy /y src\lambda\image_retrieval.py build\image_retrieval\ >nul
+copy /y src\lambda\aws_clients.py build\image_retrieval\ >nul
+copy /y src\lambda\url_signer.py build\image_retrieval\ >nul
+copy /y src\lambda\metrics.py build\image_retrieval\ >nul
+powershell Compress-Archive -Path build\image_retrieval\* -DestinationPath dist\lambda\image_retrieval.zip -Force
 
 echo.
 echo Packaging complete! Files in dist\lambda\
@@ -0,0 +1,119 @@
+"""
+Benchmark: tiempo hasta tener todas las URLs de subida, una petición por archivo vs. subida múltiple
+- per-file: una petición a GenerateUploadUrl por archivo (PutItem en cada una), en serie y con 6 en paralelo (navegador)
+- bulk: una sola petición con 'files' (URLs firmadas localmente + batch_writer)
+El handler corre en proceso contra un endpoint local tipo DynamoDB con latencia de servicio;
+el viaje de ida y vuelta cliente -> API Gateway -> Lambda se modela con un sleep por petición
+Uso: python scripts/bench_bulk_upload_url.py
+"""
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('RAW_BUCKET', 'bench-raw')
+os.environ.setdefault('METADATA_TABLE', 'bench-metadata')
+
+FILE_COUNTS = (1, 10, 50)
+API_ROUND_TRIP_MS = 60  # red del cliente + API Gateway + invocación de Lambda (caliente)
+SERVICE_MS = 5  # latencia de DynamoDB por llamada
+BROWSER_CONCURRENCY = 6  # conexiones HTTP/1.1 por host del navegador
+RUNS = 3
+
+
+class FakeDynamoDB(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    calls = {}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        operation = self.headers.get('X-Amz-Target', '').split('.')[-1]
+        with FakeDynamoDB.lock:
+            FakeDynamoDB.calls[operation] = FakeDynamoDB.calls.get(operation, 0) + 1
+        time.sleep(SERVICE_MS / 1000)
+        body = json.dumps({'UnprocessedItems': {}} if operation == 'BatchWriteItem' else {}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-amz-json-1.0')
+        self.send_header('x-amzn-RequestId', 'bench')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def invoke(handler, body):
+    """
+    Una petición del cliente: round trip modelado + ejecución real del handler
+    """
+    time.sleep(API_ROUND_TRIP_MS / 1000)
+    result = handler({
+        'body': json.dumps(body),
+        'requestContext': {'authorizer': {'claims': {'sub': 'bench-user'}}}
+    }, None)
+    assert result['statusCode'] == 200, result['body']
+    return json.loads(result['body'])
+
+
+def per_file(handler, files, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        uploads = list(executor.map(lambda file_spec: invoke(handler, file_spec), files))
+    return len(uploads)
+
+
+def bulk(handler, files, concurrency):
+    return len(invoke(handler, {'files': files, 'game_title': 'Bench'})['uploads'])
+
+
+def measure(flow, handler, files, concurrency=1):
+    FakeDynamoDB.calls = {}
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        assert flow(handler, files, concurrency) == len(files)
+        timings.append(time.perf_counter() - started)
+    calls = sum(FakeDynamoDB.calls.values()) // RUNS
+    return statistics.median(timings), calls
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDynamoDB)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    import generate_upload_url
+
+    handler = generate_upload_url.lambda_handler
+    invoke(handler, {'filename': 'warmup.png'})  # crear clientes y conexiones fuera de la medición
+
+    flows = [
+        ('per-file serial', per_file, 1),
+        (f'per-file x{BROWSER_CONCURRENCY}', per_file, BROWSER_CONCURRENCY),
+        ('bulk', bulk, 1),
+    ]
+    print(f"API round trip {API_ROUND_TRIP_MS}ms, DynamoDB {SERVICE_MS}ms per call, median of {RUNS}")
+    print(f"{'files':>5} {'flow':<16} {'total (ms)':>11} {'requests':>9} {'DynamoDB calls':>15}")
+    for count in FILE_COUNTS:
+        files = [{'filename': f'shot-{i}.png', 'content_type': 'image/png'} for i in range(count)]
+        for name, flow, concurrency in flows:
+            elapsed, calls = measure(flow, handler, files, concurrency)
+            requests = 1 if flow is bulk else count
+            print(f"{count:>5} {name:<16} {elapsed * 1000:>11.0f} {requests:>9} {calls:>15}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: clientes boto3 por defecto vs. aws_clients (pool, reintentos adaptativos, keep-alive, Table cacheado)
+- cold: importar boto3 y crear los clientes de profanity_filter en un proceso nuevo
+- warm: GetItem concurrentes contra un endpoint local tipo DynamoDB (cuenta conexiones TCP nuevas)
+- table: resolver dynamodb.Table(...) por registro vs. el objeto cacheado
+Cada conexión TCP nueva contra AWS implica además un handshake TLS (no medido aquí)
+Uso: python scripts/bench_client_config.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda')
+sys.path.insert(0, LAMBDA_DIR)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+REQUESTS = 600
+CONCURRENCY = 32  # BATCH_MAX_WORKERS x llamadas en paralelo por registro
+SERVICE_MS = 5
+COLD_RUNS = 5
+
+COLD_DEFAULT = """
+import time; started = time.perf_counter()
+import boto3
+boto3.client('s3'); boto3.client('rekognition'); boto3.client('sns')
+boto3.resource('dynamodb').Table('metadata')
+print(time.perf_counter() - started)
+"""
+
+COLD_FACTORY = """
+import sys, time; sys.path.insert(0, %r); started = time.perf_counter()
+import aws_clients
+aws_clients.client('s3'); aws_clients.client('rekognition'); aws_clients.client('sns')
+aws_clients.table('metadata')
+print(time.perf_counter() - started)
+""" % LAMBDA_DIR
+
+
+class FakeDynamoDB(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with FakeDynamoDB.lock:
+            FakeDynamoDB.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(SERVICE_MS / 1000)
+        body = json.dumps({'Item': {'screenshot_id': {'S': 'bench'}, 'status': {'S': 'APPROVED'}}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-amz-json-1.0')
+        self.send_header('x-amzn-RequestId', 'bench')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def cold(script):
+    runs = []
+    for _ in range(COLD_RUNS):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        runs.append(float(output.stdout.strip()))
+    return statistics.median(runs)
+
+
+def warm(client):
+    FakeDynamoDB.connections = 0
+    latencies = []
+
+    def call(_):
+        started = time.perf_counter()
+        client.get_item(TableName='metadata', Key={'screenshot_id': {'S': 'bench'}})
+        latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        list(executor.map(call, range(CONCURRENCY * 4)))  # calentar el pool
+        FakeDynamoDB.connections = 0
+        latencies.clear()
+        started = time.perf_counter()
+        list(executor.map(call, range(REQUESTS)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], FakeDynamoDB.connections
+
+
+def main():
+    import logging
+    import boto3
+    import aws_clients
+
+    # urllib3 avisa por cada conexión descartada cuando el pool se llena
+    logging.getLogger('urllib3.connectionpool').setLevel(logging.ERROR)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDynamoDB)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"cold start (median of {COLD_RUNS}): default {cold(COLD_DEFAULT) * 1000:.0f}ms, aws_clients {cold(COLD_FACTORY) * 1000:.0f}ms")
+
+    print(f"\n{REQUESTS} GetItem, concurrency {CONCURRENCY}, {SERVICE_MS}ms service time")
+    print(f"{'client':<12} {'total (ms)':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} {'new conns':>10}")
+    clients = [
+        ('default', boto3.client('dynamodb', endpoint_url=endpoint)),
+        ('aws_clients', boto3.client('dynamodb', endpoint_url=endpoint, config=aws_clients.build_config('dynamodb')))
+    ]
+    for name, client in clients:
+        elapsed, p50, p99, connections = warm(client)
+        print(f"{name:<12} {elapsed * 1000:>11.0f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {connections:>10}")
+
+    dynamodb = boto3.resource('dynamodb')
+    per_record = min(timeit.repeat(lambda: dynamodb.Table('metadata'), number=200, repeat=3)) / 200
+    cached = min(timeit.repeat(lambda: aws_clients.table('metadata'), number=200, repeat=3)) / 200
+    print(f"\nTable lookup per record: dynamodb.Table() {per_record * 1e6:.0f}us, aws_clients.table() {cached * 1e6:.2f}us")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
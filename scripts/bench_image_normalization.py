@@ -0,0 +1,104 @@
+"""
+Benchmark: tamaño del payload enviado a Rekognition y latencia con/sin image_normalizer
+Usa screenshots sintéticos (degradado + figuras + zona de ruido) en varias resoluciones y formatos
+La latencia de Rekognition se modela como latencia base + transferencia del payload (3 llamadas en paralelo)
+Uso: python scripts/bench_image_normalization.py [MBPS]
+"""
+import io
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+import image_normalizer  # noqa: E402
+
+MB = 1024 * 1024
+REPEAT = 3
+# Modelo de Rekognition: latencia fija por llamada + subida del payload
+REKOGNITION_BASE_MS = 150
+UPLOAD_MBPS = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+
+CASES = [
+    ('1080p png', (1920, 1080), 'PNG'),
+    ('1440p png', (2560, 1440), 'PNG'),
+    ('4k png', (3840, 2160), 'PNG'),
+    ('4k jpeg', (3840, 2160), 'JPEG'),
+    ('1080p webp', (1920, 1080), 'WEBP'),
+]
+
+
+def synthetic_screenshot(size, rng):
+    """
+    Imagen parecida a un screenshot: fondo en degradado, HUD con figuras y una zona con textura
+    """
+    width, height = size
+    gradient = Image.linear_gradient('L').resize(size)
+    img = Image.merge('RGB', (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT), gradient.rotate(90).resize(size)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(200):
+        x, y = rng.randrange(width), rng.randrange(height)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle([x, y, x + rng.randrange(20, 300), y + rng.randrange(10, 80)], fill=color)
+    for line in range(20):
+        draw.text((40, 40 + line * 30), f"SCORE {rng.randrange(100000):06d}  HP {rng.randrange(100)}", fill=(255, 255, 255))
+    # Textura (vegetación, partículas): la parte que no comprime en PNG
+    noise = Image.frombytes('RGB', (width // 2, height // 2), rng.randbytes(width // 2 * (height // 2) * 3))
+    img.paste(noise, (width // 4, height // 2))
+    return img
+
+
+def encode(img, image_format):
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, quality=92)
+    return buffer.getvalue()
+
+
+def modeled_rekognition_ms(payload_bytes, image_format):
+    """
+    Retorna: ms de las 3 llamadas en paralelo, o None si Rekognition rechazaría la imagen
+    """
+    if image_format not in image_normalizer.REKOGNITION_FORMATS or payload_bytes > image_normalizer.REKOGNITION_MAX_BYTES:
+        return None
+    return REKOGNITION_BASE_MS + payload_bytes * 8 / (UPLOAD_MBPS * 1e6) * 1000
+
+
+def fmt_ms(value):
+    return f"{value:>10.0f}" if value is not None else f"{'rejected':>10}"
+
+
+def main():
+    rng = random.Random(11)
+    print(f"Rekognition model: {REKOGNITION_BASE_MS}ms + payload at {UPLOAD_MBPS:.0f}Mbps; limit {image_normalizer.REKOGNITION_MAX_BYTES / MB:.0f}MB JPEG/PNG")
+    print(f"{'image':<12} {'raw (MB)':>9} {'sent (MB)':>10} {'norm (ms)':>10} {'before (ms)':>12} {'after (ms)':>11}")
+
+    for name, size, image_format in CASES:
+        image_bytes = encode(synthetic_screenshot(size, rng), image_format)
+
+        normalize_s = min(timeit.repeat(lambda: image_normalizer.normalize_for_analysis(image_bytes), number=1, repeat=REPEAT))
+        normalized, info = image_normalizer.normalize_for_analysis(image_bytes)
+
+        before = modeled_rekognition_ms(len(image_bytes), info['format'])
+        sent_format = info['format'] if normalized is image_bytes else 'jpeg'
+        rekognition_after = modeled_rekognition_ms(len(normalized), sent_format)
+        after = normalize_s * 1000 + rekognition_after
+
+        print(f"{name:<12} {len(image_bytes) / MB:>9.2f} {len(normalized) / MB:>10.2f} {normalize_s * 1000:>10.1f} {fmt_ms(before):>12} {after:>11.0f}")
+
+    # Archivos inválidos: se rechazan sin ninguna llamada a Rekognition
+    truncated = encode(synthetic_screenshot((1920, 1080), rng), 'PNG')[:200000]
+    for name, data in (('truncated', truncated), ('not image', b'%PDF-1.7' + bytes(5000))):
+        started = timeit.default_timer()
+        try:
+            image_normalizer.normalize_for_analysis(data)
+            outcome = 'accepted'
+        except image_normalizer.InvalidImageError as e:
+            outcome = f"rejected ({e})"
+        print(f"{name:<12} {(timeit.default_timer() - started) * 1000:>8.1f}ms  {outcome[:70]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: tiempo de import (cold start) de cada handler con python -X importtime
+Compara el arranque lazy por defecto con PRIME_ON_INIT=true (clientes creados en el init, como antes)
+Con --check falla (exit 1) si el modo lazy de algún handler no es claramente más rápido que el primed
+medido en la misma ejecución: se ejecuta en el buildspec. Los ms absolutos dependen de la máquina de build
+y solo se informan
+Uso: python scripts/bench_import_time.py [--check]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LAMBDA_DIR = os.path.join(ROOT, 'src', 'lambda')
+SRC_DIR = os.path.join(ROOT, 'src')
+
+RUNS = 5
+
+HANDLERS = ['image_uploader', 'profanity_filter', 'image_retrieval', 'generate_upload_url', 'confirm_upload', 'index']
+
+# lazy / primed máximo: en local el modo lazy tarda ~0.5x del primed; volver a crear clientes en el import
+# deja ambos modos casi iguales (~1.0x) y lo detecta en cualquier máquina
+MAX_LAZY_RATIO = float(os.environ.get('IMPORT_MAX_LAZY_RATIO', '0.8'))
+
+HANDLER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'RAW_BUCKET': 'bench-raw',
+    'PROCESSED_BUCKET': 'bench-processed',
+    'METADATA_TABLE': 'bench-metadata',
+    'VERDICT_CACHE_TABLE': 'bench-verdicts',
+    'MODERATION_RULES_BUCKET': 'bench-rules',
+    'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:123456789012:bench-filter',
+    'NOTIFICATION_TOPIC_ARN': 'arn:aws:sns:us-east-1:123456789012:bench-notify',
+    'PAGINATION_SECRET': 'bench',
+}
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def import_profile(handler, prime):
+    """
+    Importa el handler en un proceso nuevo
+    Retorna: (ms acumulados del handler, [(ms propios, módulo)] de los imports más pesados)
+    """
+    env = dict(os.environ, **HANDLER_ENV, PRIME_ON_INIT='true' if prime else 'false')
+    env['PYTHONPATH'] = os.pathsep.join([LAMBDA_DIR, SRC_DIR])
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {handler}'],
+        capture_output=True, text=True, env=env, check=True
+    )
+
+    total = None
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append((int(self_us) / 1000, name))
+        if name == handler and not indent.strip(' '):
+            total = int(cumulative_us) / 1000
+    modules.sort(reverse=True)
+    return total, modules[:3]
+
+
+def median_profile(handler, prime):
+    profiles = [import_profile(handler, prime) for _ in range(RUNS)]
+    totals = [total for total, _ in profiles]
+    return statistics.median(totals), profiles[0][1]
+
+
+def main():
+    check = '--check' in sys.argv
+    not_lazy = []
+
+    print(f"{'handler':<20} {'lazy (ms)':>10} {'primed (ms)':>12} {'ratio':>7}   heaviest imports (lazy, self ms)")
+    for handler in HANDLERS:
+        lazy, heaviest = median_profile(handler, prime=False)
+        primed, _ = median_profile(handler, prime=True)
+        ratio = lazy / primed if primed else 1.0
+        heaviest_text = ', '.join(f"{name} {ms:.0f}" for ms, name in heaviest)
+        flag = '' if ratio <= MAX_LAZY_RATIO else '  NOT LAZY'
+        print(f"{handler:<20} {lazy:>10.0f} {primed:>12.0f} {ratio:>7.2f}   {heaviest_text}{flag}")
+        if ratio > MAX_LAZY_RATIO:
+            not_lazy.append(handler)
+
+    if check and not_lazy:
+        print(f"Lazy import slower than {MAX_LAZY_RATIO:.2f}x primed: {', '.join(not_lazy)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
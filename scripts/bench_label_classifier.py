@@ -0,0 +1,143 @@
+"""
+Micro-benchmark: LabelClassifier (índices exacto y de tokens) vs. los bucles anidados de verify_is_video_game
+Usa respuestas de DetectLabels guardadas: por defecto scripts/label_payloads/detect_labels.json (muestras
+con el formato de DetectLabels v3, con Parents y Categories); con --payloads, respuestas grabadas de producción
+en el mismo formato ({'name', 'response'}) o una lista de respuestas de DetectLabels
+Además de los tiempos imprime la decisión de ambos algoritmos por payload y el desglose de puntuación
+Uso: python scripts/bench_label_classifier.py [--payloads respuestas.json] [--rules reglas.json]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+import moderation_rules  # noqa: E402
+from label_classifier import describe  # noqa: E402
+
+DEFAULT_PAYLOADS = os.path.join(os.path.dirname(__file__), 'label_payloads', 'detect_labels.json')
+MAX_LABELS = 50
+# Indicadores añadidos a las reglas para ver cómo escala cada algoritmo
+EXTRA_INDICATORS = [0, 200, 1000]
+REPEAT = 5
+NUMBER = 200
+
+
+def load_payloads(path):
+    with open(path, encoding='utf-8') as payloads_file:
+        payloads = json.load(payloads_file)
+    if isinstance(payloads, dict):
+        payloads = [payloads]
+    return [
+        (payload.get('name', f"payload-{index}"), payload.get('response', payload).get('Labels', []))
+        for index, payload in enumerate(payloads)
+    ]
+
+
+def nested_loops(rules, labels):
+    """
+    Réplica del algoritmo anterior de verify_is_video_game (sin los print por coincidencia)
+    """
+    game_confidence = 0.0
+    real_photo_confidence = 0.0
+    for label in labels:
+        label_name = label['Name'].lower()
+        confidence = label['Confidence']
+        for indicator in rules.video_game_indicators:
+            if indicator in label_name:
+                game_confidence = max(game_confidence, confidence)
+        for indicator in rules.real_photo_indicators:
+            if indicator in label_name:
+                real_photo_confidence = max(real_photo_confidence, confidence)
+    return game_confidence, real_photo_confidence
+
+
+def decide(rules, game_confidence, real_photo_confidence):
+    thresholds = rules.thresholds
+    if real_photo_confidence > thresholds['real_photo_confidence'] and game_confidence < thresholds['game_confidence']:
+        return 'photo'
+    if game_confidence >= thresholds['game_confidence']:
+        return 'game'
+    return 'unclear'
+
+
+def padded(labels, pool):
+    """
+    Completa hasta MAX_LABELS con etiquetas de otros payloads (el peor caso de DetectLabels)
+    """
+    extra = [label for label in pool if label not in labels]
+    return (labels + extra * MAX_LABELS)[:MAX_LABELS]
+
+
+def with_extra_indicators(rules, count, rng):
+    """
+    Copia de las reglas con count indicadores aleatorios más (repartidos entre ambos lados)
+    """
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))) for _ in range(count)]
+    document = dict(moderation_rules.BUILTIN_RULES)
+    document['version'] = f"{rules.version}-plus{count}"
+    document['profanity'] = {'words': list(rules.profanity_words)}
+    document['video_game_indicators'] = list(rules.video_game_indicators) + words[:count // 2]
+    document['real_photo_indicators'] = list(rules.real_photo_indicators) + words[count // 2:]
+    document['thresholds'] = dict(rules.thresholds)
+    document['label_weights'] = dict(rules.label_classifier.weights)
+    return moderation_rules.RuleSet(document)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--payloads', default=DEFAULT_PAYLOADS)
+    parser.add_argument('--rules', help='documento de reglas (por defecto, las integradas)')
+    args = parser.parse_args()
+
+    if args.rules:
+        with open(args.rules, encoding='utf-8') as rules_file:
+            rules = moderation_rules.RuleSet(json.load(rules_file))
+    else:
+        rules = moderation_rules.RuleSet(moderation_rules.BUILTIN_RULES)
+    classifier = rules.label_classifier
+    payloads = load_payloads(args.payloads)
+    pool = [label for _, labels in payloads for label in labels]
+
+    print(f"{'payload':<24} {'old':>8} {'new':>8}  breakdown")
+    changed = 0
+    for name, labels in payloads:
+        old = decide(rules, *nested_loops(rules, labels))
+        label_score = classifier.score(labels)
+        new = decide(rules, label_score.game, label_score.real_photo)
+        changed += old != new
+        print(f"{name:<24} {old:>8} {new:>8}  {describe(label_score)}")
+    print(f"Decisions changed: {changed}/{len(payloads)}")
+
+    # Tiempo por imagen; el algoritmo anterior además hacía un print por coincidencia (no incluido)
+    rng = random.Random(42)
+    print()
+    print(f"{'indicators':>10} {'labels':>8} {'loops (us)':>12} {'indexed (us)':>14} {'speedup':>9}")
+    for extra in EXTRA_INDICATORS:
+        bench_rules = with_extra_indicators(rules, extra, rng) if extra else rules
+        bench_classifier = bench_rules.label_classifier
+        indicator_count = len(bench_rules.video_game_indicators) + len(bench_rules.real_photo_indicators)
+
+        for label_count in ('recorded', MAX_LABELS):
+            batches = [labels if label_count == 'recorded' else padded(labels, pool) for _, labels in payloads]
+
+            def run_loops():
+                for labels in batches:
+                    nested_loops(bench_rules, labels)
+
+            def run_indexed():
+                for labels in batches:
+                    bench_classifier.score(labels)
+
+            loops = min(timeit.repeat(run_loops, number=NUMBER, repeat=REPEAT)) / NUMBER / len(batches)
+            indexed = min(timeit.repeat(run_indexed, number=NUMBER, repeat=REPEAT)) / NUMBER / len(batches)
+            print(f"{indicator_count:>10} {label_count:>8} {loops * 1e6:>12.1f} {indexed * 1e6:>14.1f} "
+                  f"{loops / indexed:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+"""
+Benchmark: carga de punta a punta del flujo subida -> confirmación -> filtro -> galería, sin desplegar los stacks
+Los cinco handlers corren en proceso contra moto (S3, DynamoDB con GSI, SNS -> SQS) y un Rekognition falso
+con latencia configurable. Por fases, con concurrencia:
+- upload: cada usuario pide sus URLs (subida múltiple), sube los archivos y S3 dispara ConfirmUpload;
+  una parte de las capturas usa ImageUploader (base64)
+- moderate: consumidores de la cola del Filter Topic invocan ProfanityFilter con lotes de hasta 10 mensajes
+- gallery: lecturas concurrentes de la galería de cada usuario (ImageRetrieval)
+Reporta p50/p95/p99 por handler, llamadas a AWS por captura y memoria pico por invocación (tracemalloc)
+Con --check falla (exit 1) si las llamadas a AWS por captura o la memoria pico superan su presupuesto
+(se ejecuta en el buildspec); la latencia depende de la máquina y solo se informa
+Uso: python scripts/bench_pipeline_load.py [--users N] [--files N] [--concurrency N] [--rekognition-ms MS] [--check]
+(requiere moto)
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import statistics
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+REGION = 'us-east-1'
+ACCOUNT = '123456789012'
+os.environ.update({
+    'AWS_DEFAULT_REGION': REGION,
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'RAW_BUCKET': 'bench-raw',
+    'PROCESSED_BUCKET': 'bench-processed',
+    'METADATA_TABLE': 'bench-metadata',
+    'SNS_TOPIC_ARN': f'arn:aws:sns:{REGION}:{ACCOUNT}:bench-filter',
+    'NOTIFICATION_TOPIC_ARN': f'arn:aws:sns:{REGION}:{ACCOUNT}:bench-notify',
+    'PAGINATION_SECRET': 'bench',
+})
+os.environ.pop('VERDICT_CACHE_TABLE', None)
+os.environ.pop('CLOUDFRONT_DOMAIN', None)
+
+HANDLERS = ['generate_upload_url', 'confirm_upload', 'image_uploader', 'profanity_filter', 'image_retrieval']
+
+# Presupuestos de --check: solo números que no dependen de la velocidad de la máquina de build
+# (llamadas por captura y memoria pico medida con tracemalloc en una pasada secuencial)
+# Incluye un UpdateItem de gallery_version por item nuevo y por cambio de status (caché de image_retrieval)
+CALLS_PER_SCREENSHOT_BUDGET = 15
+PEAK_MEMORY_BUDGET_MB = {
+    'generate_upload_url': 2,
+    'confirm_upload': 2,
+    'image_uploader': 8,
+    'profanity_filter': 8,
+    'image_retrieval': 4,
+}
+
+class CallCounter:
+    """
+    Cuenta las llamadas de los clientes boto3 de los handlers (servicio.operación) con el evento before-call
+    Las presigned URLs no generan llamadas; el cliente del harness usa otra sesión y no se cuenta
+    """
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, event_name, **kwargs):
+        _, service, operation = event_name.split('.', 2)
+        with self._lock:
+            self.calls[f'{service}.{operation}'] += 1
+
+    def add(self, name, count=1):
+        with self._lock:
+            self.calls[name] += count
+
+
+class FakeRekognition:
+    """
+    Rekognition con latencia fija por llamada: aprueba las capturas (videojuego, sin moderación ni texto)
+    """
+    def __init__(self, latency_ms, counter):
+        self.latency = latency_ms / 1000
+        self.counter = counter
+
+    def _call(self, operation):
+        self.counter.add(f'rekognition.{operation}')
+        time.sleep(self.latency)
+
+    def detect_labels(self, Image, **kwargs):
+        self._call('DetectLabels')
+        return {'Labels': [{'Name': 'Video Game', 'Confidence': 95.0}]}
+
+    def detect_moderation_labels(self, Image, **kwargs):
+        self._call('DetectModerationLabels')
+        return {'ModerationLabels': []}
+
+    def detect_text(self, Image, **kwargs):
+        self._call('DetectText')
+        return {'TextDetections': []}
+
+
+def screenshot_png(seed, width, height):
+    """
+    PNG RGB con ruido (comprime poco, como una captura con texturas); sin Pillow
+    """
+    rng = random.Random(seed)
+    raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(raw, 1))
+        + chunk(b'IEND', b'')
+    )
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Harness:
+    def __init__(self, args, counter):
+        import boto3
+
+        self.args = args
+        self.counter = counter
+        self.latencies = defaultdict(list)
+        self._lock = threading.Lock()
+        # Cliente del "usuario" y del harness (otra sesión: sus llamadas no se cuentan)
+        session = boto3.session.Session(region_name=REGION)
+        self.s3 = session.client('s3')
+        self.sqs = session.client('sqs')
+        self.queue_url = None
+
+        import generate_upload_url
+        import confirm_upload
+        import image_uploader
+        import profanity_filter
+        import image_retrieval
+        self.handlers = {
+            'generate_upload_url': generate_upload_url.lambda_handler,
+            'confirm_upload': confirm_upload.lambda_handler,
+            'image_uploader': image_uploader.lambda_handler,
+            'profanity_filter': profanity_filter.lambda_handler,
+            'image_retrieval': image_retrieval.lambda_handler,
+        }
+        profanity_filter.rekognition_client = FakeRekognition(args.rekognition_ms, counter)
+
+    def create_resources(self):
+        session_s3 = self.s3
+        for bucket in (os.environ['RAW_BUCKET'], os.environ['PROCESSED_BUCKET']):
+            session_s3.create_bucket(Bucket=bucket)
+
+        import boto3
+        session = boto3.session.Session(region_name=REGION)
+        dynamodb = session.client('dynamodb')
+        dynamodb.create_table(
+            TableName=os.environ['METADATA_TABLE'],
+            KeySchema=[{'AttributeName': 'screenshot_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'screenshot_id', 'AttributeType': 'S'},
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'upload_timestamp', 'AttributeType': 'S'},
+                {'AttributeName': 'status', 'AttributeType': 'S'},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': name,
+                    'KeySchema': [
+                        {'AttributeName': hash_key, 'KeyType': 'HASH'},
+                        {'AttributeName': 'upload_timestamp', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+                for name, hash_key in (('UserIdIndex', 'user_id'), ('StatusIndex', 'status'))
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        # Filter Topic -> cola SQS (raw delivery) -> ProfanityFilter, como el event source mapping
+        sns = session.client('sns')
+        filter_topic = sns.create_topic(Name='bench-filter')['TopicArn']
+        sns.create_topic(Name='bench-notify')
+        self.queue_url = self.sqs.create_queue(QueueName='bench-filter-queue')['QueueUrl']
+        queue_arn = self.sqs.get_queue_attributes(
+            QueueUrl=self.queue_url, AttributeNames=['QueueArn']
+        )['Attributes']['QueueArn']
+        sns.subscribe(
+            TopicArn=filter_topic, Protocol='sqs', Endpoint=queue_arn,
+            Attributes={'RawMessageDelivery': 'true'}
+        )
+
+    def invoke(self, name, event):
+        started = time.perf_counter()
+        result = self.handlers[name](event, None)
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.latencies[name].append(elapsed)
+        return result
+
+    @staticmethod
+    def api_event(user_id, body=None, query=None, path='/screenshots'):
+        return {
+            'body': json.dumps(body) if body is not None else None,
+            'queryStringParameters': query,
+            'path': path,
+            'requestContext': {'authorizer': {'claims': {'sub': user_id}}}
+        }
+
+    def upload_session(self, user_index):
+        """
+        Un usuario sube sus capturas: URLs en una petición, PUT de cada archivo y evento de S3 por objeto
+        Cada legacy_every captura se sube por ImageUploader
+        """
+        args = self.args
+        user_id = f'user-{user_index}'
+        images = [screenshot_png(user_index * 1000 + i, args.width, args.height) for i in range(args.files)]
+        legacy = [image for i, image in enumerate(images) if args.legacy_every and i % args.legacy_every == 0]
+        direct = [image for i, image in enumerate(images) if not (args.legacy_every and i % args.legacy_every == 0)]
+
+        for i, image in enumerate(legacy):
+            result = self.invoke('image_uploader', self.api_event(user_id, {
+                'filename': f'legacy-{i}.png',
+                'game_title': 'Bench',
+                'image': base64.b64encode(image).decode()
+            }))
+            assert result['statusCode'] == 200, result['body']
+
+        if not direct:
+            return
+        result = self.invoke('generate_upload_url', self.api_event(user_id, {
+            'game_title': 'Bench',
+            'files': [{'filename': f'shot-{i}.png', 'content_type': 'image/png'} for i in range(len(direct))]
+        }))
+        assert result['statusCode'] == 200, result['body']
+        for upload, image in zip(json.loads(result['body'])['uploads'], direct):
+            # PUT del cliente a la URL pre-firmada
+            self.s3.put_object(Bucket=os.environ['RAW_BUCKET'], Key=upload['s3_key'], Body=image, ContentType='image/png',
+                               ChecksumAlgorithm='SHA256')
+            self.invoke('confirm_upload', {'Records': [{
+                'eventName': 'ObjectCreated:Put',
+                's3': {'bucket': {'name': os.environ['RAW_BUCKET']}, 'object': {'key': upload['s3_key'], 'size': len(image)}}
+            }]})
+
+    def consume_filter_queue(self):
+        """
+        Un consumidor del event source mapping: lotes de hasta 10 mensajes hasta vaciar la cola
+        Retorna: mensajes procesados
+        """
+        processed = 0
+        while True:
+            messages = self.sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10).get('Messages', [])
+            if not messages:
+                return processed
+            event = {'Records': [
+                {'messageId': message['MessageId'], 'body': message['Body'], 'eventSource': 'aws:sqs'}
+                for message in messages
+            ]}
+            result = self.invoke('profanity_filter', event)
+            failed = {failure['itemIdentifier'] for failure in result.get('batchItemFailures', [])}
+            assert not failed, f'filter failures: {failed}'
+            self.sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=[
+                {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']} for i, message in enumerate(messages)
+            ])
+            processed += len(messages)
+
+    def read_gallery(self, user_index):
+        result = self.invoke('image_retrieval', self.api_event(f'user-{user_index}', query={'limit': '50'}))
+        assert result['statusCode'] == 200, result['body']
+        return json.loads(result['body'])['count']
+
+
+def run_phase(concurrency, function, items):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(function, items))
+    return time.perf_counter() - started, results
+
+
+def measure_memory(harness):
+    """
+    Memoria pico de una invocación de cada handler, en secuencia (tracemalloc no distingue hilos)
+    """
+    peaks = {}
+
+    def traced(name, event):
+        tracemalloc.start()
+        result = harness.handlers[name](event, None)
+        peaks[name] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        return result
+
+    args = harness.args
+    image = screenshot_png(999999, args.width, args.height)
+    user_id = 'user-memory'
+    traced('image_uploader', harness.api_event(user_id, {
+        'filename': 'memory.png', 'image': base64.b64encode(image).decode()
+    }))
+    result = traced('generate_upload_url', harness.api_event(user_id, {'files': [{'filename': 'memory.png'}]}))
+    s3_key = json.loads(result['body'])['uploads'][0]['s3_key']
+    harness.s3.put_object(Bucket=os.environ['RAW_BUCKET'], Key=s3_key, Body=image)
+    traced('confirm_upload', {'Records': [{
+        'eventName': 'ObjectCreated:Put',
+        's3': {'bucket': {'name': os.environ['RAW_BUCKET']}, 'object': {'key': s3_key, 'size': len(image)}}
+    }]})
+    messages = harness.sqs.receive_message(QueueUrl=harness.queue_url, MaxNumberOfMessages=10).get('Messages', [])
+    traced('profanity_filter', {'Records': [
+        {'messageId': message['MessageId'], 'body': message['Body'], 'eventSource': 'aws:sqs'}
+        for message in messages
+    ]})
+    traced('image_retrieval', harness.api_event(user_id, query={'limit': '50'}))
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--files', type=int, default=5, help='capturas por usuario')
+    parser.add_argument('--legacy-every', type=int, default=5, help='1 de cada N capturas por ImageUploader (0: ninguna)')
+    parser.add_argument('--concurrency', type=int, default=8, help='usuarios/lecturas en paralelo')
+    parser.add_argument('--consumers', type=int, default=4, help='invocaciones de ProfanityFilter en paralelo')
+    parser.add_argument('--gallery-reads', type=int, default=3, help='lecturas de galería por usuario')
+    parser.add_argument('--rekognition-ms', type=float, default=50.0)
+    parser.add_argument('--width', type=int, default=320)
+    parser.add_argument('--height', type=int, default=180)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    import boto3
+    from moto import mock_aws
+
+    counter = CallCounter()
+    with mock_aws():
+        # mock_aws reinicia la sesión por defecto: el hook se registra después, antes de que
+        # aws_clients cree los clientes de los handlers
+        boto3.setup_default_session(region_name=REGION)
+        boto3.DEFAULT_SESSION.events.register('before-call', counter)
+        harness = Harness(args, counter)
+        harness.create_resources()
+        screenshots = args.users * args.files
+
+        # Los logs de los handlers (incluidas las líneas EMF) no forman parte de la medición
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            upload_time, _ = run_phase(args.concurrency, harness.upload_session, range(args.users))
+            moderate_time, processed = run_phase(args.consumers, lambda _: harness.consume_filter_queue(), range(args.consumers))
+            pipeline_calls = Counter(counter.calls)
+            reads = [user for user in range(args.users) for _ in range(args.gallery_reads)]
+            gallery_time, counts = run_phase(args.concurrency, harness.read_gallery, reads)
+            gallery_calls = Counter(counter.calls) - pipeline_calls
+            peaks = measure_memory(harness)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    assert sum(processed) == screenshots, f'moderated {sum(processed)} of {screenshots}'
+    assert all(count == args.files for count in counts), 'gallery is missing approved screenshots'
+
+    print(f"{args.users} users x {args.files} screenshots ({args.width}x{args.height} PNG), "
+          f"concurrency {args.concurrency}, {args.consumers} filter consumers, Rekognition {args.rekognition_ms:.0f}ms")
+    print(f"\n{'phase':<10} {'time (s)':>9} {'throughput':>22}")
+    print(f"{'upload':<10} {upload_time:>9.2f} {screenshots / upload_time:>12.1f} uploads/s")
+    print(f"{'moderate':<10} {moderate_time:>9.2f} {screenshots / moderate_time:>12.1f} verdicts/s")
+    print(f"{'gallery':<10} {gallery_time:>9.2f} {len(reads) / gallery_time:>12.1f} reads/s")
+
+    failures = []
+    print(f"\n{'handler':<20} {'invocations':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'peak (MB)':>10}")
+    for name in HANDLERS:
+        values = harness.latencies[name]
+        if not values:
+            continue
+        p95 = percentile(values, 0.95)
+        print(f"{name:<20} {len(values):>11} {statistics.median(values):>9.1f} {p95:>9.1f} "
+              f"{percentile(values, 0.99):>9.1f} {peaks.get(name, 0):>10.2f}")
+        if peaks.get(name, 0) > PEAK_MEMORY_BUDGET_MB[name]:
+            failures.append(f"{name} peak memory {peaks[name]:.1f}MB > {PEAK_MEMORY_BUDGET_MB[name]:.1f}MB")
+
+    # Llamadas de subida + moderación por captura; las de la galería, por lectura
+    per_screenshot = sum(pipeline_calls.values()) / screenshots
+    print(f"\nAWS calls per screenshot (upload + moderation): {per_screenshot:.2f}")
+    for name, count in sorted(pipeline_calls.items(), key=lambda entry: -entry[1]):
+        print(f"  {name:<36} {count / screenshots:>7.2f}")
+    print(f"AWS calls per gallery read: {sum(gallery_calls.values()) / len(reads):.2f}")
+    for name, count in sorted(gallery_calls.items(), key=lambda entry: -entry[1]):
+        print(f"  {name:<36} {count / len(reads):>7.2f}")
+    if per_screenshot > CALLS_PER_SCREENSHOT_BUDGET:
+        failures.append(f"{per_screenshot:.2f} AWS calls per screenshot > {CALLS_PER_SCREENSHOT_BUDGET}")
+
+    if args.check and failures:
+        print("Load test budget exceeded: " + '; '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark: ProfanityMatcher (Aho-Corasick) vs. los bucles anidados sobre PROFANITY_LIST
+Uso: python scripts/bench_profanity_matcher.py
+"""
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+from profanity_matcher import ProfanityMatcher  # noqa: E402
+
+TERM_COUNTS = [40, 1000, 10000]
+OCR_LINES = 20
+REPEAT = 5
+
+
+def random_word(rng, min_length=4, max_length=10):
+    length = rng.randint(min_length, max_length)
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def build_terms(rng, count):
+    terms = set()
+    while len(terms) < count:
+        terms.add(random_word(rng))
+    return sorted(terms)
+
+
+def build_texts(rng, terms):
+    """
+    Texto de metadata + líneas OCR típicas de un screenshot (algunas con palabras prohibidas)
+    """
+    def sentence(words):
+        parts = [random_word(rng, 2, 9) for _ in range(words)]
+        if rng.random() < 0.2:
+            parts.insert(rng.randint(0, len(parts)), rng.choice(terms))
+        return ' '.join(parts)
+
+    metadata = sentence(25)
+    lines = [sentence(rng.randint(2, 8)) for _ in range(OCR_LINES)]
+    return metadata, lines
+
+
+def nested_loops(terms, metadata, lines):
+    """
+    Réplica del algoritmo anterior de check_content
+    """
+    found = set()
+    for word in terms:
+        if word in metadata:
+            found.add(word)
+    for line in lines:
+        for word in terms:
+            if word in line:
+                found.add(word)
+                break
+    return found
+
+
+def single_pass(matcher, metadata, lines):
+    found = set()
+    flagged_lines = set()
+    for match in matcher.find_in_segments([metadata] + lines):
+        if match.segment == 0:
+            found.add(match.word)
+        elif match.segment not in flagged_lines:
+            flagged_lines.add(match.segment)
+            found.add(match.word)
+    return found
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'terms':>8} {'build (ms)':>12} {'loops (us)':>12} {'matcher (us)':>14} {'speedup':>9}")
+
+    for count in TERM_COUNTS:
+        terms = build_terms(rng, count)
+        metadata, lines = build_texts(rng, terms)
+
+        build_time = timeit.timeit(lambda: ProfanityMatcher(terms, leetspeak=False), number=1)
+        matcher = ProfanityMatcher(terms, leetspeak=False)
+
+        # Ambos algoritmos deben encontrar lo mismo en modo substring
+        expected = nested_loops(terms, metadata, lines)
+        actual = single_pass(matcher, metadata, lines)
+        if not expected.issubset(actual):
+            raise AssertionError(f"Matcher missed terms: {sorted(expected - actual)}")
+
+        loops = min(timeit.repeat(lambda: nested_loops(terms, metadata, lines), number=20, repeat=REPEAT)) / 20
+        single = min(timeit.repeat(lambda: single_pass(matcher, metadata, lines), number=20, repeat=REPEAT)) / 20
+
+        print(f"{count:>8} {build_time * 1000:>12.1f} {loops * 1e6:>12.1f} {single * 1e6:>14.1f} {loops / single:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
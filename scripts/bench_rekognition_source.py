@@ -0,0 +1,126 @@
+"""
+Benchmark: check_content con Rekognition leyendo de S3 (S3Object) vs. descargando la imagen (bytes)
+Mide bytes leídos de S3, bytes enviados a Rekognition y memoria pico (tracemalloc) por imagen
+S3 y Rekognition se sustituyen por clientes en memoria que solo cuentan bytes
+Uso: python scripts/bench_rekognition_source.py (requiere Pillow)
+"""
+import base64
+import hashlib
+import io
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('RAW_BUCKET', 'bench-raw')
+os.environ.setdefault('PROCESSED_BUCKET', 'bench-processed')
+os.environ.setdefault('METADATA_TABLE', 'bench-metadata')
+os.environ.setdefault('NOTIFICATION_TOPIC_ARN', 'arn:aws:sns:us-east-1:123456789012:bench-notify')
+
+import profanity_filter  # noqa: E402
+import verdict_cache  # noqa: E402
+
+MB = 1024 * 1024
+IMAGES = 5
+
+
+class MemoryS3:
+    """
+    Cliente S3 mínimo: head_object y get_object (con Range) sobre objetos en memoria
+    """
+    def __init__(self, objects):
+        self.objects = objects
+        self.bytes_read = 0
+
+    def head_object(self, Bucket, Key, **kwargs):
+        body = self.objects[Key]
+        return {
+            'ContentLength': len(body),
+            'ChecksumSHA256': base64.b64encode(hashlib.sha256(body).digest()).decode()
+        }
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        body = self.objects[Key]
+        if Range:
+            start, end = Range.split('=')[1].split('-')
+            body = body[int(start):int(end) + 1]
+        self.bytes_read += len(body)
+        # Copia nueva, como la respuesta HTTP real (BytesIO devolvería el mismo objeto sin asignar memoria)
+        return {'Body': io.BytesIO(bytes(memoryview(body)))}
+
+
+class CountingRekognition:
+    """
+    Rekognition mínimo: cuenta los bytes de imagen enviados en cada llamada
+    """
+    def __init__(self):
+        self.bytes_sent = 0
+
+    def _count(self, Image):
+        self.bytes_sent += len(Image.get('Bytes', b''))
+
+    def detect_labels(self, Image, **kwargs):
+        self._count(Image)
+        return {'Labels': [{'Name': 'Video Game', 'Confidence': 95.0}]}
+
+    def detect_moderation_labels(self, Image, **kwargs):
+        self._count(Image)
+        return {'ModerationLabels': []}
+
+    def detect_text(self, Image, **kwargs):
+        self._count(Image)
+        return {'TextDetections': []}
+
+
+def screenshot_png(seed):
+    """
+    PNG 1920x1080 con ruido (comprime poco, como una captura real con texturas)
+    """
+    from PIL import Image
+
+    rng = random.Random(seed)
+    img = Image.frombytes('RGB', (960, 540), rng.randbytes(960 * 540 * 3))
+    buffer = io.BytesIO()
+    img.resize((1920, 1080), Image.NEAREST).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def run(source, objects):
+    profanity_filter.REKOGNITION_IMAGE_SOURCE = source
+    profanity_filter.s3_client = s3 = MemoryS3(objects)
+    profanity_filter.rekognition_client = rekognition = CountingRekognition()
+    verdict_cache._lru.clear()
+
+    peaks = []
+    for key in objects:
+        tracemalloc.start()
+        profanity_filter.check_content({}, 'bench-raw', key)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return s3.bytes_read, rekognition.bytes_sent, max(peaks)
+
+
+def main():
+    objects = {f'raw/bench/{i}.png': screenshot_png(i) for i in range(IMAGES)}
+    total = sum(len(body) for body in objects.values())
+    print(f"{IMAGES} PNG 1920x1080, {total / MB:.1f}MB total")
+
+    # Los logs de cada análisis no forman parte de la medición
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        results = [(source, run(source, objects)) for source in ('bytes', 's3')]
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{'source':<8} {'S3 read (MB)':>13} {'to Rekognition (MB)':>20} {'peak memory (MB)':>17}")
+    for source, (bytes_read, bytes_sent, peak) in results:
+        print(f"{source:<8} {bytes_read / MB:>13.2f} {bytes_sent / MB:>20.2f} {peak / MB:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Load test: capacidad de lectura consumida por image_retrieval, antes (scan de respaldo) y después (GSI)
+Usa moto como DynamoDB local. Las RCU se estiman a partir de los bytes leídos (4 KB por RCU, lectura eventual)
+scan: el respaldo anterior (Limit antes del filtro, resultados parciales)
+scan-all: un scan paginado con resultados correctos
+Uso: pip install moto && python scripts/bench_retrieval_capacity.py
+"""
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('METADATA_TABLE', 'bench-metadata')
+os.environ.setdefault('PROCESSED_BUCKET', 'bench-processed')
+
+import boto3  # noqa: E402
+from boto3.dynamodb.conditions import Key  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+USERS = 100
+SCREENSHOTS_PER_USER = 40
+REQUESTS = 50
+FULL_SCAN_REQUESTS = 5
+LIMIT = 50
+STATUSES = ['APPROVED'] * 7 + ['REJECTED'] * 2 + ['PROCESSING']
+
+
+def create_table(dynamodb):
+    return dynamodb.create_table(
+        TableName=os.environ['METADATA_TABLE'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[
+            {'AttributeName': 'screenshot_id', 'AttributeType': 'S'},
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'upload_timestamp', 'AttributeType': 'S'},
+            {'AttributeName': 'status', 'AttributeType': 'S'}
+        ],
+        KeySchema=[{'AttributeName': 'screenshot_id', 'KeyType': 'HASH'}],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'UserIdIndex',
+                'KeySchema': [
+                    {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'upload_timestamp', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            {
+                'IndexName': 'StatusIndex',
+                'KeySchema': [
+                    {'AttributeName': 'status', 'KeyType': 'HASH'},
+                    {'AttributeName': 'upload_timestamp', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ]
+    )
+
+
+def populate(table, rng):
+    users = [str(uuid.uuid4()) for _ in range(USERS)]
+    start = datetime(2025, 1, 1)
+    with table.batch_writer() as batch:
+        for user_id in users:
+            for i in range(SCREENSHOTS_PER_USER):
+                screenshot_id = str(uuid.uuid4())
+                batch.put_item(Item={
+                    'screenshot_id': screenshot_id,
+                    'user_id': user_id,
+                    'filename': f'screenshot_{i}.png',
+                    'game_title': 'Benchmark Game',
+                    'description': 'x' * rng.randint(20, 200),
+                    'upload_timestamp': (start + timedelta(minutes=rng.randint(0, 500000))).isoformat(),
+                    'status': rng.choice(STATUSES),
+                    'raw_s3_key': f'raw/{user_id}/{screenshot_id}.png',
+                    'processed_s3_key': f'processed/{user_id}/{screenshot_id}.png',
+                    'file_size': rng.randint(100000, 5000000),
+                    'extension': 'png'
+                })
+    return users
+
+
+def item_size(item):
+    return sum(len(str(k)) + len(str(v)) for k, v in item.items())
+
+
+def estimated_rcu(read_bytes):
+    return math.ceil(read_bytes / 4096) * 0.5 if read_bytes else 0.5
+
+
+def before_user_request(table, user_id, average_size):
+    """
+    Camino anterior: 'user-index' no existe, así que siempre caía en el scan con Limit
+    """
+    response = table.scan(FilterExpression=Key('user_id').eq(user_id), Limit=LIMIT)
+    items = [item for item in response['Items'] if item.get('status') == 'APPROVED']
+    return len(items), estimated_rcu(response['ScannedCount'] * average_size)
+
+
+def full_scan_user_request(table, user_id, average_size):
+    """
+    Lo que costaría un scan que devuelva resultados correctos: recorrer toda la tabla
+    """
+    scan_args = {'FilterExpression': Key('user_id').eq(user_id)}
+    returned = 0
+    scanned = 0
+    while True:
+        response = table.scan(**scan_args)
+        returned += sum(1 for item in response['Items'] if item.get('status') == 'APPROVED')
+        scanned += response['ScannedCount']
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return min(returned, LIMIT), estimated_rcu(scanned * average_size)
+
+
+def after_user_request(image_retrieval, user_id, average_size):
+    response = image_retrieval.query_index(
+        image_retrieval.USER_INDEX_NAME,
+        KeyConditionExpression=Key('user_id').eq(user_id),
+        FilterExpression=image_retrieval.Attr('status').eq('APPROVED'),
+        ScanIndexForward=False,
+        Limit=LIMIT
+    )
+    return response['Count'], estimated_rcu(response['ScannedCount'] * average_size)
+
+
+def report(name, results, elapsed):
+    returned = sum(r[0] for r in results)
+    rcu = sum(r[1] for r in results)
+    print(f"{name:<9} {returned / len(results):>14.1f} {rcu / len(results):>12.2f} {rcu:>12.1f} {elapsed * 1000 / len(results):>12.2f}")
+
+
+def main():
+    rng = random.Random(7)
+
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+        table = create_table(dynamodb)
+        users = populate(table, rng)
+
+        import image_retrieval
+
+        sample = table.scan(Limit=200)['Items']
+        average_size = sum(item_size(item) for item in sample) / len(sample)
+        targets = [rng.choice(users) for _ in range(REQUESTS)]
+
+        print(f"Table: {USERS * SCREENSHOTS_PER_USER} items, {REQUESTS} gallery requests, limit={LIMIT}")
+        print(f"{'path':<9} {'approved/req':>14} {'RCU/req':>12} {'RCU total':>12} {'ms/req':>12}")
+
+        started = time.time()
+        before = [before_user_request(table, user_id, average_size) for user_id in targets]
+        report('scan', before, time.time() - started)
+
+        started = time.time()
+        full = [full_scan_user_request(table, user_id, average_size) for user_id in targets[:FULL_SCAN_REQUESTS]]
+        report('scan-all', full, time.time() - started)
+
+        started = time.time()
+        after = [after_user_request(image_retrieval, user_id, average_size) for user_id in targets]
+        report('gsi', after, time.time() - started)
+
+
+if __name__ == '__main__':
+    main()
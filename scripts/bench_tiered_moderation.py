@@ -0,0 +1,200 @@
+"""
+Benchmark: llamadas a Rekognition evitadas por la moderación por niveles, por cada 1.000 capturas
+Compara MODERATION_METADATA_POLICY x PRESCREEN_POLICY sobre una mezcla de capturas:
+metadata con palabras prohibidas, capturas a resolución de pantalla, fotos de cámara (EXIF) y otros tamaños
+S3 y Rekognition se sustituyen por clientes en memoria; el Rekognition falso marca las fotos de cámara como
+personas, así que la columna 'same verdict' indica si algún nivel cambia el resultado frente al análisis completo
+Costo según COST_ESTIMATION.md (Rekognition: $1.00 por 1.000 imágenes analizadas, por llamada)
+Uso: python scripts/bench_tiered_moderation.py [--screenshots N] (requiere Pillow)
+"""
+import argparse
+import base64
+import hashlib
+import io
+import os
+import random
+import struct
+import sys
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('RAW_BUCKET', 'bench-raw')
+os.environ.setdefault('PROCESSED_BUCKET', 'bench-processed')
+os.environ.setdefault('METADATA_TABLE', 'bench-metadata')
+os.environ.setdefault('NOTIFICATION_TOPIC_ARN', 'arn:aws:sns:us-east-1:123456789012:bench-notify')
+os.environ.pop('VERDICT_CACHE_TABLE', None)
+
+import profanity_filter  # noqa: E402
+import verdict_cache  # noqa: E402
+
+REKOGNITION_PRICE_PER_1K = 1.00
+S3_GET_PRICE_PER_1K = 0.0004
+
+# Mezcla de la carga (fracciones); el resto son capturas con tamaños que no son de pantalla
+MIX = {
+    'metadata_profanity': 0.03,
+    'screen_capture': 0.70,
+    'camera_photo': 0.07,
+}
+
+POLICIES = [
+    ('analyze', 'off'),  # comportamiento anterior: siempre tres llamadas
+    ('reject', 'off'),
+    ('reject', 'skip_labels'),
+    ('reject', 'decide'),
+]
+
+
+class MemoryS3:
+    """
+    Cliente S3 mínimo: head_object (con ChecksumSHA256) y get_object con Range
+    """
+    def __init__(self, objects):
+        self.objects = objects
+        self.requests = 0
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.requests += 1
+        body = self.objects[Key]
+        return {
+            'ContentLength': len(body),
+            'ChecksumSHA256': base64.b64encode(hashlib.sha256(body).digest()).decode()
+        }
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        self.requests += 1
+        body = self.objects[Key]
+        if Range:
+            start, end = Range.split('=')[1].split('-')
+            body = body[int(start):int(end) + 1]
+        return {'Body': io.BytesIO(body)}
+
+
+class LabelingRekognition:
+    """
+    Rekognition falso: las claves de fotos de cámara devuelven personas, el resto videojuego
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def _is_photo(self, Image):
+        return '/camera_photo-' in Image.get('S3Object', {}).get('Name', '')
+
+    def detect_labels(self, Image, **kwargs):
+        self.calls += 1
+        if self._is_photo(Image):
+            return {'Labels': [{'Name': 'Person', 'Confidence': 96.0}]}
+        return {'Labels': [{'Name': 'Video Game', 'Confidence': 95.0}]}
+
+    def detect_moderation_labels(self, Image, **kwargs):
+        self.calls += 1
+        return {'ModerationLabels': []}
+
+    def detect_text(self, Image, **kwargs):
+        self.calls += 1
+        return {'TextDetections': []}
+
+
+# Datos de imagen comprimidos por tamaño (las capturas de más de 1920px se decodifican al normalizarlas)
+_pixel_data = {}
+
+
+def png(width, height, seed):
+    """
+    PNG válido de las dimensiones pedidas; un chunk tEXt único hace que cada captura tenga su propio hash
+    """
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    if (width, height) not in _pixel_data:
+        _pixel_data[width, height] = zlib.compress((b'\x00' + b'\x20' * width * 3) * height)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'tEXt', b'Comment\x00' + str(seed).encode())
+        + chunk(b'IDAT', _pixel_data[width, height])
+        + chunk(b'IEND', b'')
+    )
+
+
+def camera_jpeg(seed):
+    """
+    JPEG con EXIF de cámara (Make/Model), como una foto de teléfono
+    """
+    from PIL import Image
+
+    exif = Image.Exif()
+    exif[0x010F] = 'Phone Maker'
+    exif[0x0110] = 'Phone 12'
+    buffer = io.BytesIO()
+    Image.new('RGB', (1600, 1200), (seed % 256, 80, 120)).save(buffer, format='JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def build_workload(count):
+    rng = random.Random(7)
+    objects = {}
+    metadata = {}
+    for index in range(count):
+        roll = rng.random()
+        if roll < MIX['metadata_profanity']:
+            kind, body = 'metadata_profanity', png(1920, 1080, index)
+        elif roll < MIX['metadata_profanity'] + MIX['screen_capture']:
+            width, height = rng.choice([(1920, 1080), (2560, 1440), (1280, 720), (1280, 800)])
+            kind, body = 'screen_capture', png(width, height, index)
+        elif roll < MIX['metadata_profanity'] + MIX['screen_capture'] + MIX['camera_photo']:
+            # Sufijo único tras el EOI: mismo contenido visual, otro hash
+            kind, body = 'camera_photo', camera_jpeg(index) + str(index).encode()
+        else:
+            width, height = rng.choice([(1700, 956), (1500, 1000), (1024, 640), (3000, 1700)])
+            kind, body = 'other', png(width, height, index)
+        key = f'raw/bench/{kind}-{index}.png'
+        objects[key] = body
+        metadata[key] = {
+            'game_title': 'Bench',
+            'description': 'gg this is spam' if kind == 'metadata_profanity' else 'boss fight'
+        }
+    return objects, metadata
+
+
+def run(policy, objects, metadata):
+    profanity_filter.MODERATION_METADATA_POLICY, profanity_filter.PRESCREEN_POLICY = policy
+    profanity_filter.s3_client = s3 = MemoryS3(objects)
+    profanity_filter.rekognition_client = rekognition = LabelingRekognition()
+    verdict_cache._lru.clear()
+
+    verdicts = {key: profanity_filter.check_content(metadata[key], 'bench-raw', key)[0] for key in objects}
+    return verdicts, rekognition.calls, s3.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--screenshots', type=int, default=1000)
+    args = parser.parse_args()
+
+    objects, metadata = build_workload(args.screenshots)
+    per_1k = 1000 / args.screenshots
+
+    # Los logs de cada análisis no forman parte de la medición
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        results = [(policy, run(policy, objects, metadata)) for policy in POLICIES]
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{args.screenshots} screenshots: " + ', '.join(f"{name} {share:.0%}" for name, share in MIX.items()))
+    print(f"{'metadata':<9} {'prescreen':<12} {'Rekognition/1k':>15} {'avoided/1k':>11} {'S3 req/1k':>10} "
+          f"{'$/1k':>7} {'same verdict':>13}")
+    baseline_verdicts, baseline_calls, _ = results[0][1]
+    for (metadata_policy, prescreen_policy), (verdicts, calls, s3_requests) in results:
+        cost = calls * per_1k * REKOGNITION_PRICE_PER_1K / 1000 + s3_requests * per_1k * S3_GET_PRICE_PER_1K / 1000
+        same = sum(verdicts[key] == baseline_verdicts[key] for key in objects) / len(objects)
+        print(f"{metadata_policy:<9} {prescreen_policy:<12} {calls * per_1k:>15.0f} "
+              f"{(baseline_calls - calls) * per_1k:>11.0f} {s3_requests * per_1k:>10.0f} {cost:>7.2f} {same:>13.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark: memoria pico de image_uploader al subir una imagen de ~10MB
+Compara el camino anterior (JSON + b64decode completo) con el JSON actual y el binario (multipart por partes)
+S3 se sustituye por un sumidero que solo cuenta bytes, para medir únicamente la memoria del handler
+Cada camino corre en un proceso propio para que el RSS no herede memoria de otro
+Uso: pip install moto && python scripts/bench_upload_memory.py
+"""
+import base64
+import gc
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('RAW_BUCKET', 'bench-raw')
+os.environ.setdefault('METADATA_TABLE', 'bench-metadata')
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+IMAGE_SIZE = int(9.5 * 1024 * 1024)
+MB = 1024 * 1024
+# El uploader valida los magic bytes contra la extensión
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class SinkS3:
+    """
+    Cliente S3 mínimo: acepta put_object y multipart sin guardar los datos
+    """
+    def __init__(self):
+        self.received = 0
+        self.requests = 0
+
+    def put_object(self, Body, **kwargs):
+        self.received += len(Body)
+        self.requests += 1
+
+    def create_multipart_upload(self, **kwargs):
+        self.requests += 1
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, Body, PartNumber, **kwargs):
+        self.received += len(Body)
+        self.requests += 1
+        return {'ETag': f'"part-{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.requests += 1
+
+    def abort_multipart_upload(self, **kwargs):
+        self.requests += 1
+
+
+def previous_handler(image_uploader, event):
+    """
+    Réplica del camino anterior: json.loads + b64decode completo + put_object
+    """
+    body = json.loads(event['body'])
+    image_bytes = base64.b64decode(body['image'])
+    image_uploader.s3_client.put_object(Bucket=image_uploader.RAW_BUCKET, Key='raw/bench.png', Body=image_bytes)
+    return len(image_bytes)
+
+
+def json_event(image_b64):
+    return {
+        'requestContext': {'authorizer': {'claims': {'sub': 'bench-user'}}},
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps({'image': image_b64, 'filename': 'bench.png', 'game_title': 'Bench'})
+    }
+
+
+def binary_event(image_b64):
+    return {
+        'requestContext': {'authorizer': {'claims': {'sub': 'bench-user'}}},
+        'headers': {'Content-Type': 'image/png'},
+        'queryStringParameters': {'filename': 'bench.png', 'game_title': 'Bench'},
+        'isBase64Encoded': True,
+        'body': image_b64
+    }
+
+
+def rss_high_water():
+    """
+    VmHWM de /proc (Linux). Retorna: bytes, o None si no está disponible
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def reset_rss_high_water():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure(name, func, event):
+    gc.collect()
+    can_reset = reset_rss_high_water()
+    rss_before = rss_high_water()
+    tracemalloc.start()
+
+    func(event)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_high_water()
+
+    rss = f"{(rss_after - rss_before) / MB:>14.1f}" if can_reset and rss_before else f"{'n/a':>14}"
+    print(f"{name:<22} {peak / MB:>14.1f} {peak / IMAGE_SIZE:>10.2f}x {rss}")
+
+
+PATHS = {
+    'json (before)': 'before',
+    'json (streamed)': 'json',
+    'binary (streamed)': 'binary'
+}
+
+
+def run_path(path):
+    with mock_aws():
+        boto3.resource('dynamodb').create_table(
+            TableName=os.environ['METADATA_TABLE'],
+            BillingMode='PAY_PER_REQUEST',
+            AttributeDefinitions=[{'AttributeName': 'screenshot_id', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'screenshot_id', 'KeyType': 'HASH'}]
+        )
+        os.environ['SNS_TOPIC_ARN'] = boto3.client('sns').create_topic(Name='bench-filter')['TopicArn']
+
+        import image_uploader
+        sink = SinkS3()
+        image_uploader.s3_client = sink
+
+        def handler(event):
+            result = image_uploader.lambda_handler(event, None)
+            if result['statusCode'] != 200:
+                raise AssertionError(result['body'])
+
+        image_b64 = base64.b64encode(PNG_SIGNATURE + os.urandom(IMAGE_SIZE - len(PNG_SIGNATURE))).decode()
+        if path == 'before':
+            func, event = (lambda event: previous_handler(image_uploader, event)), json_event(image_b64)
+        elif path == 'json':
+            func, event = handler, json_event(image_b64)
+        else:
+            func, event = handler, binary_event(image_b64)
+        del image_b64
+
+        # Calentar boto3/moto con una imagen pequeña para no medir la carga de módulos
+        small = base64.b64encode(PNG_SIGNATURE + os.urandom(2048)).decode()
+        handler(binary_event(small) if path == 'binary' else json_event(small))
+        sink.requests = 0
+
+        name = next(label for label, key in PATHS.items() if key == path)
+        measure(name, func, event)
+        if path == 'binary':
+            print(f"  S3 requests per binary upload: {sink.requests}")
+
+
+def main():
+    if len(sys.argv) > 1:
+        run_path(sys.argv[1])
+        return
+
+    print(f"Image: {IMAGE_SIZE / MB:.1f}MB ({IMAGE_SIZE * 4 / 3 / MB:.1f}MB base64), part size 5MB")
+    print(f"{'path':<22} {'peak (MB)':>14} {'vs image':>11} {'RSS peak (MB)':>14}")
+    for path in PATHS.values():
+        subprocess.run([sys.executable, __file__, path], check=True)
+
+
+if __name__ == '__main__':
+    main()
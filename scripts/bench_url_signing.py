@@ -0,0 +1,96 @@
+"""
+Benchmark: costo de firmar una página de 100 screenshots
+Compara la firma por item anterior con la caché por ventana de url_signer (S3 y CloudFront)
+Uso: python scripts/bench_url_signing.py
+"""
+import importlib
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('PROCESSED_BUCKET', 'bench-processed')
+
+import boto3  # noqa: E402
+
+PAGE_SIZE = 100
+REPEAT = 5
+KEYS = [f"processed/user-{i % 7}/screenshot-{i}.png" for i in range(PAGE_SIZE)]
+
+
+def load_signer(**env):
+    for name in ('CLOUDFRONT_DOMAIN', 'CLOUDFRONT_SIGNING_MODE', 'CLOUDFRONT_KEY_PAIR_ID'):
+        os.environ.pop(name, None)
+    os.environ.update(env)
+    import url_signer
+    return importlib.reload(url_signer)
+
+
+def install_test_key(url_signer):
+    """
+    Clave RSA local en lugar de la de Secrets Manager
+    """
+    from botocore.signers import CloudFrontSigner
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    url_signer._cloudfront_signer = CloudFrontSigner(
+        'K2BENCHMARK',
+        lambda message: private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+    )
+
+
+def per_item_presign(s3_client):
+    """
+    Réplica de generate_signed_url anterior (una firma nueva por item y petición)
+    """
+    return [
+        s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': os.environ['PROCESSED_BUCKET'], 'Key': key},
+            ExpiresIn=3600
+        )
+        for key in KEYS
+    ]
+
+
+def page(url_signer):
+    return [url_signer.sign_url(key) for key in KEYS]
+
+
+def measure(name, func, cold_setup=None):
+    if cold_setup:
+        cold = min(timeit.repeat(func, setup=cold_setup, number=1, repeat=REPEAT))
+    else:
+        cold = min(timeit.repeat(func, number=1, repeat=REPEAT))
+    func()
+    warm = min(timeit.repeat(func, number=1, repeat=REPEAT))
+    print(f"{name:<22} {cold * 1000:>12.2f} {warm * 1000:>12.2f}")
+
+
+def main():
+    print(f"{'mode':<22} {'cold (ms)':>12} {'warm (ms)':>12}   page of {PAGE_SIZE} items")
+
+    s3_client = boto3.client('s3')
+    measure('s3 per-item (before)', lambda: per_item_presign(s3_client))
+
+    signer = load_signer()
+    measure('s3 windowed', lambda: page(signer), cold_setup=signer._url_cache.clear)
+    first = page(signer)
+    print(f"  identical URLs across requests: {first == page(signer)}")
+
+    signer = load_signer(CLOUDFRONT_DOMAIN='d111111abcdef8.cloudfront.net', CLOUDFRONT_SIGNING_MODE='url')
+    install_test_key(signer)
+    measure('cloudfront windowed', lambda: page(signer), cold_setup=signer._url_cache.clear)
+    first = page(signer)
+    signer._url_cache.clear()
+    print(f"  identical URLs after cache reset (new container): {first == page(signer)}")
+
+
+if __name__ == '__main__':
+    main()
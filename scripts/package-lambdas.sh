@@ -11,19 +11,23 @@ mkdir -p dist/lambda
 # Empaquetar Image Uploader
 echo "Empaquetando image_uploader..."
 cd src/lambda
-zip -r ../../dist/lambda/image_uploader.zip image_uploader.py
+zip -r ../../dist/lambda/image_uploader.zip image_uploader.py aws_clients.py image_normalizer.py status_transitions.py metrics.py
 cd ../..
 
 # Empaquetar Profanity Filter
 echo "Empaquetando profanity_filter..."
 cd src/lambda
-zip -r ../../dist/lambda/profanity_filter.zip profanity_filter.py
+zip -r ../../dist/lambda/profanity_filter.zip profanity_filter.py aws_clients.py profanity_matcher.py verdict_cache.py image_normalizer.py status_transitions.py notification_batcher.py metrics.py content_prescreen.py moderation_rules.py label_classifier.py
 cd ../..
 
 # Empaquetar Image Retrieval
 echo "Empaquetando image_retrieval..."
-cd src/lambda
-zip -r ../../dist/lambda/image_retrieval.zip image_retrieval.py
+# url_signer necesita cryptography para los modos firmados de CloudFront (rueda para el runtime de la Lambda)
+rm -rf build/image_retrieval
+pip install --quiet --target build/image_retrieval --platform manylinux2014_x86_64 --implementation cp --python-version 3.12 --only-binary=:all: cryptography
+cp src/lambda/image_retrieval.py src/lambda/aws_clients.py src/lambda/url_signer.py src/lambda/metrics.py build/image_retrieval/
+cd build/image_retrieval
+zip -qr ../../dist/lambda/image_retrieval.zip .
 cd ../..
 
 echo "✓ Empaquetado completo. Archivos en dist/lambda/"
@@ -0,0 +1,90 @@
+"""
+Publica las reglas de moderación de profanity_filter (moderation_rules) en S3
+Valida y normaliza el documento (minúsculas, sin duplicados, orden estable) antes de subirlo;
+sin --version, la versión es un digest del contenido, así que publicar las mismas reglas no invalida
+la caché de veredictos y cualquier cambio sí lo hace
+Los contenedores la aplican en MODERATION_RULES_REFRESH_SECONDS (30s por defecto) sin redesplegar;
+el bucket es versionado, así que volver atrás es volver a publicar una versión anterior del objeto
+Uso:
+  python scripts/publish_moderation_rules.py --export-defaults > rules.json
+  python scripts/publish_moderation_rules.py rules.json --bucket <proyecto>-moderation-rules [--dry-run]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
+
+import moderation_rules  # noqa: E402
+
+
+def build_artifact(document, version=None):
+    """
+    Retorna: (versión, bytes del artefacto normalizado)
+    """
+    document = dict(document)
+    if version:
+        document['version'] = version
+    elif not document.get('version') or document['version'] == moderation_rules.BUILTIN_VERSION:
+        # Digest del contenido normalizado (sin el campo version)
+        document['version'] = 'pending'
+        content = dict(moderation_rules.validate(document))
+        content.pop('version')
+        digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+        document['version'] = f"sha-{digest[:12]}"
+
+    normalized = moderation_rules.validate(document)
+    # Compilar como lo hará la Lambda para fallar aquí y no en los contenedores
+    moderation_rules.RuleSet(normalized)
+    return normalized['version'], (json.dumps(normalized, indent=2, sort_keys=True) + '\n').encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('rules', nargs='?', help='documento JSON de reglas')
+    parser.add_argument('--bucket', default=os.environ.get('MODERATION_RULES_BUCKET'))
+    parser.add_argument('--key', default=moderation_rules.MODERATION_RULES_KEY)
+    parser.add_argument('--version', help='versión explícita (por defecto, digest del contenido)')
+    parser.add_argument('--export-defaults', action='store_true', help='imprime las reglas integradas y termina')
+    parser.add_argument('--dry-run', action='store_true', help='valida e imprime el artefacto sin subirlo')
+    args = parser.parse_args()
+
+    if args.export_defaults:
+        print(json.dumps(moderation_rules.BUILTIN_RULES, indent=2))
+        return 0
+
+    if not args.rules:
+        parser.error('rules file is required')
+    with open(args.rules, encoding='utf-8') as rules_file:
+        document = json.load(rules_file)
+
+    try:
+        version, body = build_artifact(document, args.version)
+    except (moderation_rules.RulesError, ValueError) as e:
+        print(f"Invalid rules: {str(e)}", file=sys.stderr)
+        return 1
+
+    if args.dry_run:
+        sys.stdout.write(body.decode())
+        return 0
+
+    if not args.bucket:
+        parser.error('--bucket (or MODERATION_RULES_BUCKET) is required')
+
+    import boto3
+
+    response = boto3.client('s3').put_object(
+        Bucket=args.bucket,
+        Key=args.key,
+        Body=body,
+        ContentType='application/json'
+    )
+    print(f"Published rules {version} to s3://{args.bucket}/{args.key} "
+          f"(ETag {response.get('ETag')}, VersionId {response.get('VersionId', '-')})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
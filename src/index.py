@@ -3,79 +3,191 @@ import os
 import uuid
 import json
 import io
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image  # Esto funcionará gracias a tu Layer
 
-# Clientes de AWS
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+# Clientes de AWS: se crean al primer uso (PRIME_ON_INIT=true los crea en el init)
+_s3 = None
+_dynamodb = None
+
+def get_s3():
+    global _s3
+
+    if _s3 is None:
+        _s3 = boto3.client('s3')
+    return _s3
+
+def get_dynamodb():
+    global _dynamodb
+
+    if _dynamodb is None:
+        _dynamodb = boto3.resource('dynamodb')
+    return _dynamodb
+
+# Derivados generados por imagen: (nombre, lado mayor en px), de mayor a menor
+DERIVATIVE_SIZES = [
+    ('full', 1920),
+    ('preview', 960),
+    ('grid', 320)
+]
+# Formatos de salida, p. ej. 'webp' o 'webp,avif' (AVIF es más compacto pero mucho más lento de codificar)
+DERIVATIVE_FORMATS = [
+    f.strip().lower() for f in os.environ.get('DERIVATIVE_FORMATS', 'webp').split(',') if f.strip()
+]
+DERIVATIVE_QUALITY = {'webp': 80, 'avif': 60}
+UPLOAD_MAX_WORKERS = int(os.environ.get('UPLOAD_MAX_WORKERS', '6'))
+
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS)
+
+if os.environ.get('PRIME_ON_INIT', 'false').lower() == 'true':
+    get_s3()
+    get_dynamodb()
+
+# Pillow se importa al procesar la primera imagen (los eventos de derivados no lo necesitan)
+_pillow = None
+
+def load_pillow():
+    """
+    Importa Pillow (gracias a tu Layer) y descarta los formatos que no soporta
+    """
+    global _pillow
+
+    if _pillow is None:
+        from PIL import Image, features
+
+        for _format in list(DERIVATIVE_FORMATS):
+            if not features.check(_format):
+                print(f"Formato {_format} no soportado por Pillow, se omite")
+                DERIVATIVE_FORMATS.remove(_format)
+        _pillow = Image
+    return _pillow
 
 def handler(event, context):
     print("Iniciando procesamiento de evento S3...")
-    
-    # 1. Obtener información del evento (qué archivo se subió)
-    try:
-        record = event['Records'][0]
-        src_bucket = record['s3']['bucket']['name']
-        src_key = record['s3']['object']['key'] # Ejemplo: PLAYER1/foto.png
-        
-        # Evitar bucles infinitos (si por error se sube al mismo bucket)
-        if "thumbnails/" in src_key:
-            return {'status': 'skipped', 'reason': 'Es un thumbnail'}
-
-        print(f"Procesando archivo: {src_key} del bucket: {src_bucket}")
-
-        # 2. Descargar la imagen a memoria (sin guardarla en disco)
-        response = s3.get_object(Bucket=src_bucket, Key=src_key)
-        image_content = response['Body'].read()
-
-        # 3. Procesamiento con Pillow
-        with Image.open(io.BytesIO(image_content)) as img:
-            # Generar Thumbnail (128x128 max)
-            img.thumbnail((128, 128))
-            
-            # Guardar en buffer de memoria
-            buffer = io.BytesIO()
-            img_format = img.format if img.format else 'PNG'
-            img.save(buffer, format=img_format)
-            buffer.seek(0)
-            
-            # 4. Subir al bucket de PROCESADOS
-            dest_bucket = os.environ['PROCESSED_BUCKET']
-            dest_key = f"thumbnails/{src_key}"
-            
-            s3.put_object(
-                Bucket=dest_bucket,
-                Key=dest_key,
-                Body=buffer,
-                ContentType=f'image/{img_format.lower()}'
-            )
-            print(f"Thumbnail subido a: {dest_bucket}/{dest_key}")
-
-        # 5. Guardar Metadatos en DynamoDB
-        table_name = os.environ['METADATA_TABLE']
-        table = dynamodb.Table(table_name)
-        
-        # Intentar adivinar el ID del jugador desde la carpeta (PLAYER1/foto.png)
-        player_id = src_key.split('/')[0] if '/' in src_key else 'unknown'
-        
-        item = {
-            'screenshotId': str(uuid.uuid4()),
-            'playerId': player_id,
-            'timestamp': datetime.utcnow().isoformat(),
-            'status': 'PROCESSED',
-            'originalPath': f"s3://{src_bucket}/{src_key}",
-            'processedPath': f"s3://{dest_bucket}/{dest_key}"
-        }
-        
-        table.put_item(Item=item)
-        print("Metadatos guardados en DynamoDB")
 
-        return {
-            'statusCode': 200,
-            'body': json.dumps('Procesamiento exitoso')
+    # 1. Procesar todos los archivos del evento (S3 puede agrupar varios)
+    results = []
+    failed = []
+    for record in event['Records']:
+        src_key = record['s3']['object']['key']
+        try:
+            result = process_record(record)
+            if result:
+                results.append(result)
+        except Exception as e:
+            print(f"Error procesando imagen {src_key}: {str(e)}")
+            failed.append(src_key)
+
+    if failed:
+        # Se relanza para que Lambda reintente el evento (los derivados se sobrescriben)
+        raise RuntimeError(f"Fallaron {len(failed)} de {len(event['Records'])} imágenes: {failed}")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Procesamiento exitoso', 'processed': results})
+    }
+
+def process_record(record):
+    """
+    Genera todos los derivados de una imagen con una sola decodificación
+    Retorna: dict con las claves de los derivados, o None si se omite
+    """
+    src_bucket = record['s3']['bucket']['name']
+    src_key = record['s3']['object']['key']  # Ejemplo: PLAYER1/foto.png
+
+    # Evitar bucles infinitos (si por error se sube al mismo bucket)
+    if "thumbnails/" in src_key:
+        print(f"Omitido (es un derivado): {src_key}")
+        return None
+
+    print(f"Procesando archivo: {src_key} del bucket: {src_bucket}")
+
+    # 2. Descargar la imagen a memoria (sin guardarla en disco)
+    response = get_s3().get_object(Bucket=src_bucket, Key=src_key)
+    image_content = response['Body'].read()
+
+    # 3. Procesamiento con Pillow: una decodificación, tamaños en cascada
+    Image = load_pillow()
+    dest_bucket = os.environ['PROCESSED_BUCKET']
+    base_key = src_key.rsplit('.', 1)[0]
+
+    with Image.open(io.BytesIO(image_content)) as img:
+        original_size = img.size
+        # JPEG: decodificar directamente a la escala más cercana al derivado más grande
+        largest = DERIVATIVE_SIZES[0][1]
+        scale = min(1.0, largest / max(img.size))
+        img.draft('RGB', (int(img.size[0] * scale), int(img.size[1] * scale)))
+
+        current = img if img.mode in ('RGB', 'RGBA') else img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        current.load()
+
+        # 4. Cada tamaño se reduce desde el anterior; codificación y subida en paralelo
+        futures = []
+        # Image.save guarda las opciones de codificación en la propia imagen (encoderinfo): dos trabajos
+        # no pueden codificar el mismo objeto a la vez, así que desde el segundo reciben una copia
+        submitted = set()
+        for name, max_side in DERIVATIVE_SIZES:
+            if max(current.size) > max_side:
+                # resize devuelve una imagen nueva: los derivados en cola no se modifican
+                ratio = max_side / max(current.size)
+                new_size = (max(1, round(current.size[0] * ratio)), max(1, round(current.size[1] * ratio)))
+                current = current.resize(new_size, Image.LANCZOS, reducing_gap=2.0)
+            for image_format in DERIVATIVE_FORMATS:
+                dest_key = f"thumbnails/{name}/{base_key}.{image_format}"
+                job_image = current.copy() if id(current) in submitted else current
+                submitted.add(id(current))
+                futures.append(upload_executor.submit(
+                    encode_and_upload, job_image, image_format, dest_bucket, dest_key
+                ))
+
+        derivatives = {}
+        for future in futures:
+            dest_key, size = future.result()
+            derivatives[dest_key] = size
+            print(f"Derivado subido a: {dest_bucket}/{dest_key} ({size} bytes)")
+
+    # 5. Guardar Metadatos en DynamoDB
+    table_name = os.environ['METADATA_TABLE']
+    table = get_dynamodb().Table(table_name)
+
+    # Intentar adivinar el ID del jugador desde la carpeta (PLAYER1/foto.png)
+    player_id = src_key.split('/')[0] if '/' in src_key else 'unknown'
+
+    item = {
+        'screenshotId': str(uuid.uuid4()),
+        'playerId': player_id,
+        'timestamp': datetime.utcnow().isoformat(),
+        'status': 'PROCESSED',
+        'originalPath': f"s3://{src_bucket}/{src_key}",
+        'originalWidth': original_size[0],
+        'originalHeight': original_size[1],
+        'derivatives': {
+            f"{name}_{image_format}": f"s3://{dest_bucket}/thumbnails/{name}/{base_key}.{image_format}"
+            for name, _ in DERIVATIVE_SIZES
+            for image_format in DERIVATIVE_FORMATS
         }
+    }
+
+    table.put_item(Item=item)
+    print("Metadatos guardados en DynamoDB")
+
+    return {'source': src_key, 'derivatives': sorted(derivatives)}
+
+def encode_and_upload(image, image_format, dest_bucket, dest_key):
+    """
+    Codifica un derivado y lo sube al bucket de procesados
+    Retorna: (clave destino, bytes subidos)
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format.upper(), quality=DERIVATIVE_QUALITY.get(image_format, 80))
+    size = buffer.tell()
+    buffer.seek(0)
 
-    except Exception as e:
-        print(f"Error procesando imagen: {str(e)}")
-        raise e
\ No newline at end of file
+    get_s3().put_object(
+        Bucket=dest_bucket,
+        Key=dest_key,
+        Body=buffer,
+        ContentType=f'image/{image_format}',
+        CacheControl='public, max-age=86400'
+    )
+    return dest_key, size
@@ -0,0 +1,131 @@
+"""
+Módulo: AWS Clients
+Fábrica compartida de clientes boto3 con configuración por servicio
+Un cliente/recurso por servicio y contenedor, pool de conexiones dimensionado, reintentos adaptativos,
+TCP keep-alive y timeouts explícitos; los objetos Table de DynamoDB también se reutilizan
+Los clientes se crean al primer uso (lazy_client/lazy_table); register_priming los crea en el init
+"""
+import importlib
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+# Conexiones HTTP reutilizables por cliente (botocore usa 10 por defecto)
+DEFAULT_POOL_SIZE = int(os.environ.get('AWS_CLIENT_POOL_SIZE', '10'))
+
+# Configuración por servicio: pool, timeouts (segundos) e intentos máximos
+SERVICE_SETTINGS = {
+    # Copias, subidas multipart y firmas en paralelo
+    's3': {'pool': 50, 'connect_timeout': 2, 'read_timeout': 30, 'max_attempts': 3},
+    # Lotes de profanity_filter: hasta 3 llamadas por registro en paralelo
+    'rekognition': {'pool': 32, 'connect_timeout': 2, 'read_timeout': 15, 'max_attempts': 3},
+    # Lecturas/escrituras cortas; más intentos ante throttling
+    'dynamodb': {'pool': 32, 'connect_timeout': 1, 'read_timeout': 5, 'max_attempts': 5},
+    'sns': {'pool': 16, 'connect_timeout': 2, 'read_timeout': 5, 'max_attempts': 3},
+    'secretsmanager': {'pool': 2, 'connect_timeout': 2, 'read_timeout': 5, 'max_attempts': 3},
+}
+
+_clients = {}
+_resources = {}
+_tables = {}
+_lock = threading.RLock()
+
+
+def build_config(service_name):
+    """
+    Config de botocore para el servicio (los servicios no listados usan valores por defecto del módulo)
+    """
+    settings = SERVICE_SETTINGS.get(service_name, {})
+    return Config(
+        max_pool_connections=settings.get('pool', DEFAULT_POOL_SIZE),
+        connect_timeout=settings.get('connect_timeout', 2),
+        read_timeout=settings.get('read_timeout', 10),
+        retries={'mode': 'adaptive', 'max_attempts': settings.get('max_attempts', 3)},
+        tcp_keepalive=True
+    )
+
+
+def client(service_name):
+    """
+    Cliente boto3 compartido del servicio
+    Retorna: siempre la misma instancia dentro del contenedor (los clientes son thread-safe)
+    """
+    if service_name not in _clients:
+        with _lock:
+            if service_name not in _clients:
+                _clients[service_name] = boto3.client(service_name, config=build_config(service_name))
+    return _clients[service_name]
+
+
+def resource(service_name):
+    """
+    Recurso boto3 compartido del servicio (solo para operaciones de lectura/escritura simples)
+    """
+    if service_name not in _resources:
+        with _lock:
+            if service_name not in _resources:
+                _resources[service_name] = boto3.resource(service_name, config=build_config(service_name))
+    return _resources[service_name]
+
+
+def table(table_name):
+    """
+    Objeto Table de DynamoDB reutilizado entre registros e invocaciones
+    """
+    if table_name not in _tables:
+        with _lock:
+            if table_name not in _tables:
+                _tables[table_name] = resource('dynamodb').Table(table_name)
+    return _tables[table_name]
+
+
+class _LazyProxy:
+    """
+    Crea el objeto real en el primer acceso a un atributo
+    Permite declarar los clientes a nivel de módulo sin pagar su construcción en el arranque
+    """
+    def __init__(self, factory, *args):
+        self._factory = factory
+        self._args = args
+
+    def __getattr__(self, name):
+        return getattr(self._factory(*self._args), name)
+
+
+def lazy_client(service_name):
+    return _LazyProxy(client, service_name)
+
+
+def lazy_table(table_name):
+    return _LazyProxy(table, table_name)
+
+
+def prime(services=(), tables=(), imports=()):
+    """
+    Construye por adelantado los clientes, tablas y módulos pesados que usa un handler
+    """
+    for module_name in imports:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            print(f"Priming: {module_name} not available")
+    for service_name in services:
+        client(service_name)
+    for table_name in tables:
+        table(table_name)
+
+
+def register_priming(services=(), tables=(), imports=()):
+    """
+    Con SnapStart, prime() se ejecuta antes del snapshot (queda incluido en la imagen restaurada)
+    Sin SnapStart solo se ejecuta en el init si PRIME_ON_INIT=true; por defecto todo se crea al primer uso
+    """
+    try:
+        from snapshot_restore_py import register_before_snapshot
+    except ImportError:
+        if os.environ.get('PRIME_ON_INIT', 'false').lower() == 'true':
+            prime(services, tables, imports)
+        return
+
+    register_before_snapshot(lambda: prime(services, tables, imports))
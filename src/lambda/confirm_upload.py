@@ -1,20 +1,160 @@
 """
 Lambda Function: Confirm Upload
 Confirma que la imagen fue subida y dispara el proceso de filtrado
+Se dispara con el evento ObjectCreated del Raw Bucket; el endpoint POST /confirm se mantiene como respaldo
 """
 import json
-import boto3
 import os
+import re
+from urllib.parse import unquote_plus
+import aws_clients
+import image_normalizer
+import status_transitions
+import notification_batcher
+import metrics
 
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-sns_client = boto3.client('sns')
+s3_client = aws_clients.lazy_client('s3')
 
 RAW_BUCKET = os.environ['RAW_BUCKET']
 METADATA_TABLE = os.environ['METADATA_TABLE']
 SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
 
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB (la URL pre-firmada no limita el tamaño)
+
+# Clave generada por generate_upload_url: raw/{user_id}/{screenshot_id}.{ext}
+RAW_KEY_PATTERN = re.compile(r'^raw/(?P<user_id>[^/]+)/(?P<screenshot_id>[^/.]+)\.(?P<extension>[A-Za-z0-9]+)$')
+
+aws_clients.register_priming(services=['s3', 'sns'], tables=[METADATA_TABLE])
+
 def lambda_handler(event, context):
+    # Una línea de métricas por invocación con la latencia de cada etapa
+    metrics.start_timer(source='s3_event' if 'Records' in event else 'api')
+    try:
+        if 'Records' in event:
+            return handle_s3_event(event)
+        return handle_api_request(event)
+    finally:
+        metrics.finish_timer()
+
+def handle_s3_event(event):
+    """
+    Confirma las subidas a partir del evento de S3 (sin get_item ni head_object)
+    Las subidas de image_uploader también generan el evento: su status no es PENDING_UPLOAD y se ignoran
+    """
+    failed = []
+    # Los trabajos de filtrado del evento se publican juntos (publish_batch)
+    filter_jobs = new_filter_batch()
+    confirmed = {}
+    for record in event['Records']:
+        if not record.get('eventName', '').startswith('ObjectCreated'):
+            continue
+        
+        s3_key = unquote_plus(record['s3']['object']['key'])
+        match = RAW_KEY_PATTERN.match(s3_key)
+        if not match:
+            print(f"Ignoring object outside the upload layout: {s3_key}")
+            continue
+        
+        screenshot_id = match.group('screenshot_id')
+        user_id = match.group('user_id')
+        file_size = record['s3']['object'].get('size', 0)
+        
+        try:
+            if file_size > MAX_FILE_SIZE:
+                if reject_upload(screenshot_id, user_id, file_size, f'File too large. Max size: {MAX_FILE_SIZE / (1024*1024):.1f}MB'):
+                    # Nunca llega al filtro: se borra ya en lugar de esperar al ciclo de vida
+                    with metrics.stage('S3Delete'):
+                        s3_client.delete_object(Bucket=RAW_BUCKET, Key=s3_key)
+            else:
+                job_id = confirm_screenshot(screenshot_id, user_id, s3_key, file_size, filter_jobs)
+                if job_id:
+                    confirmed[screenshot_id] = (job_id, s3_key)
+        except Exception as e:
+            print(f"Error confirming {s3_key}: {str(e)}")
+            failed.append(s3_key)
+    
+    not_published = publish_filter_jobs(filter_jobs, confirmed)
+    failed.extend(confirmed[screenshot_id][1] for screenshot_id in not_published)
+    print(f"Uploads confirmed from S3 event: {len(confirmed) - len(not_published)}")
+    
+    if failed:
+        # Lambda reintenta el evento asíncrono; las subidas ya confirmadas no cumplen la condición
+        raise RuntimeError(f"Failed to confirm {len(failed)} uploads: {failed}")
+    
+    return {'processed': len(event['Records'])}
+
+def new_filter_batch():
+    return notification_batcher.NotificationBatch(SNS_TOPIC_ARN, 'New Screenshot for Profanity Filter')
+
+def confirm_screenshot(screenshot_id, user_id, s3_key, file_size, filter_jobs):
+    """
+    PENDING_UPLOAD -> PROCESSING con una escritura condicional y encola el trabajo de filtrado
+    Se publica con publish_filter_jobs
+    Retorna: job_id si se confirmó, None si ya estaba confirmado (o no es de este usuario)
+    """
+    job_id = status_transitions.new_job_id()
+    with metrics.stage('ConfirmTransition'):
+        confirmed = status_transitions.transition(
+            aws_clients.table(METADATA_TABLE), screenshot_id,
+            from_statuses=(status_transitions.PENDING_UPLOAD,),
+            to_status=status_transitions.PROCESSING,
+            values={'file_size': file_size, 'moderation_job_id': job_id},
+            condition='user_id = :user_id',
+            condition_values={':user_id': user_id}
+        )
+    if confirmed is None:
+        print(f"Screenshot {screenshot_id} not pending upload, skipping")
+        return None
+    
+    filter_jobs.add({
+        'screenshot_id': screenshot_id,
+        'user_id': user_id,
+        's3_key': s3_key,
+        'bucket': RAW_BUCKET,
+        'job_id': job_id
+    }, key=screenshot_id)
+    return job_id
+
+def publish_filter_jobs(filter_jobs, confirmed):
+    """
+    Publica los trabajos encolados; los que no se publicaron vuelven a PENDING_UPLOAD para que el reintento
+    pueda confirmarlos de nuevo
+    confirmed: screenshot_id -> (job_id, s3_key)
+    Retorna: screenshot_ids que no se pudieron publicar
+    """
+    with metrics.stage('PublishFilterJobs'):
+        failed = filter_jobs.flush()
+    for screenshot_id in failed:
+        status_transitions.transition(
+            aws_clients.table(METADATA_TABLE), screenshot_id,
+            from_statuses=(status_transitions.PROCESSING,),
+            to_status=status_transitions.PENDING_UPLOAD,
+            remove=('moderation_job_id',),
+            condition='moderation_job_id = :job_id',
+            condition_values={':job_id': confirmed[screenshot_id][0]}
+        )
+    return failed
+
+def reject_upload(screenshot_id, user_id, file_size, reason):
+    """
+    Marca como rechazada una subida inválida sin enviarla al filtro
+    Retorna: True si se rechazó, False si ya no estaba pendiente
+    """
+    print(f"Upload rejected: {screenshot_id} - {reason}")
+    with metrics.stage('RejectTransition'):
+        return status_transitions.transition(
+            aws_clients.table(METADATA_TABLE), screenshot_id,
+            from_statuses=(status_transitions.PENDING_UPLOAD,),
+            to_status=status_transitions.REJECTED,
+            values={'file_size': file_size, 'rejection_reasons': [reason]},
+            condition='user_id = :user_id',
+            condition_values={':user_id': user_id}
+        ) is not None
+
+def handle_api_request(event):
+    """
+    Confirmación explícita del cliente (POST /confirm)
+    """
     try:
         # Parse request body
         body = json.loads(event['body'])
@@ -25,10 +165,12 @@ def lambda_handler(event, context):
             return response(400, {'error': 'Missing screenshot_id'})
         
         screenshot_id = body['screenshot_id']
+        metrics.current_timer().properties['screenshot_id'] = screenshot_id
         
         # Get metadata from DynamoDB
-        table = dynamodb.Table(METADATA_TABLE)
-        item_response = table.get_item(Key={'screenshot_id': screenshot_id})
+        table = aws_clients.table(METADATA_TABLE)
+        with metrics.stage('GetItem'):
+            item_response = table.get_item(Key={'screenshot_id': screenshot_id})
         
         if 'Item' not in item_response:
             return response(404, {'error': 'Screenshot not found'})
@@ -42,33 +184,37 @@ def lambda_handler(event, context):
         # Verify file exists in S3
         s3_key = item['raw_s3_key']
         try:
-            s3_response = s3_client.head_object(Bucket=RAW_BUCKET, Key=s3_key)
+            with metrics.stage('S3Head'):
+                s3_response = s3_client.head_object(Bucket=RAW_BUCKET, Key=s3_key)
             file_size = s3_response['ContentLength']
         except:
             return response(400, {'error': 'File not uploaded to S3'})
         
-        # Update metadata
-        table.update_item(
-            Key={'screenshot_id': screenshot_id},
-            UpdateExpression='SET #status = :status, file_size = :size',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'PROCESSING',
-                ':size': file_size
-            }
-        )
+        # Verify the uploaded bytes are the declared image type (solo se leen los primeros bytes)
+        with metrics.stage('S3Probe'):
+            header = s3_client.get_object(
+                Bucket=RAW_BUCKET,
+                Key=s3_key,
+                Range=f'bytes=0-{image_normalizer.SNIFF_BYTES - 1}'
+            )['Body'].read()
+        if not image_normalizer.matches_extension(header, item.get('extension', '')):
+            return response(400, {'error': 'Uploaded file is not a valid image of the declared type'})
+        
+        if file_size > MAX_FILE_SIZE:
+            return response(400, {'error': f'File too large. Max size: {MAX_FILE_SIZE / (1024*1024):.1f}MB'})
         
-        # Send SNS notification for profanity filtering
-        sns_client.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Message=json.dumps({
+        filter_jobs = new_filter_batch()
+        job_id = confirm_screenshot(screenshot_id, user_id, s3_key, file_size, filter_jobs)
+        if not job_id:
+            # Ya confirmado (p. ej. por el evento de S3): la llamada es idempotente
+            return response(200, {
+                'message': 'Upload already confirmed',
                 'screenshot_id': screenshot_id,
-                'user_id': user_id,
-                's3_key': s3_key,
-                'bucket': RAW_BUCKET
-            }),
-            Subject='New Screenshot for Profanity Filter'
-        )
+                'status': item['status']
+            })
+        
+        if publish_filter_jobs(filter_jobs, {screenshot_id: (job_id, s3_key)}):
+            return response(500, {'error': 'Internal server error', 'details': 'Could not start processing'})
         
         return response(200, {
             'message': 'Upload confirmed, processing started',
@@ -0,0 +1,68 @@
+"""
+Módulo: Content Prescreen
+Clasificación local y barata de la imagen antes de pagar llamadas a Rekognition
+Solo usa la cabecera ya leída (PROBE_BYTES) y las dimensiones de image_normalizer.probe_header:
+- 'game_ui': PNG/JPEG a una resolución de pantalla exacta y sin datos de cámara
+- 'camera_photo': JPEG con EXIF de cámara (Make/Model)
+"""
+import struct
+
+GAME_UI = 'game_ui'
+CAMERA_PHOTO = 'camera_photo'
+
+# Resoluciones de pantalla habituales (PC, consolas, Steam Deck) en horizontal
+SCREEN_RESOLUTIONS = {
+    (800, 600), (1024, 768), (1280, 720), (1280, 800), (1280, 1024), (1360, 768), (1366, 768),
+    (1440, 900), (1600, 900), (1680, 1050), (1920, 1080), (1920, 1200), (2560, 1080),
+    (2560, 1440), (2560, 1600), (3440, 1440), (3840, 1600), (3840, 2160),
+}
+
+# Etiquetas TIFF del IFD0 que solo escriben las cámaras (Make, Model)
+CAMERA_EXIF_TAGS = (0x010F, 0x0110)
+
+
+def has_camera_exif(header):
+    """
+    True si la cabecera JPEG incluye un bloque EXIF con fabricante o modelo de cámara
+    Las capturas de Steam/consolas no tienen EXIF o solo indican el software
+    """
+    start = header.find(b'Exif\x00\x00')
+    if start < 0:
+        return False
+
+    tiff = header[start + 6:]
+    if tiff[:2] == b'II':
+        order = '<'
+    elif tiff[:2] == b'MM':
+        order = '>'
+    else:
+        return False
+
+    try:
+        ifd_offset = struct.unpack(f'{order}I', tiff[4:8])[0]
+        entries = struct.unpack(f'{order}H', tiff[ifd_offset:ifd_offset + 2])[0]
+        for index in range(entries):
+            entry = ifd_offset + 2 + index * 12
+            tag = struct.unpack(f'{order}H', tiff[entry:entry + 2])[0]
+            if tag in CAMERA_EXIF_TAGS:
+                return True
+    except struct.error:
+        # EXIF truncado (más allá de PROBE_BYTES) o corrupto: sin clasificar
+        return False
+    return False
+
+
+def classify(header, image_info):
+    """
+    Retorna: GAME_UI, CAMERA_PHOTO o None si la imagen no se puede clasificar localmente
+    image_info: resultado de image_normalizer.probe_header (format, width, height)
+    """
+    image_format = image_info.get('format')
+    if image_format == 'jpeg' and has_camera_exif(header):
+        return CAMERA_PHOTO
+
+    if image_format in ('png', 'jpeg') and 'width' in image_info:
+        size = (image_info['width'], image_info['height'])
+        if size in SCREEN_RESOLUTIONS or size[::-1] in SCREEN_RESOLUTIONS:
+            return GAME_UI
+    return None
@@ -3,13 +3,13 @@ Lambda Function: Generate Upload URL
 Genera URLs pre-firmadas para subir imágenes directamente a S3
 """
 import json
-import boto3
 import uuid
 import os
+import aws_clients
+import status_transitions
 from datetime import datetime
 
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = aws_clients.lazy_client('s3')
 
 RAW_BUCKET = os.environ['RAW_BUCKET']
 METADATA_TABLE = os.environ['METADATA_TABLE']
@@ -17,74 +17,154 @@ METADATA_TABLE = os.environ['METADATA_TABLE']
 ALLOWED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+UPLOAD_URL_EXPIRATION = 300  # URL válida por 5 minutos
+# Subida múltiple (body con 'files'): una sola invocación para toda la sesión de capturas
+MAX_BULK_FILES = int(os.environ.get('MAX_BULK_FILES', '50'))
+BULK_URL_EXPIRATION = int(os.environ.get('BULK_URL_EXPIRATION', '900'))  # más archivos tardan más en subirse
+
+aws_clients.register_priming(services=['s3'], tables=[METADATA_TABLE])
+
 def lambda_handler(event, context):
     try:
         # Parse request body
         body = json.loads(event['body'])
         user_id = event['requestContext']['authorizer']['claims']['sub']
         
+        if 'files' in body:
+            return handle_bulk_request(body, user_id)
+        
         # Validate required fields
         if 'filename' not in body:
             return response(400, {'error': 'Missing filename'})
         
-        filename = body['filename']
-        game_title = body.get('game_title', 'Unknown')
-        description = body.get('description', '')
-        content_type = body.get('content_type', 'image/png')
-        
         # Validate file extension
-        extension = filename.split('.')[-1].lower()
-        if extension not in ALLOWED_EXTENSIONS:
-            return response(400, {'error': f'Invalid file type. Allowed: {ALLOWED_EXTENSIONS}'})
-        
-        # Generate unique ID
-        screenshot_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
-        s3_key = f"raw/{user_id}/{screenshot_id}.{extension}"
+        error = validate_file(body)
+        if error:
+            return response(400, {'error': error})
         
-        # Generate pre-signed URL for upload
-        presigned_url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': RAW_BUCKET,
-                'Key': s3_key,
-                'ContentType': content_type,
-                'Metadata': {
-                    'user_id': user_id,
-                    'screenshot_id': screenshot_id,
-                    'upload_timestamp': timestamp
-                }
-            },
-            ExpiresIn=300  # URL válida por 5 minutos
-        )
+        item, upload = build_upload(user_id, body, {}, UPLOAD_URL_EXPIRATION)
         
         # Store initial metadata in DynamoDB
-        table = dynamodb.Table(METADATA_TABLE)
-        table.put_item(
-            Item={
-                'screenshot_id': screenshot_id,
-                'user_id': user_id,
-                'filename': filename,
-                'game_title': game_title,
-                'description': description,
-                'upload_timestamp': timestamp,
-                'status': 'PENDING_UPLOAD',
-                'raw_s3_key': s3_key,
-                'extension': extension
-            }
-        )
+        table = aws_clients.table(METADATA_TABLE)
+        table.put_item(Item=item)
+        # Invalida las respuestas cacheadas de image_retrieval (la galería tiene un item PENDING_UPLOAD más)
+        status_transitions.bump_gallery_version(table, user_id)
         
-        return response(200, {
-            'screenshot_id': screenshot_id,
-            'upload_url': presigned_url,
-            's3_key': s3_key,
-            'expires_in': 300
-        })
+        upload['expires_in'] = UPLOAD_URL_EXPIRATION
+        return response(200, upload)
         
     except Exception as e:
         print(f"Error: {str(e)}")
         return response(500, {'error': 'Internal server error', 'details': str(e)})
 
+def handle_bulk_request(body, user_id):
+    """
+    Genera las URLs de varios archivos en una sola petición
+    Body: {'files': [{'filename', 'content_type', 'game_title', 'description'}, ...], 'game_title', 'description'}
+    Los campos del nivel superior se aplican a los archivos que no los indican
+    """
+    files = body['files']
+    if not isinstance(files, list) or not files:
+        return response(400, {'error': 'files must be a non-empty list'})
+    if len(files) > MAX_BULK_FILES:
+        return response(400, {'error': f'Too many files. Max per request: {MAX_BULK_FILES}'})
+    
+    # Se valida todo antes de escribir nada: la petición se acepta o rechaza completa
+    errors = []
+    for index, file_spec in enumerate(files):
+        if not isinstance(file_spec, dict) or 'filename' not in file_spec:
+            errors.append({'index': index, 'error': 'Missing filename'})
+            continue
+        error = validate_file(file_spec)
+        if error:
+            errors.append({'index': index, 'error': error})
+    if errors:
+        return response(400, {'error': 'Invalid files', 'files': errors})
+    
+    # Las URLs pre-firmadas se generan localmente (sin llamadas a S3)
+    uploads = [build_upload(user_id, file_spec, body, BULK_URL_EXPIRATION) for file_spec in files]
+    
+    # batch_writer agrupa las escrituras en BatchWriteItem de 25 y reintenta los items no procesados
+    table = aws_clients.table(METADATA_TABLE)
+    with table.batch_writer() as batch:
+        for item, _ in uploads:
+            batch.put_item(Item=item)
+    # Una sola invalidación por petición: todos los items son del mismo usuario
+    status_transitions.bump_gallery_version(table, user_id)
+    
+    return response(200, {
+        'uploads': [upload for _, upload in uploads],
+        'expires_in': BULK_URL_EXPIRATION
+    })
+
+def validate_file(file_spec):
+    """
+    Retorna: mensaje de error, o None si el archivo es válido
+    """
+    extension = file_spec['filename'].split('.')[-1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        return f'Invalid file type. Allowed: {ALLOWED_EXTENSIONS}'
+    return None
+
+def build_upload(user_id, file_spec, defaults, expires_in):
+    """
+    Genera el id, la URL pre-firmada y el item inicial de un archivo
+    Retorna: (item para DynamoDB, datos de subida para el cliente)
+    """
+    filename = file_spec['filename']
+    game_title = file_spec.get('game_title', defaults.get('game_title', 'Unknown'))
+    description = file_spec.get('description', defaults.get('description', ''))
+    content_type = file_spec.get('content_type', 'image/png')
+    extension = filename.split('.')[-1].lower()
+    
+    # Generate unique ID
+    screenshot_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat()
+    s3_key = f"raw/{user_id}/{screenshot_id}.{extension}"
+    
+    # Generate pre-signed URL for upload
+    # ChecksumAlgorithm: S3 exige x-amz-checksum-sha256 y lo guarda, así profanity_filter consulta la
+    # caché de veredictos sin descargar la imagen
+    presigned_url = s3_client.generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': RAW_BUCKET,
+            'Key': s3_key,
+            'ContentType': content_type,
+            'ChecksumAlgorithm': 'SHA256',
+            'Metadata': {
+                'user_id': user_id,
+                'screenshot_id': screenshot_id,
+                'upload_timestamp': timestamp
+            }
+        },
+        ExpiresIn=expires_in
+    )
+    
+    item = {
+        'screenshot_id': screenshot_id,
+        'user_id': user_id,
+        'filename': filename,
+        'game_title': game_title,
+        'description': description,
+        'upload_timestamp': timestamp,
+        'status': 'PENDING_UPLOAD',
+        'raw_s3_key': s3_key,
+        'extension': extension
+    }
+    upload = {
+        'screenshot_id': screenshot_id,
+        'upload_url': presigned_url,
+        # Cabeceras del PUT; el cliente añade x-amz-checksum-sha256 con el SHA-256 del archivo en base64
+        'upload_headers': {
+            'Content-Type': content_type,
+            'x-amz-sdk-checksum-algorithm': 'SHA256'
+        },
+        's3_key': s3_key,
+        'filename': filename
+    }
+    return item, upload
+
 def response(status_code, body):
     return {
         'statusCode': status_code,
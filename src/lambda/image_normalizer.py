@@ -0,0 +1,172 @@
+"""
+Módulo: Image Normalizer
+Valida el contenido real de las imágenes (magic bytes) y las prepara para Rekognition
+La detección de formato no necesita Pillow; la normalización usa Pillow si está disponible (Layer)
+"""
+import io
+import os
+
+# Pillow se importa al primer uso (el uploader solo necesita sniff_format)
+_pillow = None
+
+# Rekognition acepta JPEG/PNG de hasta 5MB como bytes y de hasta 15MB como S3Object
+REKOGNITION_MAX_BYTES = 5 * 1024 * 1024
+REKOGNITION_S3_MAX_BYTES = 15 * 1024 * 1024
+# Lado mayor de la imagen enviada a Rekognition; 1920 mantiene legible el texto de la UI del juego
+NORMALIZE_MAX_DIMENSION = int(os.environ.get('NORMALIZE_MAX_DIMENSION', '1920'))
+NORMALIZE_JPEG_QUALITY = int(os.environ.get('NORMALIZE_JPEG_QUALITY', '90'))
+# Límite de píxeles (evita decompression bombs); 8K = ~33M píxeles
+NORMALIZE_MAX_PIXELS = int(os.environ.get('NORMALIZE_MAX_PIXELS', str(40 * 1000 * 1000)))
+
+# Bytes necesarios para reconocer cualquiera de los formatos soportados
+SNIFF_BYTES = 12
+# Bytes leídos para conocer las dimensiones sin descargar la imagen (cubre cabeceras EXIF grandes en JPEG)
+PROBE_BYTES = 64 * 1024
+
+# Extensión permitida -> formato real esperado
+EXTENSION_FORMATS = {
+    'jpg': 'jpeg',
+    'jpeg': 'jpeg',
+    'png': 'png',
+    'gif': 'gif',
+    'webp': 'webp'
+}
+
+REKOGNITION_FORMATS = ('jpeg', 'png')
+
+
+def load_pillow():
+    """
+    Importa Pillow una sola vez
+    Retorna: el módulo PIL.Image, o None si no está disponible (solo con el Layer de Pillow)
+    """
+    global _pillow
+
+    if _pillow is None:
+        try:
+            from PIL import Image
+            _pillow = Image
+        except ImportError:
+            _pillow = False
+    return _pillow or None
+
+
+class InvalidImageError(ValueError):
+    """
+    La imagen no es de un formato soportado o no se puede decodificar
+    """
+
+
+def sniff_format(header):
+    """
+    Detecta el formato por los primeros bytes del archivo
+    Retorna: 'jpeg', 'png', 'gif', 'webp' o None
+    """
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def matches_extension(header, extension):
+    """
+    True si el contenido corresponde a la extensión declarada (jpg y jpeg son equivalentes)
+    """
+    detected = sniff_format(header)
+    return detected is not None and detected == EXTENSION_FORMATS.get(extension.lower())
+
+
+def probe_header(header):
+    """
+    Lee formato y dimensiones de los primeros bytes del archivo sin decodificar la imagen
+    Retorna: dict con format, y width/height si Pillow está disponible y la cabecera alcanza
+    """
+    info = {'format': sniff_format(header[:SNIFF_BYTES])}
+
+    Image = load_pillow()
+    if info['format'] is None or Image is None:
+        return info
+
+    try:
+        with Image.open(io.BytesIO(header)) as img:
+            info['width'], info['height'] = img.size
+    except Exception as e:
+        print(f"Image header could not be parsed: {str(e)}")
+    return info
+
+
+def fits_rekognition_s3(info, file_size):
+    """
+    True si Rekognition puede leer el objeto directamente de S3 sin normalizarlo
+    Con Pillow se exigen dimensiones conocidas dentro de NORMALIZE_MAX_DIMENSION
+    """
+    if info['format'] not in REKOGNITION_FORMATS or file_size > REKOGNITION_S3_MAX_BYTES:
+        return False
+    if 'width' not in info:
+        # Sin Pillow la ruta de bytes tampoco normaliza
+        return load_pillow() is None
+    return max(info['width'], info['height']) <= NORMALIZE_MAX_DIMENSION
+
+
+def normalize_for_analysis(image_bytes):
+    """
+    Prepara la imagen para Rekognition: decodifica, reduce a NORMALIZE_MAX_DIMENSION y re-codifica
+    Las imágenes ya aptas (JPEG/PNG pequeños) se devuelven sin tocar
+    Retorna: (bytes para analizar, dict con formato y tamaños)
+    Lanza: InvalidImageError si el archivo no es una imagen válida
+    """
+    image_format = sniff_format(image_bytes[:SNIFF_BYTES])
+    if image_format is None:
+        raise InvalidImageError('Unsupported or unrecognized image format')
+
+    info = {'format': image_format, 'original_bytes': len(image_bytes)}
+
+    Image = load_pillow()
+    if Image is None:
+        # Sin Pillow solo se puede validar la cabecera
+        info['analysis_bytes'] = len(image_bytes)
+        return image_bytes, info
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            width, height = img.size
+            info['width'], info['height'] = width, height
+            if width * height > NORMALIZE_MAX_PIXELS:
+                raise InvalidImageError(f'Image too large: {width}x{height}')
+
+            fits = (
+                image_format in REKOGNITION_FORMATS
+                and max(width, height) <= NORMALIZE_MAX_DIMENSION
+                and len(image_bytes) <= REKOGNITION_MAX_BYTES
+            )
+            if fits:
+                # Decodificar completo detecta archivos truncados o corruptos
+                img.load()
+                info['analysis_bytes'] = len(image_bytes)
+                return image_bytes, info
+
+            # JPEG: decodificar directamente a escala reducida (mucho más rápido en imágenes 4K)
+            scale = min(1.0, NORMALIZE_MAX_DIMENSION / max(width, height))
+            img.draft('RGB', (int(width * scale), int(height * scale)))
+            # GIF/WebP animados: se analiza el primer frame
+            img.seek(0)
+            frame = img if img.mode in ('RGB', 'L') else img.convert('RGB')
+            # reducing_gap reduce primero por bloques y luego aplica LANCZOS (varias veces más rápido)
+            frame.thumbnail((NORMALIZE_MAX_DIMENSION, NORMALIZE_MAX_DIMENSION), Image.LANCZOS, reducing_gap=2.0)
+
+            buffer = io.BytesIO()
+            frame.save(buffer, format='JPEG', quality=NORMALIZE_JPEG_QUALITY)
+    except InvalidImageError:
+        raise
+    except Exception as e:
+        raise InvalidImageError(f'Image could not be decoded: {str(e)}')
+
+    normalized = buffer.getvalue()
+    info['analysis_bytes'] = len(normalized)
+    info['analysis_size'] = frame.size
+    return normalized, info
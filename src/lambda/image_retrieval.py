@@ -4,24 +4,61 @@ Recupera capturas de pantalla del usuario con URLs firmadas
 Versión mejorada con GSI para queries eficientes y soporte CloudFront
 """
 import json
-import boto3
+import base64
+import binascii
+import hashlib
+import hmac
+import time
 import os
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
 
-dynamodb = boto3.resource('dynamodb')
-s3_client = boto3.client('s3')
+import aws_clients
+import url_signer
+import metrics
 
 METADATA_TABLE = os.environ['METADATA_TABLE']
-PROCESSED_BUCKET = os.environ['PROCESSED_BUCKET']
-CLOUDFRONT_DOMAIN = os.environ.get('CLOUDFRONT_DOMAIN', '')
+USER_INDEX_NAME = os.environ.get('USER_INDEX_NAME', 'UserIdIndex')
+STATUS_INDEX_NAME = os.environ.get('STATUS_INDEX_NAME', 'StatusIndex')
 
 # Configuración
 DEFAULT_LIMIT = 50
 MAX_LIMIT = 100
-URL_EXPIRATION = 3600  # 1 hora
+MAX_QUERY_PAGES = int(os.environ.get('MAX_QUERY_PAGES', '5'))  # queries máximos por página
+QUERY_BATCH_SIZE = int(os.environ.get('QUERY_BATCH_SIZE', '50'))  # items leídos como mínimo por query
+
+# Caché de respuestas en el contenedor: (usuario, status, limit, cursor) -> (expira, versión, etag, body)
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '10'))  # segundos
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '256'))
+GALLERY_VERSION_PREFIX = 'gallery_version#'
+_response_cache = OrderedDict()
+
+# Clave para firmar los tokens de paginación
+PAGINATION_SECRET = os.environ.get('PAGINATION_SECRET', '')
+if PAGINATION_SECRET:
+    PAGINATION_SECRET = PAGINATION_SECRET.encode()
+else:
+    # Sin secreto configurado los tokens solo son válidos en este contenedor
+    print("PAGINATION_SECRET not set, using a per-container key")
+    PAGINATION_SECRET = os.urandom(32)
+
+# Con CloudFront las URLs no usan S3: el cliente de S3 ni siquiera se crea
+aws_clients.register_priming(
+    services=[] if url_signer.CLOUDFRONT_DOMAIN else ['s3'],
+    tables=[METADATA_TABLE]
+)
 
 def lambda_handler(event, context):
+    # Una línea de métricas por petición con la latencia de cada etapa
+    metrics.start_timer()
+    try:
+        return handle_request(event)
+    finally:
+        metrics.finish_timer()
+
+def handle_request(event):
     try:
         # Get user ID from authorizer
         user_id = event['requestContext']['authorizer']['claims']['sub']
@@ -30,20 +67,56 @@ def lambda_handler(event, context):
         params = event.get('queryStringParameters', {}) or {}
         status_filter = params.get('status', 'APPROVED')
         limit = min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+        next_token = params.get('next_token')
         
         # Determine query method based on path
         path = event.get('path', '')
+        is_all = '/all' in path
         
-        if '/all' in path:
-            # Admin endpoint - get all screenshots (requires admin role check)
-            screenshots = get_all_screenshots(status_filter, limit)
+        headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+        if_none_match = headers.get('if-none-match')
+        
+        # Caché de respuestas: el endpoint de usuario se valida contra la versión de su galería
+        cache_key = ('all' if is_all else user_id, status_filter, limit, next_token)
+        with metrics.stage('GalleryVersion'):
+            version = None if is_all else get_gallery_version(user_id)
+        cached = get_cached_response(cache_key, version)
+        metrics.current_timer().properties['response_cache_hit'] = bool(cached)
+        
+        if cached:
+            etag, body = cached
         else:
-            # User endpoint - get user's screenshots
-            screenshots = get_user_screenshots(user_id, status_filter, limit)
+            if is_all:
+                # Admin endpoint - get all screenshots (requires admin role check)
+                items, new_next_token = get_all_items(status_filter, limit, next_token)
+            else:
+                # User endpoint - get user's screenshots
+                items, new_next_token = get_user_items(user_id, status_filter, limit, next_token)
+            
+            etag = compute_etag(items, new_next_token)
+            if if_none_match == etag:
+                # El cliente ya tiene esta página: no se formatea ni se firma nada
+                return response_not_modified(etag, url_signer.signed_cookies())
+            
+            with metrics.stage('SignUrls'):
+                screenshots = [format_screenshot_item(item) for item in items]
+            body = {
+                'count': len(screenshots),
+                'screenshots': screenshots
+            }
+            if new_next_token:
+                body['next_token'] = new_next_token
+            
+            put_cached_response(cache_key, version, etag, body)
         
-        return response_success(200, {
-            'count': len(screenshots),
-            'screenshots': screenshots
+        if if_none_match == etag:
+            return response_not_modified(etag, url_signer.signed_cookies())
+        
+        return response_success(200, body, url_signer.signed_cookies(), {
+            'ETag': etag,
+            'Cache-Control': 'private, no-cache'
         })
         
     except ValueError as e:
@@ -55,78 +128,187 @@ def lambda_handler(event, context):
         traceback.print_exc()
         return response_success(500, {'error': 'Internal server error'})
 
-def get_user_screenshots(user_id, status_filter, limit):
+def query_index(index_name, **query_args):
     """
-    Obtiene screenshots de un usuario específico usando GSI
+    Ejecuta un query sobre un GSI de la tabla de metadata
+    Si el índice no existe falla de inmediato (nunca se hace scan de la tabla completa)
     """
-    table = dynamodb.Table(METADATA_TABLE)
+    table = aws_clients.table(METADATA_TABLE)
     
     try:
-        # Query usando GSI user-index (más eficiente que scan)
-        response = table.query(
-            IndexName='user-index',
-            KeyConditionExpression=Key('user_id').eq(user_id),
-            ScanIndexForward=False,  # Orden descendente por timestamp
-            Limit=limit
-        )
-        
-        items = response.get('Items', [])
-        
-        # Filtrar por status si se especifica
-        if status_filter:
-            items = [item for item in items if item.get('status') == status_filter]
-        
-    except Exception as e:
-        print(f"GSI query failed, falling back to scan: {str(e)}")
-        # Fallback a scan si GSI no existe
-        response = table.scan(
-            FilterExpression=Key('user_id').eq(user_id),
-            Limit=limit
-        )
-        items = response.get('Items', [])
-        items = [item for item in items if item.get('status') == status_filter]
-        items.sort(key=lambda x: x.get('upload_timestamp', 0), reverse=True)
+        with metrics.stage('Query'):
+            response = table.query(
+                IndexName=index_name,
+                ReturnConsumedCapacity='INDEXES',
+                **query_args
+            )
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('ValidationException', 'ResourceNotFoundException'):
+            raise RuntimeError(f"Index misconfiguration: {index_name} on {METADATA_TABLE}: {str(e)}") from e
+        raise
     
-    # Formatear screenshots
-    screenshots = []
-    for item in items:
-        screenshot = format_screenshot_item(item)
-        screenshots.append(screenshot)
+    consumed = response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+    print(f"Query {index_name}: {response.get('Count', 0)} items, {response.get('ScannedCount', 0)} scanned, {consumed} RCU")
     
-    return screenshots
+    return response
 
-def get_all_screenshots(status_filter, limit):
+def encode_token(last_key, scope):
     """
-    Obtiene todos los screenshots usando GSI status-index
+    Genera un token de paginación opaco y firmado (HMAC-SHA256) a partir de ExclusiveStartKey
+    El scope (usuario/status) evita reutilizar el token en otra consulta
+    """
+    payload = json.dumps({'k': last_key, 's': scope}, sort_keys=True, separators=(',', ':')).encode()
+    signature = hmac.new(PAGINATION_SECRET, payload, hashlib.sha256).digest()
+    return f"{_b64encode(payload)}.{_b64encode(signature)}"
+
+def decode_token(token, scope):
+    """
+    Valida la firma y el scope del token y retorna el ExclusiveStartKey
     """
-    table = dynamodb.Table(METADATA_TABLE)
-    
     try:
-        # Query usando GSI status-index
-        response = table.query(
-            IndexName='status-index',
-            KeyConditionExpression=Key('status').eq(status_filter),
-            ScanIndexForward=False,
-            Limit=limit
-        )
+        encoded_payload, encoded_signature = token.split('.')
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, binascii.Error):
+        raise ValueError('Invalid pagination token')
+    
+    expected = hmac.new(PAGINATION_SECRET, payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise ValueError('Invalid pagination token')
+    
+    data = json.loads(payload)
+    if data.get('s') != scope:
+        raise ValueError('Invalid pagination token')
+    
+    return data['k']
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def query_page(index_name, key_attributes, scope, limit, next_token, **query_args):
+    """
+    Llena una página de hasta `limit` items después del FilterExpression
+    Hace como máximo MAX_QUERY_PAGES queries para que la latencia no dependa del historial
+    Retorna: (items, next_token) - next_token es None si no hay más resultados
+    """
+    if next_token:
+        query_args['ExclusiveStartKey'] = decode_token(next_token, scope)
+    
+    items = []
+    last_key = None
+    
+    for _ in range(MAX_QUERY_PAGES):
+        response = query_index(index_name, Limit=max(limit, QUERY_BATCH_SIZE), **query_args)
+        page_items = response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        remaining = limit - len(items)
         
-        items = response.get('Items', [])
+        if len(page_items) >= remaining:
+            # Página llena: continuar justo después del último item devuelto
+            items.extend(page_items[:remaining])
+            if len(page_items) > remaining or last_key:
+                last_key = {attribute: items[-1][attribute] for attribute in key_attributes}
+            break
         
-    except Exception as e:
-        print(f"GSI query failed, falling back to scan: {str(e)}")
-        # Fallback a scan
-        response = table.scan(Limit=limit)
-        items = response.get('Items', [])
-        items = [item for item in items if item.get('status') == status_filter]
-        items.sort(key=lambda x: x.get('upload_timestamp', 0), reverse=True)
-    
-    # Formatear screenshots
-    screenshots = []
-    for item in items:
-        screenshot = format_screenshot_item(item)
-        screenshots.append(screenshot)
+        items.extend(page_items)
+        if not last_key:
+            break
+        query_args['ExclusiveStartKey'] = last_key
     
-    return screenshots
+    return items, (encode_token(last_key, scope) if last_key else None)
+
+def get_user_items(user_id, status_filter, limit, next_token=None):
+    """
+    Obtiene screenshots de un usuario específico usando el GSI user_id + upload_timestamp
+    El filtro de status se aplica en DynamoDB (FilterExpression)
+    Retorna: (items sin formatear, next_token)
+    """
+    query_args = {
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+        'ScanIndexForward': False  # Orden descendente por timestamp
+    }
+    if status_filter:
+        query_args['FilterExpression'] = Attr('status').eq(status_filter)
+    
+    items, next_token = query_page(
+        USER_INDEX_NAME,
+        ['screenshot_id', 'user_id', 'upload_timestamp'],
+        f"user:{user_id}:{status_filter}",
+        limit,
+        next_token,
+        **query_args
+    )
+    
+    return items, next_token
+
+def get_all_items(status_filter, limit, next_token=None):
+    """
+    Obtiene todos los screenshots de un status usando el GSI status + upload_timestamp
+    Retorna: (items sin formatear, next_token)
+    """
+    if not status_filter:
+        raise ValueError('status is required for /all')
+    
+    items, next_token = query_page(
+        STATUS_INDEX_NAME,
+        ['screenshot_id', 'status', 'upload_timestamp'],
+        f"all:{status_filter}",
+        limit,
+        next_token,
+        KeyConditionExpression=Key('status').eq(status_filter),
+        ScanIndexForward=False
+    )
+    
+    return items, next_token
+
+def get_gallery_version(user_id):
+    """
+    Versión de la galería del usuario, incrementada en cada item nuevo y cada cambio de status (status_transitions)
+    Es un GetItem de un item sin atributos de los GSI (no aparece en los queries)
+    """
+    item = aws_clients.table(METADATA_TABLE).get_item(
+        Key={'screenshot_id': f"{GALLERY_VERSION_PREFIX}{user_id}"},
+        ProjectionExpression='gallery_version'
+    ).get('Item')
+    return int(item['gallery_version']) if item else 0
+
+def get_cached_response(cache_key, version):
+    """
+    Retorna (etag, body) si hay una respuesta vigente para la misma versión de la galería
+    """
+    entry = _response_cache.get(cache_key)
+    if not entry:
+        return None
+    
+    expires_at, cached_version, etag, body = entry
+    if expires_at < time.time() or cached_version != version:
+        del _response_cache[cache_key]
+        return None
+    
+    _response_cache.move_to_end(cache_key)
+    return etag, body
+
+def put_cached_response(cache_key, version, etag, body):
+    _response_cache[cache_key] = (time.time() + RESPONSE_CACHE_TTL, version, etag, body)
+    _response_cache.move_to_end(cache_key)
+    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+def compute_etag(items, next_token):
+    """
+    ETag a partir de id/status/timestamps de los items, el cursor siguiente y la ventana de firma
+    (las URLs firmadas cambian al cambiar la ventana, así que el ETag también)
+    """
+    digest = hashlib.sha256()
+    for item in items:
+        digest.update(
+            f"{item['screenshot_id']}|{item.get('status')}|{item.get('processed_timestamp', '')}|{item.get('upload_timestamp', '')}\n".encode()
+        )
+    digest.update(f"{next_token or ''}|{url_signer.aligned_expiry()}".encode())
+    return f'"{digest.hexdigest()[:32]}"'
 
 def format_screenshot_item(item):
     """
@@ -138,7 +320,7 @@ def format_screenshot_item(item):
         'game_title': item.get('game_title', 'Unknown'),
         'description': item.get('description', ''),
         'filename': item.get('filename', ''),
-        'upload_timestamp': int(item.get('upload_timestamp', 0)),
+        'upload_timestamp': format_timestamp(item.get('upload_timestamp', 0)),
         'status': item['status'],
         'file_size': int(item.get('file_size', 0)),
         'extension': item.get('extension', '')
@@ -160,41 +342,43 @@ def format_screenshot_item(item):
     
     return screenshot
 
+def format_timestamp(value):
+    """
+    upload_timestamp se guarda como ISO 8601 (clave del GSI); los items antiguos pueden tener epoch
+    """
+    if isinstance(value, str):
+        return value
+    return int(value)
+
 def generate_signed_url(s3_key):
     """
     Genera URL firmada para acceso temporal a la imagen
-    Usa CloudFront si está disponible, sino S3 presigned URL
+    Usa CloudFront si está disponible, sino S3 presigned URL (ver url_signer)
     """
-    try:
-        # Usar CloudFront si está configurado
-        if CLOUDFRONT_DOMAIN:
-            url = f"https://{CLOUDFRONT_DOMAIN}/{s3_key}"
-            print(f"Generated CloudFront URL for {s3_key}")
-            return url
-        else:
-            # Generar URL firmada de S3
-            url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': PROCESSED_BUCKET,
-                    'Key': s3_key
-                },
-                ExpiresIn=URL_EXPIRATION
-            )
-            print(f"Generated S3 presigned URL for {s3_key}")
-            return url
-    except Exception as e:
-        print(f"Error generating signed URL for {s3_key}: {str(e)}")
-        return None
+    return url_signer.sign_url(s3_key)
 
-def response_success(status_code, body):
-    return {
+def response_success(status_code, body, cookies=None, extra_headers=None):
+    response = {
         'statusCode': status_code,
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,OPTIONS'
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',
+            'Access-Control-Expose-Headers': 'ETag'
         },
         'body': json.dumps(body)
     }
+    if extra_headers:
+        response['headers'].update(extra_headers)
+    if cookies:
+        response['multiValueHeaders'] = {'Set-Cookie': cookies}
+    return response
+
+def response_not_modified(etag, cookies=None):
+    response = response_success(304, None, cookies, {
+        'ETag': etag,
+        'Cache-Control': 'private, no-cache'
+    })
+    response['body'] = ''
+    return response
@@ -2,18 +2,21 @@
 Lambda Function: Image Uploader
 Procesa la carga de capturas de pantalla, valida formato y almacena en S3
 Versión mejorada con validaciones robustas y mejor manejo de errores
+Acepta JSON con la imagen en base64 o el binario directo (Content-Type image/*, metadata en query string)
 """
 import json
-import boto3
 import base64
+import binascii
 import uuid
 from datetime import datetime
-from decimal import Decimal
 import os
+import aws_clients
+import image_normalizer
+import status_transitions
+import metrics
 
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-sns_client = boto3.client('sns')
+s3_client = aws_clients.lazy_client('s3')
+sns_client = aws_clients.lazy_client('sns')
 
 RAW_BUCKET = os.environ['RAW_BUCKET']
 METADATA_TABLE = os.environ['METADATA_TABLE']
@@ -23,18 +26,38 @@ ALLOWED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 MIN_FILE_SIZE = 1024  # 1KB
 
+# Imágenes más grandes que una parte se suben con multipart, decodificando el base64 por bloques
+UPLOAD_PART_SIZE = int(os.environ.get('UPLOAD_PART_SIZE', str(5 * 1024 * 1024)))  # mínimo de S3: 5MB
+DECODE_CHUNK_SIZE = 1024 * 1024  # caracteres base64 decodificados por iteración (múltiplo de 4)
+
+aws_clients.register_priming(services=['s3', 'sns'], tables=[METADATA_TABLE])
+
 def lambda_handler(event, context):
+    # Una línea de métricas por petición con la latencia de cada etapa
+    metrics.start_timer()
+    try:
+        return handle_upload(event)
+    finally:
+        metrics.finish_timer()
+
+def handle_upload(event):
     try:
-        # Parse request body
-        body = json.loads(event['body'])
         user_id = event['requestContext']['authorizer']['claims']['sub']
         
+        if is_binary_upload(event):
+            # API Gateway entrega el binario en base64 sin JSON alrededor
+            body = event.get('queryStringParameters') or {}
+            image_data = event.pop('body', None) or ''
+        else:
+            # Se saca el body del evento para que el JSON original se libere tras el parseo
+            body = json.loads(event.pop('body'))
+            image_data = body.pop('image', None)
+        
         # Validate required fields
-        if 'image' not in body or 'filename' not in body:
+        if not image_data or 'filename' not in body:
             return response(400, {'error': 'Missing required fields: image and filename'})
         
         filename = body['filename']
-        image_data = body['image']
         game_title = body.get('game_title', 'Unknown')
         description = body.get('description', '')
         
@@ -50,15 +73,18 @@ def lambda_handler(event, context):
         if extension not in ALLOWED_EXTENSIONS:
             return response(400, {'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'})
         
-        # Decode base64 image
-        try:
-            image_bytes = base64.b64decode(image_data)
-        except Exception as e:
-            print(f"Base64 decode error: {str(e)}")
+        # Validate file size (calculado sin decodificar el base64)
+        file_size = decoded_size(image_data)
+        if file_size is None:
             return response(400, {'error': 'Invalid base64 image data'})
         
-        # Validate file size
-        file_size = len(image_bytes)
+        # Validate content (magic bytes) against the extension
+        try:
+            header = base64.b64decode(image_data[:16], validate=True)
+        except binascii.Error:
+            return response(400, {'error': 'Invalid base64 image data'})
+        if not image_normalizer.matches_extension(header, extension):
+            return response(400, {'error': f'File content is not a valid {extension} image'})
         if file_size < MIN_FILE_SIZE:
             return response(400, {'error': f'File too small. Min size: {MIN_FILE_SIZE} bytes'})
         if file_size > MAX_FILE_SIZE:
@@ -66,50 +92,60 @@ def lambda_handler(event, context):
         
         # Generate unique ID
         screenshot_id = str(uuid.uuid4())
-        timestamp = int(datetime.utcnow().timestamp())
+        timestamp = datetime.utcnow().isoformat()  # ISO 8601, clave de ordenación de los GSI
         s3_key = f"raw/{user_id}/{screenshot_id}.{extension}"
+        metrics.current_timer().properties['screenshot_id'] = screenshot_id
         
         # Upload to S3 Raw Bucket
-        s3_client.put_object(
-            Bucket=RAW_BUCKET,
-            Key=s3_key,
-            Body=image_bytes,
-            ContentType=f'image/{extension}',
-            Metadata={
-                'user_id': user_id,
-                'screenshot_id': screenshot_id,
-                'upload_timestamp': timestamp
-            }
-        )
+        try:
+            with metrics.stage('S3Upload'):
+                upload_image(image_data, file_size, s3_key, {
+                    'ContentType': f'image/{extension}',
+                    'Metadata': {
+                        'user_id': user_id,
+                        'screenshot_id': screenshot_id,
+                        'upload_timestamp': timestamp
+                    }
+                })
+        except binascii.Error as e:
+            print(f"Base64 decode error: {str(e)}")
+            return response(400, {'error': 'Invalid base64 image data'})
         
-        # Store metadata in DynamoDB
-        table = dynamodb.Table(METADATA_TABLE)
-        table.put_item(
-            Item={
-                'screenshot_id': screenshot_id,
-                'user_id': user_id,
-                'filename': filename,
-                'game_title': game_title,
-                'description': description,
-                'upload_timestamp': Decimal(str(timestamp)),
-                'status': 'PENDING',
-                'raw_s3_key': s3_key,
-                'file_size': file_size,
-                'extension': extension
-            }
-        )
+        # Store metadata in DynamoDB (job_id identifica el trabajo de moderación)
+        job_id = status_transitions.new_job_id()
+        table = aws_clients.table(METADATA_TABLE)
+        with metrics.stage('MetadataWrite'):
+            table.put_item(
+                Item={
+                    'screenshot_id': screenshot_id,
+                    'user_id': user_id,
+                    'filename': filename,
+                    'game_title': game_title,
+                    'description': description,
+                    'upload_timestamp': timestamp,
+                    'status': status_transitions.PENDING,
+                    'raw_s3_key': s3_key,
+                    'file_size': file_size,
+                    'extension': extension,
+                    'moderation_job_id': job_id
+                }
+            )
+            # Invalida las respuestas cacheadas de image_retrieval para este usuario
+            status_transitions.bump_gallery_version(table, user_id)
         
         # Send SNS notification for profanity filtering
-        sns_client.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Message=json.dumps({
-                'screenshot_id': screenshot_id,
-                'user_id': user_id,
-                's3_key': s3_key,
-                'bucket': RAW_BUCKET
-            }),
-            Subject='New Screenshot for Profanity Filter'
-        )
+        with metrics.stage('PublishFilterJob'):
+            sns_client.publish(
+                TopicArn=SNS_TOPIC_ARN,
+                Message=json.dumps({
+                    'screenshot_id': screenshot_id,
+                    'user_id': user_id,
+                    's3_key': s3_key,
+                    'bucket': RAW_BUCKET,
+                    'job_id': job_id
+                }),
+                Subject='New Screenshot for Profanity Filter'
+            )
         
         return response(200, {
             'message': 'Screenshot uploaded successfully. Processing...',
@@ -127,6 +163,76 @@ def lambda_handler(event, context):
         traceback.print_exc()
         return response(500, {'error': 'Internal server error'})
 
+def is_binary_upload(event):
+    """
+    True si la imagen llegó como binario (BinaryMediaTypes de API Gateway) en lugar de JSON
+    """
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    content_type = headers.get('content-type', '')
+    return bool(event.get('isBase64Encoded')) and not content_type.startswith('application/json')
+
+def decoded_size(image_data):
+    """
+    Tamaño en bytes de la imagen a partir de la longitud del base64
+    Retorna: tamaño, o None si la longitud no es válida
+    """
+    if len(image_data) % 4:
+        return None
+    return len(image_data) // 4 * 3 - len(image_data[-2:]) + len(image_data[-2:].rstrip('='))
+
+def upload_image(image_data, file_size, s3_key, object_args):
+    """
+    Sube la imagen a S3 decodificando el base64 sin mantener más de una copia binaria en memoria
+    Hasta UPLOAD_PART_SIZE: put_object. Más grande: multipart, una parte en memoria a la vez
+    """
+    if file_size <= UPLOAD_PART_SIZE:
+        # ChecksumSHA256 permite a profanity_filter usar la caché de veredictos sin descargar la imagen
+        s3_client.put_object(
+            Bucket=RAW_BUCKET,
+            Key=s3_key,
+            Body=base64.b64decode(image_data, validate=True),
+            ChecksumAlgorithm='SHA256',
+            **object_args
+        )
+        return
+    
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=RAW_BUCKET,
+        Key=s3_key,
+        **object_args
+    )['UploadId']
+    
+    try:
+        parts = []
+        part = bytearray()
+        for offset in range(0, len(image_data), DECODE_CHUNK_SIZE):
+            part += base64.b64decode(image_data[offset:offset + DECODE_CHUNK_SIZE], validate=True)
+            if len(part) >= UPLOAD_PART_SIZE:
+                parts.append(upload_part(s3_key, upload_id, len(parts) + 1, part))
+                part = bytearray()
+        if part:
+            parts.append(upload_part(s3_key, upload_id, len(parts) + 1, part))
+        
+        s3_client.complete_multipart_upload(
+            Bucket=RAW_BUCKET,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=RAW_BUCKET, Key=s3_key, UploadId=upload_id)
+        raise
+
+def upload_part(s3_key, upload_id, part_number, data):
+    result = s3_client.upload_part(
+        Bucket=RAW_BUCKET,
+        Key=s3_key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=data
+    )
+    return {'PartNumber': part_number, 'ETag': result['ETag']}
+
 def response(status_code, body):
     return {
         'statusCode': status_code,
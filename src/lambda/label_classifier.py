@@ -0,0 +1,167 @@
+"""
+Módulo: Label Classifier
+Clasifica las etiquetas de DetectLabels como videojuego o foto real en una sola pasada
+Los indicadores se indexan una vez por versión de reglas (moderation_rules):
+- índice exacto: nombre normalizado -> indicadores
+- índice de tokens: primer token -> indicadores de varias palabras ('video game' en 'Video Game Console')
+Además del nombre se usan los Parents y Categories de cada etiqueta, con menos peso
+"""
+import re
+from collections import namedtuple
+
+GAME = 'game'
+REAL_PHOTO = 'real_photo'
+
+# Peso por defecto de cada origen/tipo de coincidencia (moderation_rules permite cambiarlos)
+DEFAULT_WEIGHTS = {
+    'name': 1.0,  # nombre de la etiqueta
+    'parent': 0.8,  # Parents: 'Man' -> 'Person'
+    'category': 0.6,  # Categories: 'Person Description', 'Hobbies and Interests'...
+    'token': 0.9  # coincidencia parcial (por tokens) en lugar de exacta
+}
+
+# Textos distintos que se recuerdan (el vocabulario de DetectLabels tiene unas 3000 etiquetas)
+MATCH_CACHE_SIZE = 8192
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+
+# side: GAME o REAL_PHOTO; source: 'name', 'parent' o 'category'; match: 'exact' o 'token'
+# score = confidence * weight; matched es el texto de Rekognition que coincidió
+Contribution = namedtuple(
+    'Contribution',
+    ['side', 'label', 'source', 'matched', 'indicator', 'match', 'confidence', 'weight', 'score']
+)
+
+# game / real_photo: mejor puntuación de cada lado (misma escala 0-100 que Confidence)
+# contributions: la mejor coincidencia de cada etiqueta y lado, de mayor a menor puntuación
+LabelScore = namedtuple('LabelScore', ['game', 'real_photo', 'contributions'])
+
+
+def _stem(token):
+    # Plurales simples: 'games' -> 'game', 'screenshots' -> 'screenshot'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """
+    Tokens normalizados (minúsculas, sin plural simple); conserva guiones internos ('8-bit')
+    """
+    return tuple(_stem(token) for token in TOKEN_PATTERN.findall(text.lower()))
+
+
+class LabelClassifier:
+    """
+    Índices de los indicadores de videojuego y de foto real; inmutable y sin estado por imagen
+    """
+    def __init__(self, video_game_indicators, real_photo_indicators, weights=None):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.exact = {}
+        self.by_token = {}
+        # texto -> coincidencias; las etiquetas se repiten en casi todas las imágenes
+        self._matches = {}
+        # (source, texto) -> coincidencias con su peso ya calculado
+        self._weighted = {}
+
+        for side, indicators in ((GAME, video_game_indicators), (REAL_PHOTO, real_photo_indicators)):
+            for indicator in indicators:
+                tokens = tokenize(indicator)
+                if not tokens:
+                    continue
+                entry = (side, indicator, tokens)
+                self.exact.setdefault(tokens, []).append(entry)
+                self.by_token.setdefault(tokens[0], []).append(entry)
+
+    def match(self, text):
+        """
+        Indicadores presentes en un texto de Rekognition
+        Retorna: tupla de (side, indicator, 'exact' | 'token')
+        """
+        found = self._matches.get(text)
+        if found is not None:
+            return found
+
+        tokens = tokenize(text)
+        exact = self.exact.get(tokens)
+        if exact:
+            found = tuple((side, indicator, 'exact') for side, indicator, _ in exact)
+        else:
+            found = tuple(
+                (side, indicator, 'token')
+                for position, token in enumerate(tokens)
+                for side, indicator, indicator_tokens in self.by_token.get(token, ())
+                if tokens[position:position + len(indicator_tokens)] == indicator_tokens
+            )
+
+        if len(self._matches) < MATCH_CACHE_SIZE:
+            self._matches[text] = found
+        return found
+
+    def weighted_match(self, source, text):
+        """
+        Retorna: tupla de (side, weight, indicator, kind) para un texto de un origen ('name', 'parent', 'category')
+        """
+        key = (source, text)
+        found = self._weighted.get(key)
+        if found is None:
+            weights = self.weights
+            found = tuple(
+                (side, weights[source] * (weights['token'] if kind == 'token' else 1.0), indicator, kind)
+                for side, indicator, kind in self.match(text)
+            )
+            if len(self._weighted) < MATCH_CACHE_SIZE:
+                self._weighted[key] = found
+        return found
+
+    def score(self, labels):
+        """
+        Puntúa las etiquetas de DetectLabels
+        Retorna: LabelScore con la mejor puntuación de cada lado y el desglose
+        """
+        weighted_match = self.weighted_match
+        # (etiqueta, lado) -> (peso, source, texto, indicador, tipo); la confianza es la de la etiqueta
+        best = {}
+        confidences = {}
+
+        def consider(name, source, text):
+            for side, weight, indicator, kind in weighted_match(source, text):
+                current = best.get((name, side))
+                if current is None or weight > current[0]:
+                    best[(name, side)] = (weight, source, text, indicator, kind)
+
+        for label in labels:
+            name = label.get('Name', '')
+            confidences[name] = float(label.get('Confidence', 0.0))
+            consider(name, 'name', name)
+            for parent in label.get('Parents', ()):
+                consider(name, 'parent', parent.get('Name', ''))
+            for category in label.get('Categories', ()):
+                consider(name, 'category', category.get('Name', ''))
+
+        contributions = []
+        for (name, side), (weight, source, text, indicator, kind) in best.items():
+            confidence = confidences[name]
+            contributions.append(Contribution(
+                side, name, source, text, indicator, kind, confidence, weight, round(confidence * weight, 2)
+            ))
+        contributions.sort(key=lambda contribution: contribution.score, reverse=True)
+
+        game = max((c.score for c in contributions if c.side == GAME), default=0.0)
+        real_photo = max((c.score for c in contributions if c.side == REAL_PHOTO), default=0.0)
+        return LabelScore(game, real_photo, contributions)
+
+
+def describe(label_score, limit=3):
+    """
+    Resumen de una línea de las mejores coincidencias de cada lado (para el log)
+    """
+    parts = []
+    for side in (GAME, REAL_PHOTO):
+        top = [c for c in label_score.contributions if c.side == side][:limit]
+        if top:
+            parts.append(f"{side}: " + ', '.join(
+                f"{c.label}" + (f" via {c.source} {c.matched}" if c.source != 'name' else '') + f" {c.score:.1f}"
+                for c in top
+            ))
+    return '; '.join(parts) or 'no indicators'
@@ -0,0 +1,122 @@
+"""
+Módulo: Metrics
+Métricas como CloudWatch Embedded Metric Format (una línea JSON en el log, sin llamadas a CloudWatch)
+StageTimer mide la latencia de cada etapa de un registro/petición (S3, Rekognition, DynamoDB, SNS...)
+y la emite en una sola línea con el screenshot_id, para saber qué etapa hizo lento un screenshot
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ScreenshotSystem')
+
+# Timer activo en el hilo actual (cada registro se procesa en su propio hilo)
+_local = threading.local()
+
+
+def emit(values, unit='Count', units=None, properties=None):
+    """
+    Publica las métricas (nombre -> valor) en una línea EMF con la dimensión FunctionName
+    units: unidad por métrica cuando no es la de unit; properties: campos del log que no son métricas
+    """
+    units = units or {}
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['FunctionName']],
+                'Metrics': [{'Name': name, 'Unit': units.get(name, unit)} for name in values]
+            }]
+        },
+        'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'unknown'),
+        **(properties or {}),
+        **values
+    }, default=str))
+
+
+class StageTimer:
+    """
+    Latencias por etapa (ms acumulados si una etapa se repite); thread-safe para los análisis en paralelo
+    """
+    def __init__(self, properties=None):
+        self.properties = dict(properties or {})
+        self.stages = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, stage, elapsed_ms):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + elapsed_ms
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, (time.perf_counter() - started) * 1000)
+
+    def call(self, stage, function, *args):
+        """
+        Ejecuta function(*args) midiendo la etapa (para tareas enviadas a otro hilo)
+        """
+        with self.stage(stage):
+            return function(*args)
+
+    def emit(self):
+        """
+        Emite '<Etapa>Latency' de cada etapa y TotalLatency desde la creación del timer
+        """
+        with self._lock:
+            values = {f'{stage}Latency': round(ms, 2) for stage, ms in self.stages.items()}
+        values['TotalLatency'] = round((time.perf_counter() - self.started) * 1000, 2)
+        emit(values, unit='Milliseconds', properties=self.properties)
+
+
+def start_timer(**properties):
+    """
+    Crea el timer del registro/petición y lo deja activo en el hilo actual
+    """
+    timer = StageTimer(properties)
+    _local.timer = timer
+    return timer
+
+
+def current_timer():
+    return getattr(_local, 'timer', None)
+
+
+def finish_timer():
+    """
+    Emite y desactiva el timer del hilo actual
+    """
+    timer = current_timer()
+    _local.timer = None
+    if timer is not None:
+        timer.emit()
+
+
+def stage(name):
+    """
+    Mide una etapa en el timer activo del hilo; sin timer activo no mide nada
+    """
+    timer = current_timer()
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def elapsed_since(iso_timestamp):
+    """
+    Milisegundos desde un timestamp ISO en UTC (upload_timestamp de la metadata)
+    Retorna: None si falta o no se puede interpretar
+    """
+    try:
+        started = datetime.fromisoformat(str(iso_timestamp))
+    except (TypeError, ValueError):
+        return None
+    if started.tzinfo is not None:
+        started = started.replace(tzinfo=None) - started.utcoffset()
+    return round((datetime.utcnow() - started).total_seconds() * 1000, 2)
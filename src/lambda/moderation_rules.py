@@ -0,0 +1,253 @@
+"""
+Módulo: Moderation Rules
+Reglas de moderación (palabras prohibidas, indicadores de videojuego/foto real y umbrales de confianza)
+cargadas desde un artefacto JSON versionado en S3 (scripts/publish_moderation_rules.py)
+El artefacto se compila una vez por versión y se guarda en el contenedor; como mucho cada
+MODERATION_RULES_REFRESH_SECONDS se hace un GET condicional (If-None-Match con el ETag), así que
+un cambio de reglas llega a todos los contenedores en menos de un minuto sin redesplegar
+Sin MODERATION_RULES_BUCKET se usan las reglas integradas (BUILTIN_RULES)
+"""
+import json
+import os
+import re
+import threading
+import time
+from botocore.exceptions import ClientError
+from profanity_matcher import ProfanityMatcher
+from label_classifier import LabelClassifier, DEFAULT_WEIGHTS
+import aws_clients
+
+MODERATION_RULES_BUCKET = os.environ.get('MODERATION_RULES_BUCKET', '')
+MODERATION_RULES_KEY = os.environ.get('MODERATION_RULES_KEY', 'moderation-rules.json')
+MODERATION_RULES_REFRESH_SECONDS = float(os.environ.get('MODERATION_RULES_REFRESH_SECONDS', '30'))
+
+# Opciones del matcher cuando el artefacto no las indica
+PROFANITY_WORD_BOUNDARY = os.environ.get('PROFANITY_WORD_BOUNDARY', 'false').lower() == 'true'
+PROFANITY_NORMALIZE_LEETSPEAK = os.environ.get('PROFANITY_NORMALIZE_LEETSPEAK', 'true').lower() == 'true'
+
+BUILTIN_VERSION = 'builtin'
+
+# Reglas integradas: las que tenía profanity_filter antes de poder publicarlas
+BUILTIN_RULES = {
+    'version': BUILTIN_VERSION,
+    'profanity': {
+        'words': [
+            # Groserías comunes
+            'fuck', 'shit', 'damn', 'bitch', 'ass', 'bastard', 'crap',
+            'piss', 'dick', 'cock', 'pussy', 'whore', 'slut',
+
+            # Contenido inapropiado
+            'badword1', 'badword2', 'offensive', 'inappropriate',
+            'nsfw', 'adult', 'porn', 'sex', 'nude', 'naked',
+
+            # Violencia
+            'violence', 'gore', 'blood', 'hate', 'kill', 'murder', 'death',
+
+            # Trampas y spam
+            'spam', 'hack', 'cheat', 'exploit', 'bot', 'aimbot', 'wallhack'
+        ]
+    },
+    # Indicadores de videojuego / de foto real (que queremos rechazar) en las etiquetas de DetectLabels
+    'video_game_indicators': [
+        'video game', 'game', 'gaming', 'screenshot', 'screen',
+        'computer game', 'video gaming', 'pc game', 'console game',
+        'pixel art', 'retro game', '8-bit', '16-bit', 'arcade'
+    ],
+    'real_photo_indicators': [
+        'person', 'human', 'people', 'man', 'woman', 'face',
+        'portrait', 'selfie', 'photography', 'photo'
+    ],
+    'thresholds': {
+        'labels_min_confidence': 30.0,  # MinConfidence de DetectLabels
+        'game_confidence': 50.0,  # desde aquí es videojuego
+        'real_photo_confidence': 70.0,  # por encima (y sin videojuego) es foto real
+        'moderation_min_confidence': 50.0,  # umbral para detectar contenido
+        'reject_confidence': 55.0,  # umbral para rechazar (bajado para capturar smoking)
+        'text_min_confidence': 80.0  # líneas de DetectText que se revisan
+    },
+    # Peso (0-1) de cada origen de coincidencia en label_classifier
+    'label_weights': dict(DEFAULT_WEIGHTS)
+}
+
+THRESHOLD_NAMES = tuple(BUILTIN_RULES['thresholds'])
+LABEL_WEIGHT_NAMES = tuple(DEFAULT_WEIGHTS)
+
+# La versión forma parte de las claves de verdict_cache
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RulesError(ValueError):
+    """
+    Artefacto de reglas inválido (falta un campo o tiene un valor fuera de rango)
+    """
+
+
+def _word_list(document, field):
+    values = document.get(field)
+    if not isinstance(values, list) or not all(isinstance(value, str) and value.strip() for value in values):
+        raise RulesError(f"'{field}' must be a list of non-empty strings")
+    return sorted({value.strip().lower() for value in values})
+
+
+def validate(document):
+    """
+    Comprueba y normaliza un documento de reglas (minúsculas, sin duplicados, umbrales numéricos 0-100)
+    Retorna: documento normalizado; lanza RulesError si no es válido
+    """
+    if not isinstance(document, dict):
+        raise RulesError('rules document must be a JSON object')
+
+    version = document.get('version')
+    if not isinstance(version, str) or not VERSION_PATTERN.match(version):
+        raise RulesError("'version' must be 1-64 characters from A-Z, a-z, 0-9, '.', '_' or '-'")
+
+    profanity = document.get('profanity')
+    if not isinstance(profanity, dict):
+        raise RulesError("'profanity' must be an object")
+    normalized_profanity = {'words': _word_list(profanity, 'words')}
+    for option in ('word_boundary', 'leetspeak'):
+        if option in profanity:
+            if not isinstance(profanity[option], bool):
+                raise RulesError(f"'profanity.{option}' must be true or false")
+            normalized_profanity[option] = profanity[option]
+
+    thresholds = document.get('thresholds')
+    if not isinstance(thresholds, dict):
+        raise RulesError("'thresholds' must be an object")
+    unknown = set(thresholds) - set(THRESHOLD_NAMES)
+    if unknown:
+        raise RulesError(f"unknown thresholds: {', '.join(sorted(unknown))}")
+    normalized_thresholds = {}
+    for name in THRESHOLD_NAMES:
+        # Los umbrales que faltan toman el valor integrado
+        value = thresholds.get(name, BUILTIN_RULES['thresholds'][name])
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 100:
+            raise RulesError(f"threshold '{name}' must be a number between 0 and 100")
+        normalized_thresholds[name] = float(value)
+
+    label_weights = document.get('label_weights', {})
+    if not isinstance(label_weights, dict):
+        raise RulesError("'label_weights' must be an object")
+    unknown = set(label_weights) - set(LABEL_WEIGHT_NAMES)
+    if unknown:
+        raise RulesError(f"unknown label weights: {', '.join(sorted(unknown))}")
+    normalized_weights = {}
+    for name in LABEL_WEIGHT_NAMES:
+        value = label_weights.get(name, DEFAULT_WEIGHTS[name])
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+            raise RulesError(f"label weight '{name}' must be a number between 0 and 1")
+        normalized_weights[name] = float(value)
+
+    return {
+        'version': version,
+        'profanity': normalized_profanity,
+        'video_game_indicators': _word_list(document, 'video_game_indicators'),
+        'real_photo_indicators': _word_list(document, 'real_photo_indicators'),
+        'thresholds': normalized_thresholds,
+        'label_weights': normalized_weights
+    }
+
+
+class RuleSet:
+    """
+    Reglas compiladas de una versión: el autómata de palabras prohibidas y los índices de
+    label_classifier se construyen una sola vez
+    Inmutable; profanity_filter toma una al empezar cada lote y la usa en todos sus registros
+    """
+    def __init__(self, document):
+        document = validate(document)
+        self.version = document['version']
+        profanity = document['profanity']
+        self.profanity_words = tuple(profanity['words'])
+        self.matcher = ProfanityMatcher(
+            self.profanity_words,
+            word_boundary=profanity.get('word_boundary', PROFANITY_WORD_BOUNDARY),
+            leetspeak=profanity.get('leetspeak', PROFANITY_NORMALIZE_LEETSPEAK)
+        )
+        self.video_game_indicators = tuple(document['video_game_indicators'])
+        self.real_photo_indicators = tuple(document['real_photo_indicators'])
+        self.thresholds = document['thresholds']
+        self.label_classifier = LabelClassifier(
+            self.video_game_indicators,
+            self.real_photo_indicators,
+            document['label_weights']
+        )
+
+    @property
+    def cache_version(self):
+        """
+        Versión para las claves de verdict_cache (vacía con las reglas integradas: claves de siempre)
+        """
+        return '' if self.version == BUILTIN_VERSION else self.version
+
+    def __repr__(self):
+        return f"RuleSet(version={self.version!r}, words={len(self.profanity_words)})"
+
+
+class RuleStore:
+    """
+    Caché de las reglas en el contenedor con refresco condicional por ETag
+    current() no hace ninguna llamada mientras no hayan pasado refresh_seconds desde la última comprobación
+    """
+    def __init__(self, bucket, key, refresh_seconds, s3_client=None):
+        self.bucket = bucket
+        self.key = key
+        self.refresh_seconds = refresh_seconds
+        self.s3_client = s3_client or aws_clients.lazy_client('s3')
+        self.rules = RuleSet(BUILTIN_RULES)
+        self.etag = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """
+        Retorna: el RuleSet vigente (refrescado si toca)
+        """
+        if not self.bucket:
+            return self.rules
+
+        if self.checked_at is None or time.monotonic() - self.checked_at >= self.refresh_seconds:
+            with self._lock:
+                if self.checked_at is None or time.monotonic() - self.checked_at >= self.refresh_seconds:
+                    self.refresh()
+        return self.rules
+
+    def refresh(self):
+        """
+        GET condicional del artefacto; ante cualquier error se mantienen las reglas vigentes
+        """
+        self.checked_at = time.monotonic()
+        request = {'Bucket': self.bucket, 'Key': self.key}
+        if self.etag:
+            request['IfNoneMatch'] = self.etag
+
+        try:
+            response = self.s3_client.get_object(**request)
+            document = json.loads(response['Body'].read())
+            rules = RuleSet(document)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in ('304', 'NotModified'):
+                return False
+            print(f"Error loading moderation rules s3://{self.bucket}/{self.key}, keeping {self.rules.version}: {str(e)}")
+            return False
+        except Exception as e:
+            # JSON o reglas inválidas: un artefacto roto no debe dejar el filtro sin reglas
+            print(f"Invalid moderation rules s3://{self.bucket}/{self.key}, keeping {self.rules.version}: {str(e)}")
+            return False
+
+        self.etag = response.get('ETag')
+        if rules.version != self.rules.version:
+            print(f"Moderation rules updated: {self.rules.version} -> {rules.version}")
+        self.rules = rules
+        return True
+
+
+store = RuleStore(MODERATION_RULES_BUCKET, MODERATION_RULES_KEY, MODERATION_RULES_REFRESH_SECONDS)
+
+
+def current():
+    """
+    Reglas vigentes del contenedor (ver RuleStore.current)
+    """
+    return store.current()
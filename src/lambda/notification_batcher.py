@@ -0,0 +1,131 @@
+"""
+Módulo: Notification Batcher
+Agrupa las publicaciones SNS de una invocación y las envía con publish_batch (hasta 10 mensajes por llamada)
+Opcionalmente combina en un solo mensaje los de un mismo grupo (p. ej. usuario)
+"""
+import json
+import threading
+import aws_clients
+import metrics
+
+# Límites de PublishBatch: 10 mensajes y 256KB por llamada
+SNS_BATCH_SIZE = 10
+SNS_BATCH_MAX_BYTES = 256 * 1024
+
+sns_client = aws_clients.lazy_client('sns')
+
+
+def chunk_entries(entries):
+    """
+    Divide las entradas en lotes que respetan los límites de PublishBatch
+    """
+    chunk = []
+    chunk_bytes = 0
+    for entry in entries:
+        entry_bytes = len(entry['Message'].encode()) + len(entry.get('Subject', '').encode())
+        if chunk and (len(chunk) == SNS_BATCH_SIZE or chunk_bytes + entry_bytes > SNS_BATCH_MAX_BYTES):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(entry)
+        chunk_bytes += entry_bytes
+    if chunk:
+        yield chunk
+
+
+def publish_entries(topic_arn, entries):
+    """
+    Publica entradas {'Id', 'Message', 'Subject'} con publish_batch
+    Retorna: (ids de las entradas fallidas, llamadas a SNS)
+    """
+    failed = []
+    calls = 0
+    for chunk in chunk_entries(entries):
+        calls += 1
+        try:
+            response = sns_client.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=chunk)
+        except Exception as e:
+            print(f"SNS publish_batch failed ({len(chunk)} messages): {str(e)}")
+            failed.extend(entry['Id'] for entry in chunk)
+            continue
+        for failure in response.get('Failed', []):
+            print(f"SNS message {failure['Id']} failed: {failure.get('Code')} {failure.get('Message', '')}")
+            failed.append(failure['Id'])
+    return failed, calls
+
+
+class NotificationBatch:
+    """
+    Mensajes pendientes de una invocación para un topic (thread-safe: los registros se procesan en paralelo)
+    coalesce: función (grupo, [mensajes]) -> mensaje que reemplaza a los de un grupo con más de uno
+    """
+    def __init__(self, topic_arn, subject, coalesce=None):
+        self.topic_arn = topic_arn
+        self.subject = subject
+        self.coalesce = coalesce
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, message, group=None, key=None):
+        """
+        Encola un mensaje (dict); key identifica el mensaje en el resultado de flush()
+        """
+        with self._lock:
+            self._pending.append((group, key, message))
+
+    def _build_entries(self, pending):
+        """
+        Retorna: (entradas de PublishBatch, id de entrada -> keys de los mensajes que contiene)
+        """
+        groups = {}
+        for group, key, message in pending:
+            # Sin coalesce (o sin grupo) cada mensaje va por separado
+            group_key = group if self.coalesce and group is not None else object()
+            groups.setdefault(group_key, (group, []))[1].append((key, message))
+
+        entries = []
+        entry_keys = {}
+        for group, messages in groups.values():
+            if len(messages) > 1:
+                message = self.coalesce(group, [message for _, message in messages])
+            else:
+                message = messages[0][1]
+            entry_id = str(len(entries))
+            entries.append({'Id': entry_id, 'Message': json.dumps(message), 'Subject': self.subject})
+            entry_keys[entry_id] = [key for key, _ in messages]
+        return entries, entry_keys
+
+    def flush(self):
+        """
+        Publica los mensajes encolados (las entradas fallidas se reintentan una vez) y emite métricas
+        Retorna: keys de los mensajes que no se pudieron publicar
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return []
+
+        entries, entry_keys = self._build_entries(pending)
+        failed, calls = publish_entries(self.topic_arn, entries)
+        if failed:
+            retry = [entry for entry in entries if entry['Id'] in set(failed)]
+            failed, retry_calls = publish_entries(self.topic_arn, retry)
+            calls += retry_calls
+
+        failed_keys = [key for entry_id in failed for key in entry_keys[entry_id]]
+        emit_metrics(len(pending), len(entries), calls, len(failed_keys))
+        return failed_keys
+
+
+def emit_metrics(queued, sent, calls, failed):
+    """
+    Publica las métricas del flush como CloudWatch Embedded Metric Format
+    NotificationPublishesSaved: llamadas a SNS evitadas frente a un publish por mensaje
+    """
+    metrics.emit({
+        'NotificationsQueued': queued,
+        'NotificationsSent': sent,
+        'NotificationPublishCalls': calls,
+        'NotificationPublishesSaved': queued - calls,
+        'NotificationFailures': failed
+    })
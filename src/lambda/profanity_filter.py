@@ -4,123 +4,364 @@ Analiza capturas de pantalla para detectar contenido inapropiado usando AWS Reko
 Versión mejorada con detección de contenido visual y texto en imágenes
 """
 import json
-import boto3
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from datetime import datetime
 from decimal import Decimal
+import aws_clients
+import verdict_cache
+import image_normalizer
+import status_transitions
+import notification_batcher
+import metrics
+import content_prescreen
+import moderation_rules
+import label_classifier
 
-s3_client = boto3.client('s3')
-rekognition_client = boto3.client('rekognition')
-dynamodb = boto3.resource('dynamodb')
-sns_client = boto3.client('sns')
+# Se crean al primer uso: con la caché de veredictos muchos contenedores nunca llaman a Rekognition
+# Las notificaciones se publican por lotes con notification_batcher
+s3_client = aws_clients.lazy_client('s3')
+rekognition_client = aws_clients.lazy_client('rekognition')
 
 RAW_BUCKET = os.environ['RAW_BUCKET']
 PROCESSED_BUCKET = os.environ['PROCESSED_BUCKET']
 METADATA_TABLE = os.environ['METADATA_TABLE']
 NOTIFICATION_TOPIC_ARN = os.environ['NOTIFICATION_TOPIC_ARN']
 
-# Lista de palabras prohibidas (ejemplo básico)
-PROFANITY_LIST = [
-    # Groserías comunes
-    'fuck', 'shit', 'damn', 'bitch', 'ass', 'bastard', 'crap',
-    'piss', 'dick', 'cock', 'pussy', 'whore', 'slut',
+# Reglas de moderación (palabras prohibidas, indicadores y umbrales) publicadas en S3 (moderation_rules)
+# Se fijan al empezar cada lote: todos los registros del lote usan la misma versión
+# Al importar solo las integradas: el GET a S3 se hace en lambda_handler, fuera del init
+rules = moderation_rules.store.rules
+
+# Volcados de depuración (listas completas de etiquetas) solo con LOG_LEVEL=DEBUG
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+DEBUG_LOGGING = LOG_LEVEL == 'DEBUG'
+
+# Ejecución de los análisis de Rekognition (DetectLabels, moderación y DetectText)
+REKOGNITION_PARALLEL = os.environ.get('REKOGNITION_PARALLEL', 'true').lower() == 'true'
+REKOGNITION_EARLY_EXIT = os.environ.get('REKOGNITION_EARLY_EXIT', 'false').lower() == 'true'
+REKOGNITION_CALL_TIMEOUT = float(os.environ.get('REKOGNITION_CALL_TIMEOUT', '10'))  # segundos
+
+# Origen de la imagen para Rekognition: 's3' (S3Object, sin descargarla) o 'bytes' (descarga y normaliza)
+REKOGNITION_IMAGE_SOURCE = os.environ.get('REKOGNITION_IMAGE_SOURCE', 's3').lower()
+# Errores de Rekognition al leer la imagen: se reintenta descargando y normalizando
+UNREADABLE_IMAGE_ERRORS = ('InvalidImageFormatException', 'ImageTooLargeException', 'InvalidS3ObjectException')
+
+# Moderación por niveles: metadata -> pre-clasificación local -> Rekognition
+# 'reject': palabras prohibidas en título/descripción rechazan sin leer la imagen; 'analyze': análisis completo
+MODERATION_METADATA_POLICY = os.environ.get('MODERATION_METADATA_POLICY', 'reject').lower()
+# Pre-clasificación con la cabecera de la imagen (content_prescreen): 'off', 'skip_labels' (las capturas a
+# resolución de pantalla no pasan por DetectLabels) o 'decide' (además, las fotos de cámara se rechazan sin Rekognition)
+# Las dos políticas forman parte de las claves de verdict_cache (verdict_policy): cambiarlas usa claves nuevas
+PRESCREEN_POLICY = os.environ.get('PRESCREEN_POLICY', 'off').lower()
+DEFAULT_POLICIES = ('reject', 'off')
+
+# Combinar en un solo mensaje las notificaciones de un mismo usuario dentro del lote
+NOTIFICATION_COALESCE = os.environ.get('NOTIFICATION_COALESCE', 'false').lower() == 'true'
+
+# Promoción de las imágenes aprobadas
+# 'copy': copia al bucket de procesados y borra el original de raw; 'tag': un solo bucket, la etiqueta moderation=approved
+# habilita la lectura (PROCESSED_BUCKET de image_retrieval apunta al bucket raw)
+PROMOTION_STRATEGY = os.environ.get('PROMOTION_STRATEGY', 'copy').lower()
+PROMOTION_DELETE_RAW = os.environ.get('PROMOTION_DELETE_RAW', 'true').lower() == 'true'
+# Por encima del umbral la copia se hace en partes (UploadPartCopy); CopyObject falla con objetos de más de 5GB
+PROMOTION_MULTIPART_THRESHOLD = int(os.environ.get('PROMOTION_MULTIPART_THRESHOLD', str(64 * 1024 * 1024)))
+MODERATION_TAG_KEY = 'moderation'
+
+# TransferConfig de la copia (s3transfer se importa en la primera promoción)
+_promotion_config = None
+
+# Procesamiento de lotes: registros analizados en paralelo por invocación
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '4'))
+# Tres análisis por registro en paralelo
+REKOGNITION_MAX_WORKERS = int(os.environ.get('REKOGNITION_MAX_WORKERS', str(3 * BATCH_MAX_WORKERS)))
+
+# Duración del reclamo de un trabajo de moderación (mayor que el timeout de la Lambda)
+# Un mensaje repetido mientras el lease está vigente se descarta; tras un fallo sin liberar se reintenta al vencer
+MODERATION_LEASE_SECONDS = int(os.environ.get('MODERATION_LEASE_SECONDS', '120'))
+
+# Pools compartidos entre invocaciones del mismo contenedor (los clientes boto3 son thread-safe)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS)
+rekognition_executor = ThreadPoolExecutor(max_workers=REKOGNITION_MAX_WORKERS)
+
+aws_clients.register_priming(
+    services=['s3', 'rekognition', 'sns'],
+    tables=[METADATA_TABLE] + ([verdict_cache.VERDICT_CACHE_TABLE] if verdict_cache.VERDICT_CACHE_TABLE else []),
+    imports=['PIL.Image']
+)
+
+def lambda_handler(event, context):
+    """
+    Procesa un lote de registros SNS o SQS en paralelo (BATCH_MAX_WORKERS)
+    Con SQS reporta solo los mensajes fallidos (ReportBatchItemFailures) para que se reintenten
+    """
+    global rules
+    records = event.get('Records', [])
+    started = time.time()
     
-    # Contenido inapropiado
-    'badword1', 'badword2', 'offensive', 'inappropriate',
-    'nsfw', 'adult', 'porn', 'sex', 'nude', 'naked',
+    # Como mucho un GET condicional cada MODERATION_RULES_REFRESH_SECONDS
+    rules = moderation_rules.current()
+    rules_ms = (time.time() - started) * 1000
     
-    # Violencia
-    'violence', 'gore', 'blood', 'hate', 'kill', 'murder', 'death',
+    # Notificaciones al usuario: se publican juntas al terminar el lote
+    notifications = notification_batcher.NotificationBatch(
+        NOTIFICATION_TOPIC_ARN,
+        'Screenshot Processing Complete',
+        coalesce=summarize_notifications if NOTIFICATION_COALESCE else None
+    )
+    futures = [(record, batch_executor.submit(process_record, record, notifications)) for record in records]
     
-    # Trampas y spam
-    'spam', 'hack', 'cheat', 'exploit', 'bot', 'aimbot', 'wallhack'
-]
+    failed_ids = []
+    statuses = {'APPROVED': 0, 'REJECTED': 0, 'SKIPPED': 0}
+    for record, future in futures:
+        try:
+            statuses[future.result()] += 1
+        except Exception as e:
+            # Un registro con error no aborta el resto del lote
+            print(f"Error processing record {record_id(record)}: {str(e)}")
+            failed_ids.append(record_id(record))
+    
+    # El veredicto ya está guardado: una notificación fallida no reintenta el registro
+    flush_started = time.time()
+    failed_notifications = notifications.flush()
+    flush_ms = (time.time() - flush_started) * 1000
+    if failed_notifications:
+        print(f"Notifications not delivered for: {failed_notifications}")
+    
+    elapsed = time.time() - started
+    metrics.emit(
+        {
+            'BatchLatency': round(elapsed * 1000, 1),
+            'NotificationFlushLatency': round(flush_ms, 1),
+            'RulesRefreshLatency': round(rules_ms, 1),
+            'RecordsFailed': len(failed_ids)
+        },
+        unit='Milliseconds',
+        units={'RecordsFailed': 'Count'},
+        properties={
+            'batch_size': len(records),
+            'approved': statuses['APPROVED'],
+            'rejected': statuses['REJECTED'],
+            'skipped': statuses['SKIPPED'],
+            'rules_version': rules.version,
+            'records_per_second': round(len(records) / elapsed, 2) if elapsed > 0 else None
+        }
+    )
+    
+    verdict_cache.emit_metrics()
+    
+    if any(record.get('eventSource') == 'aws:sqs' for record in records):
+        return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+    
+    if failed_ids:
+        return {'statusCode': 500, 'body': f'{len(failed_ids)} of {len(records)} records failed'}
+    
+    return {'statusCode': 200, 'body': 'Processing complete'}
 
-# Configuración de Rekognition
-MIN_CONFIDENCE_MODERATION = 50.0  # Umbral para detectar contenido
-REJECT_CONFIDENCE_THRESHOLD = 55.0  # Umbral para rechazar (bajado para capturar smoking)
+def record_id(record):
+    """
+    Identificador del registro: messageId en SQS, MessageId en SNS
+    """
+    if 'messageId' in record:
+        return record['messageId']
+    return record.get('Sns', {}).get('MessageId', 'unknown')
 
-def lambda_handler(event, context):
+def parse_message(record):
+    """
+    Extrae el mensaje del filtro de un registro SNS, SQS o SNS->SQS (con o sin raw delivery)
+    """
+    if 'Sns' in record:
+        return json.loads(record['Sns']['Message'])
+    
+    body = json.loads(record['body'])
+    if body.get('Type') == 'Notification' and 'Message' in body:
+        return json.loads(body['Message'])
+    return body
+
+def process_record(record, notifications):
+    """
+    Analiza un screenshot y guarda el veredicto
+    Emite una línea de métricas por registro con la latencia de cada etapa y el screenshot_id
+    Retorna: 'APPROVED', 'REJECTED' o 'SKIPPED' si el mensaje es repetido (las excepciones las maneja lambda_handler)
+    """
+    message = parse_message(record)
+    timer = metrics.start_timer(screenshot_id=message.get('screenshot_id'))
+    status = 'FAILED'
     try:
-        # Parse SNS message
-        for record in event['Records']:
-            message = json.loads(record['Sns']['Message'])
-            screenshot_id = message['screenshot_id']
-            user_id = message['user_id']
-            s3_key = message['s3_key']
-            bucket = message['bucket']
-            
-            print(f"Processing screenshot: {screenshot_id}")
-            
-            # Get image from S3
-            response = s3_client.get_object(Bucket=bucket, Key=s3_key)
-            image_bytes = response['Body'].read()
-            
-            # Get metadata from DynamoDB
-            table = dynamodb.Table(METADATA_TABLE)
-            item = table.get_item(Key={'screenshot_id': screenshot_id})['Item']
-            
-            # Perform comprehensive content check
-            is_appropriate, rejection_reasons = check_content(item, image_bytes, bucket, s3_key)
-            
-            if is_appropriate:
-                # Move to processed bucket
-                processed_key = s3_key.replace('raw/', 'processed/')
-                s3_client.copy_object(
-                    Bucket=PROCESSED_BUCKET,
-                    CopySource={'Bucket': bucket, 'Key': s3_key},
-                    Key=processed_key
-                )
-                
-                # Update metadata
-                table.update_item(
-                    Key={'screenshot_id': screenshot_id},
-                    UpdateExpression='SET #status = :status, processed_s3_key = :key, processed_timestamp = :timestamp',
-                    ExpressionAttributeNames={'#status': 'status'},
-                    ExpressionAttributeValues={
-                        ':status': 'APPROVED',
-                        ':key': processed_key,
-                        ':timestamp': Decimal(str(int(datetime.utcnow().timestamp())))
-                    }
-                )
-                
-                status_message = 'Screenshot approved and ready for viewing'
-            else:
-                # Update metadata as rejected
-                table.update_item(
-                    Key={'screenshot_id': screenshot_id},
-                    UpdateExpression='SET #status = :status, rejection_reasons = :reasons, processed_timestamp = :timestamp',
-                    ExpressionAttributeNames={'#status': 'status'},
-                    ExpressionAttributeValues={
-                        ':status': 'REJECTED',
-                        ':reasons': rejection_reasons,
-                        ':timestamp': Decimal(str(int(datetime.utcnow().timestamp())))
-                    }
-                )
-                
-                status_message = f'Screenshot rejected: {", ".join(rejection_reasons)}'
-            
-            # Send notification to user
-            sns_client.publish(
-                TopicArn=NOTIFICATION_TOPIC_ARN,
-                Message=json.dumps({
-                    'user_id': user_id,
-                    'screenshot_id': screenshot_id,
-                    'status': 'APPROVED' if is_appropriate else 'REJECTED',
-                    'message': status_message
-                }),
-                Subject='Screenshot Processing Complete'
-            )
-            
-            print(f"Screenshot {screenshot_id}: {'APPROVED' if is_appropriate else 'REJECTED'}")
-        
-        return {'statusCode': 200, 'body': 'Processing complete'}
+        status = process_message(message, notifications, timer)
+        return status
+    finally:
+        timer.properties['status'] = status
+        metrics.finish_timer()
+
+def process_message(message, notifications, timer):
+    """
+    Reclama el trabajo, modera la imagen y encola la notificación
+    """
+    screenshot_id = message['screenshot_id']
+    user_id = message['user_id']
+    s3_key = message['s3_key']
+    bucket = message['bucket']
+    # Mensajes publicados antes de existir job_id: el screenshot es el trabajo
+    job_id = message.get('job_id', screenshot_id)
+    
+    # Reclamar el trabajo antes de cualquier descarga o llamada a Rekognition (devuelve también la metadata)
+    table = aws_clients.table(METADATA_TABLE)
+    with timer.stage('ClaimJob'):
+        item = status_transitions.claim_job(table, screenshot_id, job_id, MODERATION_LEASE_SECONDS)
+    if item is None:
+        print(f"Duplicate or already processed job for screenshot {screenshot_id}, skipping")
+        return 'SKIPPED'
+    
+    print(f"Processing screenshot: {screenshot_id}")
+    
+    try:
+        status, status_message = moderate(item, screenshot_id, job_id, s3_key, bucket)
+    except Exception:
+        status_transitions.release_job(table, screenshot_id, job_id)
+        raise
+    
+    if status is None:
+        print(f"Job {job_id} for screenshot {screenshot_id} was completed by another invocation")
+        return 'SKIPPED'
+    
+    # Latencia de punta a punta: desde que se registró la subida hasta el veredicto guardado
+    upload_to_verdict = metrics.elapsed_since(item.get('upload_timestamp'))
+    if upload_to_verdict is not None:
+        timer.add('UploadToVerdict', upload_to_verdict)
+    
+    # Send notification to user (se publica con el resto del lote)
+    notifications.add({
+        'user_id': user_id,
+        'screenshot_id': screenshot_id,
+        'status': status,
+        'message': status_message
+    }, group=user_id, key=screenshot_id)
+    
+    print(f"Screenshot {screenshot_id}: {status}")
+    
+    return status
+
+def summarize_notifications(user_id, messages):
+    """
+    Un solo mensaje para varios resultados del mismo usuario (NOTIFICATION_COALESCE)
+    """
+    approved = sum(1 for message in messages if message['status'] == 'APPROVED')
+    rejected = len(messages) - approved
+    parts = []
+    if approved:
+        parts.append(f"{approved} of your screenshots were approved")
+    if rejected:
+        parts.append(f"{rejected} of your screenshots were rejected")
+    
+    return {
+        'user_id': user_id,
+        'status': 'BATCH',
+        'message': ', '.join(parts),
+        'screenshots': [
+            {key: message[key] for key in ('screenshot_id', 'status', 'message')}
+            for message in messages
+        ]
+    }
+
+def moderate(item, screenshot_id, job_id, s3_key, bucket):
+    """
+    Analiza la imagen y guarda el veredicto con una transición condicional
+    Retorna: (status, mensaje para el usuario), o (None, None) si el trabajo ya no es de este job_id
+    """
+    table = aws_clients.table(METADATA_TABLE)
+    
+    # Perform comprehensive content check (descarga la imagen solo si hay que normalizarla)
+    is_appropriate, rejection_reasons = check_content(item, bucket, s3_key)
+    timestamp = Decimal(str(int(datetime.utcnow().timestamp())))
+    
+    if is_appropriate:
+        # Move to processed bucket (o etiquetar como aprobada con PROMOTION_STRATEGY=tag)
+        with metrics.stage('Promote'):
+            processed_key = promote_image(bucket, s3_key)
         
+        # Update metadata
+        with metrics.stage('CompleteJob'):
+            completed = status_transitions.complete_job(
+                table, screenshot_id, job_id, status_transitions.APPROVED,
+                values={'processed_s3_key': processed_key, 'processed_timestamp': timestamp}
+            )
+        # El original solo se borra cuando el veredicto ya está guardado (un reintento aún lo necesita)
+        if completed is not None and PROMOTION_STRATEGY == 'copy' and PROMOTION_DELETE_RAW:
+            with metrics.stage('DiscardRaw'):
+                discard_raw_original(bucket, s3_key)
+        status_message = 'Screenshot approved and ready for viewing'
+    else:
+        # Update metadata as rejected
+        with metrics.stage('CompleteJob'):
+            completed = status_transitions.complete_job(
+                table, screenshot_id, job_id, status_transitions.REJECTED,
+                values={'rejection_reasons': rejection_reasons, 'processed_timestamp': timestamp}
+            )
+        # Con un solo bucket, la regla de ciclo de vida de las rechazadas se basa en la etiqueta
+        if completed is not None and PROMOTION_STRATEGY == 'tag':
+            with metrics.stage('TagRejected'):
+                tag_moderation_state(bucket, s3_key, 'rejected')
+        status_message = f'Screenshot rejected: {", ".join(rejection_reasons)}'
+    
+    if completed is None:
+        return None, None
+    return completed['status'], status_message
+
+def promote_image(bucket, s3_key):
+    """
+    Publica una imagen aprobada según PROMOTION_STRATEGY
+    Retorna: clave de la imagen que sirve image_retrieval (processed_s3_key)
+    """
+    if PROMOTION_STRATEGY == 'tag':
+        tag_moderation_state(bucket, s3_key, 'approved', raise_errors=True)
+        return s3_key
+    
+    global _promotion_config
+    if _promotion_config is None:
+        from boto3.s3.transfer import TransferConfig
+        _promotion_config = TransferConfig(
+            multipart_threshold=PROMOTION_MULTIPART_THRESHOLD,
+            multipart_chunksize=PROMOTION_MULTIPART_THRESHOLD
+        )
+    
+    # Copia administrada: CopyObject o UploadPartCopy en partes; cada llamada usa los reintentos del cliente
+    processed_key = s3_key.replace('raw/', 'processed/', 1)
+    s3_client.copy(
+        CopySource={'Bucket': bucket, 'Key': s3_key},
+        Bucket=PROCESSED_BUCKET,
+        Key=processed_key,
+        Config=_promotion_config
+    )
+    return processed_key
+
+def tag_moderation_state(bucket, s3_key, state, raise_errors=False):
+    """
+    Etiqueta el objeto con moderation=<state> (la lee la política de lectura y el ciclo de vida del bucket)
+    """
+    try:
+        s3_client.put_object_tagging(
+            Bucket=bucket,
+            Key=s3_key,
+            Tagging={'TagSet': [{'Key': MODERATION_TAG_KEY, 'Value': state}]}
+        )
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Error tagging {s3_key} as {state}: {str(e)}")
+
+def discard_raw_original(bucket, s3_key):
+    """
+    Borra el original de raw tras copiarlo (DELETE no tiene costo); si falla, lo borra el ciclo de vida
+    """
+    try:
+        s3_client.delete_object(Bucket=bucket, Key=s3_key)
     except Exception as e:
-        print(f"Error: {str(e)}")
-        return {'statusCode': 500, 'body': str(e)}
+        print(f"Error deleting raw original {s3_key}: {str(e)}")
 
-def verify_is_video_game(image_bytes):
+def verify_is_video_game(image):
     """
     Verifica si la imagen es un screenshot de videojuego
     Retorna: True si es videojuego, False si es foto real
@@ -128,55 +369,33 @@ def verify_is_video_game(image_bytes):
     try:
         # Usar DetectLabels para identificar el contenido
         labels_response = rekognition_client.detect_labels(
-            Image={'Bytes': image_bytes},
+            Image=image,
             MaxLabels=50,
-            MinConfidence=30.0
+            MinConfidence=rules.thresholds['labels_min_confidence']
         )
         
         labels = labels_response.get('Labels', [])
-        print(f"Labels detected: {json.dumps([{'Name': l['Name'], 'Confidence': l['Confidence']} for l in labels], default=str)}")
-        
-        # Buscar indicadores de videojuego
-        video_game_indicators = [
-            'video game', 'game', 'gaming', 'screenshot', 'screen',
-            'computer game', 'video gaming', 'pc game', 'console game',
-            'pixel art', 'retro game', '8-bit', '16-bit', 'arcade'
-        ]
+        if DEBUG_LOGGING:
+            print(f"Labels detected: {json.dumps([{'Name': l['Name'], 'Confidence': l['Confidence']} for l in labels], default=str)}")
         
-        # Buscar indicadores de foto real (que queremos rechazar)
-        real_photo_indicators = [
-            'person', 'human', 'people', 'man', 'woman', 'face',
-            'portrait', 'selfie', 'photography', 'photo'
-        ]
+        # Una pasada sobre nombres, Parents y Categories con los índices de la versión de reglas
+        label_score = rules.label_classifier.score(labels)
+        game_confidence = label_score.game
+        real_photo_confidence = label_score.real_photo
+        if DEBUG_LOGGING:
+            print(f"Label score breakdown: {json.dumps([c._asdict() for c in label_score.contributions], default=str)}")
         
-        game_confidence = 0.0
-        real_photo_confidence = 0.0
-        
-        for label in labels:
-            label_name = label['Name'].lower()
-            confidence = label['Confidence']
-            
-            # Verificar indicadores de videojuego
-            for indicator in video_game_indicators:
-                if indicator in label_name:
-                    game_confidence = max(game_confidence, confidence)
-                    print(f"Video game indicator found: {label['Name']} - {confidence:.1f}%")
-            
-            # Verificar indicadores de foto real
-            for indicator in real_photo_indicators:
-                if indicator in label_name:
-                    real_photo_confidence = max(real_photo_confidence, confidence)
-                    print(f"Real photo indicator found: {label['Name']} - {confidence:.1f}%")
-        
-        print(f"Game confidence: {game_confidence:.1f}%, Real photo confidence: {real_photo_confidence:.1f}%")
+        print(f"Game confidence: {game_confidence:.1f}%, Real photo confidence: {real_photo_confidence:.1f}% "
+              f"({label_classifier.describe(label_score)})")
         
         # Decisión: Si tiene alta confianza de foto real Y baja de videojuego → Rechazar
-        if real_photo_confidence > 70.0 and game_confidence < 50.0:
+        thresholds = rules.thresholds
+        if real_photo_confidence > thresholds['real_photo_confidence'] and game_confidence < thresholds['game_confidence']:
             print("Detected as real photo, not a video game")
             return False
         
         # Si tiene indicadores de videojuego → Aprobar
-        if game_confidence >= 50.0:
+        if game_confidence >= thresholds['game_confidence']:
             print("Detected as video game screenshot")
             return True
         
@@ -186,52 +405,33 @@ def verify_is_video_game(image_bytes):
         
     except Exception as e:
         print(f"Error verifying video game: {str(e)}")
-        # Si falla la detección, ser permisivo
-        return True
+        # Si falla la detección, run_image_analyses aplica el resultado permisivo
+        raise
 
-def check_content(metadata, image_bytes, bucket, s3_key):
+def check_moderation_labels(image):
     """
-    Verifica si el contenido es apropiado usando AWS Rekognition
-    Retorna: (is_appropriate: bool, rejection_reasons: list)
+    AWS Rekognition - Detect Moderation Labels (contenido inapropiado)
+    Retorna: lista de razones de rechazo
     """
-    rejection_reasons = []
-    
-    # 1. Verificar que sea un videojuego (PRIMER FILTRO)
-    is_video_game = verify_is_video_game(image_bytes)
-    if not is_video_game:
-        rejection_reasons.append("Not a video game screenshot - real photo detected")
-        print("Image rejected: Not a video game screenshot")
-        # No retornar aquí, seguir verificando por si acaso
-    
-    print(f"Video game verification: {'PASSED' if is_video_game else 'FAILED'}")
-    
-    # 2. Check text fields for profanity
-    text_to_check = f"{metadata.get('description', '')} {metadata.get('game_title', '')}".lower()
-    
-    for word in PROFANITY_LIST:
-        if word in text_to_check:
-            print(f"Profanity in metadata detected: {word}")
-            rejection_reasons.append(f"Inappropriate text in description: {word}")
+    moderation_reasons = []
+    min_moderation_confidence = rules.thresholds['moderation_min_confidence']
+    reject_confidence = rules.thresholds['reject_confidence']
     
-    # 2. AWS Rekognition - Detect Moderation Labels (contenido inapropiado)
     try:
-        # Primero intentar con threshold bajo para ver TODO lo que detecta
-        moderation_response_all = rekognition_client.detect_moderation_labels(
-            Image={'Bytes': image_bytes},
-            MinConfidence=0.0  # Ver TODO
-        )
-        
-        all_labels = moderation_response_all.get('ModerationLabels', [])
-        print(f"ALL moderation labels detected (any confidence): {json.dumps(all_labels, default=str)}")
-        
-        # Ahora filtrar por el threshold configurado
+        # Una sola llamada por imagen; con LOG_LEVEL=DEBUG se piden todas las etiquetas para depurar
+        min_confidence = 0.0 if DEBUG_LOGGING else min_moderation_confidence
         moderation_response = rekognition_client.detect_moderation_labels(
-            Image={'Bytes': image_bytes},
-            MinConfidence=MIN_CONFIDENCE_MODERATION
+            Image=image,
+            MinConfidence=min_confidence
         )
         
-        moderation_labels = moderation_response.get('ModerationLabels', [])
-        print(f"Moderation labels found (>{MIN_CONFIDENCE_MODERATION}% confidence): {len(moderation_labels)}")
+        all_labels = moderation_response.get('ModerationLabels', [])
+        if DEBUG_LOGGING:
+            print(f"ALL moderation labels detected (any confidence): {json.dumps(all_labels, default=str)}")
+        
+        # Aplicar el threshold configurado localmente
+        moderation_labels = [label for label in all_labels if label['Confidence'] >= min_moderation_confidence]
+        print(f"Moderation labels found (>{min_moderation_confidence}% confidence): {len(moderation_labels)}")
         
         for label in moderation_labels:
             confidence = label['Confidence']
@@ -241,47 +441,344 @@ def check_content(metadata, image_bytes, bucket, s3_key):
             print(f"Moderation label: {label_name} ({parent_name}) - Confidence: {confidence:.2f}%")
             
             # Rechazar si supera el umbral
-            if confidence >= REJECT_CONFIDENCE_THRESHOLD:
+            if confidence >= reject_confidence:
                 reason = f"Inappropriate visual content: {label_name}"
                 if parent_name:
                     reason += f" ({parent_name})"
                 reason += f" - {confidence:.1f}% confidence"
-                rejection_reasons.append(reason)
+                moderation_reasons.append(reason)
         
         # Log all moderation labels for debugging
-        if moderation_labels:
+        if DEBUG_LOGGING and moderation_labels:
             print(f"All moderation labels detected: {json.dumps(moderation_labels, default=str)}")
             
     except Exception as moderation_error:
         print(f"DetectModerationLabels error: {str(moderation_error)}")
-        # Continuar sin detección de moderación visual
+        # run_image_analyses continúa sin detección de moderación visual
+        raise
+    
+    return moderation_reasons
+
+def detect_image_text(image):
+    """
+    AWS Rekognition - Detect Text (texto en la imagen)
+    NOTA: Requiere permiso rekognition:DetectText (pendiente de aprobación de seguridad)
+    Retorna: lista de líneas detectadas en minúsculas
+    """
+    detected_texts = []
     
-    # 3. AWS Rekognition - Detect Text (texto en la imagen)
-    # NOTA: Requiere permiso rekognition:DetectText (pendiente de aprobación de seguridad)
     try:
         text_response = rekognition_client.detect_text(
-            Image={'Bytes': image_bytes}
+            Image=image
         )
         
-        detected_texts = []
         for text_detection in text_response.get('TextDetections', []):
-            if text_detection['Type'] == 'LINE' and text_detection['Confidence'] > 80:
+            if text_detection['Type'] == 'LINE' and text_detection['Confidence'] > rules.thresholds['text_min_confidence']:
                 detected_text = text_detection['DetectedText'].lower()
                 detected_texts.append(detected_text)
                 print(f"Text detected in image: {detected_text}")
-        
-        # Verificar palabras prohibidas en el texto detectado
-        for detected_text in detected_texts:
-            for profanity in PROFANITY_LIST:
-                if profanity in detected_text:
-                    rejection_reasons.append(f"Offensive text in image: '{profanity}'")
-                    print(f"Profanity in image text: {profanity}")
-                    break
                     
     except Exception as text_error:
         print(f"DetectText not available (permission pending): {str(text_error)}")
-        # Continuar sin detección de texto
+        # run_image_analyses continúa sin detección de texto
+        raise
+    
+    return detected_texts
+
+# Análisis de imagen independientes: nombre -> (función, resultado permisivo si falla o no se ejecuta)
+IMAGE_ANALYSES = [
+    ('is_video_game', verify_is_video_game, True),
+    ('moderation_reasons', check_moderation_labels, []),
+    ('detected_texts', detect_image_text, [])
+]
+
+# Etapa de métricas de cada análisis (llamada de Rekognition)
+ANALYSIS_STAGES = {
+    'is_video_game': 'DetectLabels',
+    'moderation_reasons': 'DetectModerationLabels',
+    'detected_texts': 'DetectText'
+}
+
+def is_definitive_rejection(name, result):
+    """
+    Indica si el resultado de un análisis ya basta para rechazar la imagen
+    """
+    if name == 'is_video_game':
+        return not result
+    if name == 'moderation_reasons':
+        return bool(result)
+    if name == 'detected_texts':
+        return bool(rules.matcher.find_in_segments(result))
+    return False
+
+def record_failure(results, name, error):
+    """
+    Anota un análisis fallido; los errores de lectura de la imagen marcan el resultado como 'unreadable'
+    """
+    results['failed'].append(name)
+    if getattr(error, 'response', {}).get('Error', {}).get('Code') in UNREADABLE_IMAGE_ERRORS:
+        results['unreadable'] = True
+
+def run_image_analyses(image, resolved=None):
+    """
+    Ejecuta los análisis de Rekognition en secuencia o en paralelo (REKOGNITION_PARALLEL)
+    Con REKOGNITION_EARLY_EXIT se dejan de esperar los restantes tras un rechazo definitivo
+    Si un análisis falla o expira se usa su resultado permisivo y se anota en 'failed'
+    image: parámetro Image de Rekognition ({'Bytes': ...} o {'S3Object': ...})
+    resolved: resultados ya decididos por la pre-clasificación (esos análisis no se ejecutan)
+    Retorna: dict con is_video_game, moderation_reasons, detected_texts, failed y skipped
+    ('unreadable' si Rekognition no pudo leer la imagen: se reintenta con los bytes normalizados)
+    """
+    resolved = resolved or {}
+    results = {name: default for name, _, default in IMAGE_ANALYSES}
+    results.update(resolved)
+    results['failed'] = []
+    results['skipped'] = list(resolved)
+    pending = [(name, analysis) for name, analysis, _ in IMAGE_ANALYSES if name not in resolved]
+    # El timer del registro se pasa explícitamente: los análisis en paralelo corren en otros hilos
+    timer = metrics.current_timer() or metrics.StageTimer()
+    
+    if not REKOGNITION_PARALLEL:
+        for name, analysis in pending:
+            try:
+                results[name] = timer.call(ANALYSIS_STAGES[name], analysis, image)
+            except Exception as e:
+                record_failure(results, name, e)
+                continue
+            if REKOGNITION_EARLY_EXIT and is_definitive_rejection(name, results[name]):
+                print(f"Early exit after {name}: definitive rejection found")
+                break
+        return results
+    
+    futures = {
+        rekognition_executor.submit(timer.call, ANALYSIS_STAGES[name], analysis, image): name
+        for name, analysis in pending
+    }
+    
+    try:
+        # Todas las llamadas salen a la vez, así que el timeout aplica a cada una
+        for future in as_completed(futures, timeout=REKOGNITION_CALL_TIMEOUT):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                record_failure(results, name, e)
+                continue
+            
+            if REKOGNITION_EARLY_EXIT and is_definitive_rejection(name, results[name]):
+                print(f"Early exit after {name}: definitive rejection found")
+                break
+    except FuturesTimeoutError:
+        pending = [name for future, name in futures.items() if not future.done()]
+        results['failed'].extend(pending)
+        print(f"Rekognition calls timed out after {REKOGNITION_CALL_TIMEOUT}s: {pending}, allowing by default")
+    finally:
+        # Las llamadas aún en cola no se ejecutan; las que ya salieron se ignoran
+        for future in futures:
+            future.cancel()
+    
+    return results
+
+def prescreen(header, image_info=None):
+    """
+    Nivel 2: clasificación local de la imagen según PRESCREEN_POLICY
+    Retorna: análisis resueltos sin Rekognition (nombre -> resultado), vacío si hay que analizar todo
+    """
+    if PRESCREEN_POLICY not in ('skip_labels', 'decide'):
+        return {}
+    
+    if image_info is None:
+        image_info = image_normalizer.probe_header(header)
+    classification = content_prescreen.classify(header, image_info)
+    if classification == content_prescreen.CAMERA_PHOTO and PRESCREEN_POLICY == 'decide':
+        print("Prescreen: camera photo (EXIF Make/Model), rejected without Rekognition")
+        resolved = {name: default for name, _, default in IMAGE_ANALYSES}
+        resolved['is_video_game'] = False
+        return resolved
+    if classification == content_prescreen.GAME_UI:
+        print(f"Prescreen: {image_info['width']}x{image_info['height']} screen capture, skipping DetectLabels")
+        return {'is_video_game': True}
+    return {}
+
+def set_moderation_tier(tier):
+    """
+    Nivel que decidió el veredicto (metadata, cache, prescreen, rekognition) en la línea de métricas del registro
+    """
+    timer = metrics.current_timer()
+    if timer is not None:
+        timer.properties['moderation_tier'] = tier
+
+def verdict_policy():
+    """
+    Políticas de moderación por niveles para las claves de verdict_cache
+    Vacía con las políticas por defecto (claves de siempre); se lee en cada llamada (los benchmarks las cambian)
+    """
+    policies = (MODERATION_METADATA_POLICY, PRESCREEN_POLICY)
+    return '' if policies == DEFAULT_POLICIES else '-'.join(policies)
+
+def analyze_from_s3(bucket, s3_key):
+    """
+    Rekognition lee la imagen directamente del bucket (S3Object): sin descargarla en la Lambda
+    Solo se leen los metadatos del objeto y los primeros PROBE_BYTES (formato y dimensiones)
+    Retorna: (dict de análisis o None si hay que usar la ruta de bytes, claves de caché ya consultadas)
+    """
+    with metrics.stage('S3Head'):
+        head = s3_client.head_object(Bucket=bucket, Key=s3_key, ChecksumMode='ENABLED')
+    
+    # Subidas con ChecksumSHA256: misma clave de caché que la ruta de bytes, sin leer la imagen
+    cache_keys = verdict_cache.compute_checksum_keys(head.get('ChecksumSHA256'), rules.cache_version, verdict_policy())
+    if cache_keys:
+        with metrics.stage('VerdictCacheLookup'):
+            analyses = verdict_cache.get_verdict(cache_keys)
+        if analyses is not None:
+            set_moderation_tier('cache')
+            return analyses, cache_keys
+    elif verdict_cache.VERDICT_CACHE_TABLE:
+        # Sin checksum de objeto completo (subidas sin x-amz-checksum-sha256 o multipart, cuyo checksum
+        # SHA-256 es compuesto): la ruta de bytes calcula el hash para no saltarse la caché
+        print("No full-object ChecksumSHA256, using the bytes path for the verdict cache")
+        return None, None
+    
+    object_args = {'Bucket': bucket, 'Key': s3_key}
+    if head.get('VersionId'):
+        object_args['VersionId'] = head['VersionId']
+    with metrics.stage('S3Probe'):
+        header = s3_client.get_object(
+            Range=f'bytes=0-{image_normalizer.PROBE_BYTES - 1}',
+            **object_args
+        )['Body'].read()
+    image_info = image_normalizer.probe_header(header)
+    if not image_normalizer.fits_rekognition_s3(image_info, head['ContentLength']):
+        print(f"Image needs normalization, downloading: {json.dumps(image_info)}")
+        return None, cache_keys
+    
+    s3_object = {'Bucket': bucket, 'Name': s3_key}
+    if 'VersionId' in object_args:
+        s3_object['Version'] = object_args['VersionId']
+    
+    resolved = prescreen(header, image_info)
+    set_moderation_tier('prescreen' if len(resolved) == len(IMAGE_ANALYSES) else 'rekognition')
+    print(f"Analyzing from S3Object ({head['ContentLength']} bytes, not downloaded): {json.dumps(image_info)}")
+    analyses = run_image_analyses({'S3Object': s3_object}, resolved)
+    if analyses.pop('unreadable', False):
+        print("Rekognition could not read the S3 object, falling back to bytes")
+        return None, cache_keys
+    
+    if cache_keys:
+        store_verdict(cache_keys, analyses)
+    return analyses, cache_keys
+
+def analyze_from_bytes(bucket, s3_key, checked_keys=None):
+    """
+    Descarga la imagen, la valida/normaliza y la envía a Rekognition como bytes
+    checked_keys: claves ya consultadas por analyze_from_s3 (no se vuelven a buscar)
+    Retorna: dict de análisis
+    Lanza: InvalidImageError si el archivo no es una imagen válida
+    """
+    with metrics.stage('S3Download'):
+        response = s3_client.get_object(Bucket=bucket, Key=s3_key)
+        image_bytes = response['Body'].read()
+    
+    # Las imágenes repetidas reutilizan el resultado guardado por hash de contenido
+    with metrics.stage('VerdictCacheLookup'):
+        cache_keys = verdict_cache.compute_keys(image_bytes, rules.cache_version, verdict_policy())
+        analyses = verdict_cache.get_verdict(cache_keys) if cache_keys != checked_keys else None
+    if analyses is not None:
+        set_moderation_tier('cache')
+        return analyses
+    
+    # Con la cabecera original: la imagen normalizada ya no tiene EXIF
+    resolved = prescreen(image_bytes[:image_normalizer.PROBE_BYTES])
+    
+    # Archivos corruptos o de otro formato se rechazan sin llamar a Rekognition
+    with metrics.stage('Normalize'):
+        analysis_bytes, image_info = image_normalizer.normalize_for_analysis(image_bytes)
+    print(f"Image normalized: {json.dumps(image_info)}")
+    
+    set_moderation_tier('prescreen' if len(resolved) == len(IMAGE_ANALYSES) else 'rekognition')
+    analyses = run_image_analyses({'Bytes': analysis_bytes}, resolved)
+    analyses.pop('unreadable', None)
+    store_verdict(cache_keys, analyses)
+    return analyses
+
+def store_verdict(cache_keys, analyses):
+    """
+    Guarda el resultado en la caché de veredictos
+    """
+    # Un análisis fallido se aprobó por defecto: no se guarda para volver a intentarlo
+    if not analyses['failed']:
+        rejected = any(is_definitive_rejection(name, analyses[name]) for name, _, _ in IMAGE_ANALYSES)
+        with metrics.stage('VerdictCacheStore'):
+            verdict_cache.put_verdict(cache_keys, analyses, rejected)
+
+def check_content(metadata, bucket, s3_key):
+    """
+    Verifica si el contenido es apropiado usando AWS Rekognition
+    Retorna: (is_appropriate: bool, rejection_reasons: list)
+    """
+    rejection_reasons = []
+    text_to_check = f"{metadata.get('description', '')} {metadata.get('game_title', '')}".lower()
+    
+    # Nivel 1: palabras prohibidas en la metadata, sin leer la imagen ni llamar a Rekognition
+    if MODERATION_METADATA_POLICY == 'reject':
+        metadata_matches = rules.matcher.find_in_segments([text_to_check])
+        if metadata_matches:
+            set_moderation_tier('metadata')
+            print("Image rejected by metadata text, skipping image analysis")
+            return False, metadata_rejection_reasons(metadata_matches)
+    
+    # 1-3. Análisis de imagen: videojuego, moderación visual y texto en la imagen
+    analyses, checked_keys = None, None
+    if REKOGNITION_IMAGE_SOURCE == 's3':
+        analyses, checked_keys = analyze_from_s3(bucket, s3_key)
+    if analyses is None:
+        try:
+            analyses = analyze_from_bytes(bucket, s3_key, checked_keys)
+        except image_normalizer.InvalidImageError as e:
+            print(f"Image rejected before analysis: {str(e)}")
+            return False, [f"Invalid image file: {str(e)}"]
+    
+    is_video_game = analyses['is_video_game']
+    moderation_reasons = analyses['moderation_reasons']
+    detected_texts = analyses['detected_texts']
+    
+    # Verificar que sea un videojuego (PRIMER FILTRO)
+    if not is_video_game:
+        rejection_reasons.append("Not a video game screenshot - real photo detected")
+        print("Image rejected: Not a video game screenshot")
+    
+    print(f"Video game verification: {'PASSED' if is_video_game else 'FAILED'}")
+    
+    # 4. Buscar palabras prohibidas en metadata y texto detectado en una sola pasada
+    metadata_matches = []
+    flagged_lines = set()
+    text_reasons = []
+    for match in rules.matcher.find_in_segments([text_to_check] + detected_texts):
+        if match.segment == 0:
+            metadata_matches.append(match)
+        elif match.segment not in flagged_lines:
+            # Una razón por línea detectada, como antes
+            flagged_lines.add(match.segment)
+            text_reasons.append(f"Offensive text in image: '{match.word}'")
+            print(f"Profanity in image text: {match.word} (offset {match.start})")
+    
+    # Mantener el orden original: metadata antes que moderación visual y texto en imagen
+    rejection_reasons.extend(metadata_rejection_reasons(metadata_matches))
+    rejection_reasons.extend(moderation_reasons)
+    rejection_reasons.extend(text_reasons)
     
     is_appropriate = len(rejection_reasons) == 0
     
     return is_appropriate, rejection_reasons
+
+def metadata_rejection_reasons(matches):
+    """
+    Una razón por palabra prohibida encontrada en el título/descripción
+    """
+    reasons = []
+    for match in matches:
+        reason = f"Inappropriate text in description: {match.word}"
+        if reason not in reasons:
+            reasons.append(reason)
+            print(f"Profanity in metadata detected: {match.word} (offset {match.start})")
+    return reasons
@@ -0,0 +1,196 @@
+"""
+Módulo: Profanity Matcher
+Índice multi-patrón (Aho-Corasick) para detectar palabras prohibidas en una sola pasada
+Incluye normalización de acentos y leetspeak, y soporte opcional de límites de palabra
+"""
+import bisect
+import re
+import unicodedata
+from collections import deque, namedtuple
+
+# Sustituciones leetspeak comunes (un carácter por otro, para conservar offsets)
+LEET_MAP = {
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't',
+    '@': 'a', '$': 's', '!': 'i', '|': 'l', '+': 't'
+}
+
+# Tokens donde se aplica leetspeak: letras/dígitos más los símbolos de LEET_MAP ('@ss', '$h!t')
+LEET_TOKEN = re.compile(r'(?:\w|[' + re.escape(''.join(ch for ch in LEET_MAP if not ch.isalnum())) + r'])+')
+LEET_TABLE = str.maketrans(LEET_MAP)
+
+# word: palabra original de la lista, start/end: offsets en el texto analizado
+Match = namedtuple('Match', ['word', 'start', 'end'])
+
+# segment: índice del texto dentro de la lista analizada con find_in_segments
+SegmentMatch = namedtuple('SegmentMatch', ['segment', 'word', 'start', 'end'])
+
+
+def _leet_token(match):
+    """
+    Aplica leetspeak solo a tokens con letras y no más dígitos que letras ('h4ck', 'b0t', '@ss')
+    Los números de la interfaz del juego ('14550', '30/455', 'b07') se quedan como están
+    """
+    token = match.group()
+    letters = sum(ch.isalpha() for ch in token)
+    if letters and letters >= sum(ch.isdigit() for ch in token):
+        return token.translate(LEET_TABLE)
+    return token
+
+
+def _normalize_char(ch):
+    """
+    Normaliza un carácter a minúscula sin acentos
+    Siempre devuelve exactamente un carácter para que los offsets no cambien
+    """
+    lower = ch.lower()
+    if len(lower) != 1:
+        lower = ch
+
+    base = [c for c in unicodedata.normalize('NFKD', lower) if not unicodedata.combining(c)]
+    if len(base) == 1:
+        return base[0]
+    return lower
+
+
+class ProfanityMatcher:
+    """
+    Autómata Aho-Corasick construido una vez (cold start) a partir de la lista de palabras
+    find_all() recorre el texto una sola vez sin importar cuántas palabras haya en la lista
+    """
+
+    def __init__(self, words, word_boundary=False, leetspeak=True):
+        self.word_boundary = word_boundary
+        self.leetspeak = leetspeak
+
+        # Tabla rápida para textos ASCII (str.translate corre en C)
+        self._ascii_table = {i: _normalize_char(chr(i)) for i in range(128)}
+        self._char_cache = {}
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self._words = []
+        self._lengths = []
+
+        seen = set()
+        for word in words:
+            pattern = self.normalize(word.strip())
+            if not pattern or pattern in seen:
+                continue
+            seen.add(pattern)
+            self._add_pattern(pattern, word)
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self._words)
+
+    def normalize(self, text):
+        """
+        Convierte el texto a la forma canónica usada por el autómata (misma longitud)
+        """
+        if text.isascii():
+            normalized = text.translate(self._ascii_table)
+        else:
+            cache = self._char_cache
+            chars = []
+            for ch in text:
+                normalized_ch = cache.get(ch)
+                if normalized_ch is None:
+                    normalized_ch = _normalize_char(ch)
+                    cache[ch] = normalized_ch
+                chars.append(normalized_ch)
+            normalized = ''.join(chars)
+
+        if self.leetspeak:
+            normalized = LEET_TOKEN.sub(_leet_token, normalized)
+        return normalized
+
+    def _add_pattern(self, pattern, word):
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = next_state
+            state = next_state
+
+        self._out[state] = self._out[state] + (len(self._words),)
+        self._words.append(word)
+        self._lengths.append(len(pattern))
+
+    def _build_failure_links(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(ch, 0)
+
+                # Heredar las salidas del estado de fallo (patrones que son sufijos)
+                if out[fail[next_state]]:
+                    out[next_state] = out[next_state] + out[fail[next_state]]
+
+    def find_all(self, text):
+        """
+        Busca todas las palabras prohibidas en el texto en una sola pasada
+        Retorna: lista de Match(word, start, end) ordenada por posición final
+        """
+        if not text or not self._words:
+            return []
+
+        normalized = self.normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        words, lengths = self._words, self._lengths
+        word_boundary = self.word_boundary
+        text_length = len(normalized)
+
+        matches = []
+        state = 0
+        for i, ch in enumerate(normalized):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            if not out[state]:
+                continue
+
+            for index in out[state]:
+                start = i - lengths[index] + 1
+                end = i + 1
+                if word_boundary:
+                    if start > 0 and normalized[start - 1].isalnum():
+                        continue
+                    if end < text_length and normalized[end].isalnum():
+                        continue
+                matches.append(Match(words[index], start, end))
+
+        return matches
+
+    def find_in_segments(self, segments):
+        """
+        Analiza varios textos (metadata, líneas OCR, ...) en una sola pasada
+        Retorna: lista de SegmentMatch con offsets relativos a cada segmento
+        """
+        starts = []
+        position = 0
+        for segment in segments:
+            starts.append(position)
+            position += len(segment) + 1
+
+        results = []
+        for match in self.find_all('\n'.join(segments)):
+            segment = bisect.bisect_right(starts, match.start) - 1
+            offset = starts[segment]
+            results.append(SegmentMatch(segment, match.word, match.start - offset, match.end - offset))
+
+        return results
@@ -0,0 +1,160 @@
+"""
+Módulo: Status Transitions
+Transiciones de estado de un screenshot con escrituras condicionales en DynamoDB
+PENDING_UPLOAD -> PROCESSING -> APPROVED/REJECTED (PENDING: subido por image_uploader, ya en cola)
+Cada trabajo de moderación tiene un moderation_job_id: los mensajes repetidos de SNS/SQS se descartan
+con una sola escritura condicional, antes de descargar la imagen o llamar a Rekognition
+Cada cambio de status incrementa la versión de la galería del usuario (caché de respuestas de image_retrieval)
+"""
+import time
+import uuid
+from botocore.exceptions import ClientError
+
+PENDING_UPLOAD = 'PENDING_UPLOAD'
+PENDING = 'PENDING'
+PROCESSING = 'PROCESSING'
+APPROVED = 'APPROVED'
+REJECTED = 'REJECTED'
+
+# Estado actual -> estados a los que se puede pasar
+ALLOWED_TRANSITIONS = {
+    PENDING_UPLOAD: (PROCESSING, REJECTED),
+    PENDING: (PROCESSING,),
+    # PROCESSING -> PROCESSING: reclamar un trabajo con lease vencido
+    # PROCESSING -> PENDING_UPLOAD: deshacer la confirmación si no se pudo publicar el trabajo
+    PROCESSING: (PROCESSING, APPROVED, REJECTED, PENDING_UPLOAD),
+}
+
+
+def new_job_id():
+    """
+    Identificador del trabajo de moderación (se guarda en el item y viaja en el mensaje SNS)
+    """
+    return str(uuid.uuid4())
+
+
+def transition(table, screenshot_id, from_statuses, to_status, values=None, remove=(),
+               condition=None, condition_values=None, bump_gallery=True):
+    """
+    Cambia el estado solo si el actual está en from_statuses (y se cumple condition, si se indica)
+    values: atributos a guardar junto con el estado; remove: atributos a eliminar
+    bump_gallery: incrementar la versión de la galería del usuario tras la escritura
+    Retorna: el item actualizado, o None si la condición no se cumple (otro proceso ya hizo la transición)
+    """
+    for from_status in from_statuses:
+        if to_status not in ALLOWED_TRANSITIONS.get(from_status, ()):
+            raise ValueError(f"Invalid status transition: {from_status} -> {to_status}")
+
+    values = values or {}
+    names = {'#status': 'status'}
+    expression_values = {':to_status': to_status}
+    assignments = ['#status = :to_status']
+    for name, value in values.items():
+        names[f'#{name}'] = name
+        expression_values[f':{name}'] = value
+        assignments.append(f'#{name} = :{name}')
+
+    update_expression = 'SET ' + ', '.join(assignments)
+    if remove:
+        names.update({f'#{name}': name for name in remove})
+        update_expression += ' REMOVE ' + ', '.join(f'#{name}' for name in remove)
+
+    from_placeholders = []
+    for index, from_status in enumerate(from_statuses):
+        expression_values[f':from{index}'] = from_status
+        from_placeholders.append(f':from{index}')
+    condition_expression = f"#status IN ({', '.join(from_placeholders)})"
+    if condition:
+        condition_expression += f' AND ({condition})'
+        expression_values.update(condition_values or {})
+
+    try:
+        result = table.update_item(
+            Key={'screenshot_id': screenshot_id},
+            UpdateExpression=update_expression,
+            ConditionExpression=condition_expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=expression_values,
+            ReturnValues='ALL_NEW'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise
+
+    item = result['Attributes']
+    if bump_gallery and item.get('user_id'):
+        bump_gallery_version(table, item['user_id'])
+    return item
+
+
+def claim_job(table, screenshot_id, job_id, lease_seconds):
+    """
+    Reclama el trabajo de moderación antes de procesarlo
+    Falla si el trabajo ya terminó, es de otro job_id o lo está procesando otra invocación (lease vigente)
+    Retorna: el item (evita un GetItem aparte), o None si el mensaje se debe descartar
+    No incrementa la versión de la galería: complete_job lo hace en la misma invocación
+    """
+    now = int(time.time())
+    return transition(
+        table, screenshot_id,
+        from_statuses=(PENDING, PROCESSING),
+        to_status=PROCESSING,
+        values={'moderation_job_id': job_id, 'moderation_lease_until': now + lease_seconds},
+        condition=(
+            '(attribute_not_exists(moderation_job_id) OR moderation_job_id = :job_id) '
+            'AND (attribute_not_exists(moderation_lease_until) OR moderation_lease_until < :now)'
+        ),
+        condition_values={':job_id': job_id, ':now': now},
+        bump_gallery=False
+    )
+
+
+def complete_job(table, screenshot_id, job_id, to_status, values=None):
+    """
+    Guarda el veredicto (APPROVED/REJECTED) si el trabajo sigue siendo de este job_id
+    Retorna: el item actualizado, o None si otra invocación ya lo completó
+    """
+    return transition(
+        table, screenshot_id,
+        from_statuses=(PROCESSING,),
+        to_status=to_status,
+        values=values,
+        remove=('moderation_lease_until',),
+        condition='moderation_job_id = :job_id',
+        condition_values={':job_id': job_id}
+    )
+
+
+def release_job(table, screenshot_id, job_id):
+    """
+    Libera el lease tras un error para que el reintento del mensaje no espere a que venza
+    """
+    try:
+        table.update_item(
+            Key={'screenshot_id': screenshot_id},
+            UpdateExpression='REMOVE moderation_lease_until',
+            ConditionExpression='#status = :processing AND moderation_job_id = :job_id',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':processing': PROCESSING, ':job_id': job_id}
+        )
+    except Exception as e:
+        # Si falla, el reintento espera a que el lease venza
+        print(f"Error releasing moderation job {job_id}: {str(e)}")
+
+
+def bump_gallery_version(table, user_id):
+    """
+    Incrementa el contador de versión de la galería del usuario (lo lee image_retrieval)
+    Lo llaman las transiciones y los handlers que crean items (generate_upload_url, image_uploader)
+    El item no tiene user_id ni status, así que no aparece en los GSI
+    """
+    try:
+        table.update_item(
+            Key={'screenshot_id': f"gallery_version#{user_id}"},
+            UpdateExpression='ADD gallery_version :one',
+            ExpressionAttributeValues={':one': 1}
+        )
+    except Exception as e:
+        # No es crítico: la caché de image_retrieval expira sola por TTL
+        print(f"Error bumping gallery version for {user_id}: {str(e)}")
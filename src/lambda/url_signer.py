@@ -0,0 +1,175 @@
+"""
+Módulo: URL Signer
+Firma URLs de imágenes reutilizando firmas dentro de una ventana de tiempo
+Las expiraciones se alinean a la ventana para devolver URLs idénticas entre peticiones (cacheables)
+Soporta URLs firmadas de CloudFront, cookies firmadas de CloudFront y URLs pre-firmadas de S3
+"""
+import base64
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import formatdate
+from botocore.signers import CloudFrontSigner
+import aws_clients
+
+PROCESSED_BUCKET = os.environ['PROCESSED_BUCKET']
+CLOUDFRONT_DOMAIN = os.environ.get('CLOUDFRONT_DOMAIN', '')
+# '' = URL pública de CloudFront (comportamiento anterior), 'url' = URL firmada, 'cookie' = cookies firmadas
+CLOUDFRONT_SIGNING_MODE = os.environ.get('CLOUDFRONT_SIGNING_MODE', '').lower()
+CLOUDFRONT_KEY_PAIR_ID = os.environ.get('CLOUDFRONT_KEY_PAIR_ID', '')
+CLOUDFRONT_PRIVATE_KEY_SECRET = os.environ.get('CLOUDFRONT_PRIVATE_KEY_SECRET', '')
+# Dominio de las cookies (p. ej. .example.com); API y CloudFront deben compartir el dominio padre
+CLOUDFRONT_COOKIE_DOMAIN = os.environ.get('CLOUDFRONT_COOKIE_DOMAIN', '')
+
+# Prefijo de las imágenes servidas: processed/ (bucket de procesados) o raw/ con PROMOTION_STRATEGY=tag
+IMAGE_KEY_PREFIX = os.environ.get('IMAGE_KEY_PREFIX', 'processed/')
+
+URL_EXPIRATION = int(os.environ.get('URL_EXPIRATION', '3600'))  # 1 hora de validez mínima
+SIGNING_WINDOW = int(os.environ.get('SIGNING_WINDOW', '900'))  # firmas reutilizadas por 15 minutos
+SIGNED_URL_CACHE_SIZE = int(os.environ.get('SIGNED_URL_CACHE_SIZE', '4096'))
+
+s3_client = aws_clients.lazy_client('s3')
+
+# (s3_key, expires_at) -> URL firmada
+_url_cache = OrderedDict()
+_cloudfront_signer = None
+
+
+def aligned_expiry(now=None):
+    """
+    Expiración común a todas las firmas de la ventana actual
+    Cualquier URL firmada en la ventana vale al menos URL_EXPIRATION segundos
+    """
+    now = int(now if now is not None else time.time())
+    window_start = now - now % SIGNING_WINDOW
+    return window_start + SIGNING_WINDOW + URL_EXPIRATION
+
+
+def _cache_get(cache_key):
+    url = _url_cache.get(cache_key)
+    if url is not None:
+        _url_cache.move_to_end(cache_key)
+    return url
+
+
+def _cache_put(cache_key, url):
+    _url_cache[cache_key] = url
+    while len(_url_cache) > SIGNED_URL_CACHE_SIZE:
+        _url_cache.popitem(last=False)
+
+
+def _get_cloudfront_signer():
+    """
+    Carga la clave privada de Secrets Manager una sola vez por contenedor
+    Requiere el paquete cryptography (se incluye en image_retrieval.zip al empaquetar)
+    """
+    global _cloudfront_signer
+
+    if _cloudfront_signer is None:
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        if not CLOUDFRONT_KEY_PAIR_ID or not CLOUDFRONT_PRIVATE_KEY_SECRET:
+            raise RuntimeError('CloudFront signing requires CLOUDFRONT_KEY_PAIR_ID and CLOUDFRONT_PRIVATE_KEY_SECRET')
+
+        secret = aws_clients.client('secretsmanager').get_secret_value(SecretId=CLOUDFRONT_PRIVATE_KEY_SECRET)
+        private_key = serialization.load_pem_private_key(secret['SecretString'].encode(), password=None)
+
+        def rsa_signer(message):
+            # CloudFront exige SHA-1
+            return private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+
+        _cloudfront_signer = CloudFrontSigner(CLOUDFRONT_KEY_PAIR_ID, rsa_signer)
+
+    return _cloudfront_signer
+
+
+def _cloudfront_b64(data):
+    # Variante de base64 que usa CloudFront en URLs y cookies
+    return base64.b64encode(data).decode().replace('+', '-').replace('=', '_').replace('/', '~')
+
+
+def sign_url(s3_key, now=None):
+    """
+    Genera la URL de acceso a una imagen procesada
+    Retorna: URL (firmada según el modo configurado) o None si falla la firma
+    """
+    if CLOUDFRONT_DOMAIN and CLOUDFRONT_SIGNING_MODE != 'url':
+        # Sin firma por objeto: pública o protegida por las cookies de signed_cookies()
+        return f"https://{CLOUDFRONT_DOMAIN}/{s3_key}"
+
+    now = int(now if now is not None else time.time())
+    expires_at = aligned_expiry(now)
+    cache_key = (s3_key, expires_at)
+
+    url = _cache_get(cache_key)
+    if url is not None:
+        return url
+
+    try:
+        if CLOUDFRONT_DOMAIN:
+            url = _get_cloudfront_signer().generate_presigned_url(
+                f"https://{CLOUDFRONT_DOMAIN}/{s3_key}",
+                date_less_than=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+            )
+        else:
+            # La firma SigV4 incluye la hora de firma, así que solo se reutiliza dentro del contenedor
+            url = s3_client.generate_presigned_url(
+                'get_object',
+                Params={
+                    'Bucket': PROCESSED_BUCKET,
+                    'Key': s3_key
+                },
+                ExpiresIn=expires_at - now
+            )
+    except Exception as e:
+        print(f"Error generating signed URL for {s3_key}: {str(e)}")
+        return None
+
+    _cache_put(cache_key, url)
+    return url
+
+
+def signed_cookies(resource_path=f'{IMAGE_KEY_PREFIX}*', now=None):
+    """
+    Cookies firmadas de CloudFront (política custom con comodín) para CLOUDFRONT_SIGNING_MODE=cookie
+    Retorna: lista de valores Set-Cookie, vacía si el modo no es 'cookie' o si falla la firma
+    """
+    if not CLOUDFRONT_DOMAIN or CLOUDFRONT_SIGNING_MODE != 'cookie':
+        return []
+
+    now = int(now if now is not None else time.time())
+    expires_at = aligned_expiry(now)
+    cache_key = (f"cookie:{resource_path}", expires_at)
+
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return json.loads(cached)
+
+    try:
+        signer = _get_cloudfront_signer()
+        policy = signer.build_policy(
+            f"https://{CLOUDFRONT_DOMAIN}/{resource_path}",
+            datetime.fromtimestamp(expires_at, tz=timezone.utc)
+        ).encode()
+        signature = signer.rsa_signer(policy)
+    except Exception as e:
+        # Igual que sign_url: el listado se sirve aunque las imágenes no se puedan abrir
+        print(f"Error generating signed cookies for {resource_path}: {str(e)}")
+        return []
+
+    # Expires absoluto (no Max-Age) para que las cookies de la ventana sean idénticas
+    attributes = f"Path=/; Secure; HttpOnly; SameSite=None; Expires={formatdate(expires_at, usegmt=True)}"
+    if CLOUDFRONT_COOKIE_DOMAIN:
+        attributes += f"; Domain={CLOUDFRONT_COOKIE_DOMAIN}"
+
+    cookies = [
+        f"CloudFront-Policy={_cloudfront_b64(policy)}; {attributes}",
+        f"CloudFront-Signature={_cloudfront_b64(signature)}; {attributes}",
+        f"CloudFront-Key-Pair-Id={CLOUDFRONT_KEY_PAIR_ID}; {attributes}"
+    ]
+
+    _cache_put(cache_key, json.dumps(cookies))
+    return cookies
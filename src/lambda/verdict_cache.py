@@ -0,0 +1,212 @@
+"""
+Módulo: Verdict Cache
+Caché de resultados de análisis de imagen por hash de contenido (SHA-256 y opcionalmente dHash)
+Capa LRU en memoria del contenedor + tabla DynamoDB con TTL compartida entre contenedores
+"""
+import base64
+import binascii
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import aws_clients
+import image_normalizer
+import metrics
+
+VERDICT_CACHE_TABLE = os.environ.get('VERDICT_CACHE_TABLE', '')
+VERDICT_CACHE_TTL = int(os.environ.get('VERDICT_CACHE_TTL', str(30 * 24 * 3600)))  # 30 días
+VERDICT_CACHE_LRU_SIZE = int(os.environ.get('VERDICT_CACHE_LRU_SIZE', '1024'))
+VERDICT_CACHE_PERCEPTUAL = os.environ.get('VERDICT_CACHE_PERCEPTUAL', 'false').lower() == 'true'
+# Cambiar la versión invalida todos los veredictos (p. ej. al cambiar umbrales de moderación)
+VERDICT_CACHE_VERSION = os.environ.get('VERDICT_CACHE_VERSION', '1')
+
+cache_table = aws_clients.lazy_table(VERDICT_CACHE_TABLE) if VERDICT_CACHE_TABLE else None
+
+# Capa en memoria: clave -> (expires_at, analyses_json)
+# El lock protege el LRU y los contadores cuando se procesan varios registros en paralelo
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+# Contadores de la invocación actual (se reinician en emit_metrics)
+stats = {'hits': 0, 'misses': 0, 'memory_hits': 0, 'table_hits': 0}
+
+
+def perceptual_hash(image_bytes):
+    """
+    dHash de 64 bits: detecta la misma imagen re-codificada o redimensionada
+    Retorna: hex de 16 caracteres, o None si Pillow no está disponible o la imagen no decodifica
+    """
+    Image = image_normalizer.load_pillow()
+    if Image is None:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.draft('L', (64, 64))
+            pixels = list(img.convert('L').resize((9, 8)).getdata())
+    except Exception as e:
+        print(f"Perceptual hash failed: {str(e)}")
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return f"{value:016x}"
+
+
+def key_prefix(rules_version=None, policy=None):
+    """
+    Prefijo de las claves: versión de la caché, la de las reglas publicadas y la política de moderación
+    Un cambio de reglas (moderation_rules) o de política usa claves nuevas sin tocar VERDICT_CACHE_VERSION
+    """
+    prefix = f"v{VERDICT_CACHE_VERSION}"
+    if rules_version:
+        prefix += f".r{rules_version}"
+    if policy:
+        prefix += f".p{policy}"
+    return prefix
+
+
+def compute_keys(image_bytes, rules_version=None, policy=None):
+    """
+    Calcula las claves de caché de la imagen
+    Retorna: dict {'sha256': clave} y 'dhash' si VERDICT_CACHE_PERCEPTUAL está activo
+    """
+    prefix = key_prefix(rules_version, policy)
+    keys = {'sha256': f"{prefix}#sha256:{hashlib.sha256(image_bytes).hexdigest()}"}
+
+    if VERDICT_CACHE_PERCEPTUAL:
+        dhash = perceptual_hash(image_bytes)
+        if dhash:
+            keys['dhash'] = f"{prefix}#dhash:{dhash}"
+
+    return keys
+
+
+def compute_checksum_keys(checksum_sha256, rules_version=None, policy=None):
+    """
+    Claves de caché a partir del ChecksumSHA256 que guarda S3 (base64), sin descargar la imagen
+    Es el mismo SHA-256 de compute_keys, así que ambas rutas comparten veredictos
+    Retorna: dict {'sha256': clave}, o None si el objeto no tiene checksum de objeto completo
+    """
+    # Las subidas multipart guardan un checksum compuesto ('...-N') que no es el del contenido
+    if not checksum_sha256 or '-' in checksum_sha256:
+        return None
+    try:
+        digest = base64.b64decode(checksum_sha256, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return {'sha256': f"{key_prefix(rules_version, policy)}#sha256:{digest.hex()}"}
+
+
+def _remember(key, expires_at, analyses_json):
+    with _lock:
+        _lru[key] = (expires_at, analyses_json)
+        _lru.move_to_end(key)
+        while len(_lru) > VERDICT_CACHE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _count(*names):
+    with _lock:
+        for name in names:
+            stats[name] += 1
+
+
+def get_verdict(keys):
+    """
+    Busca un resultado previo para la imagen (primero en memoria, luego en DynamoDB)
+    Retorna: dict de análisis guardado por put_verdict, o None si no hay
+    """
+    now = int(time.time())
+
+    for key in keys.values():
+        with _lock:
+            entry = _lru.get(key)
+            if entry:
+                _lru.move_to_end(key)
+        if entry and entry[0] > now:
+            _count('hits', 'memory_hits')
+            print(f"Verdict cache hit (memory): {key}")
+            return json.loads(entry[1])
+
+    if cache_table is not None:
+        for key in keys.values():
+            try:
+                item = cache_table.get_item(Key={'image_hash': key}).get('Item')
+            except Exception as e:
+                print(f"Verdict cache lookup failed: {str(e)}")
+                break
+
+            # El TTL de DynamoDB borra con retraso, así que se verifica aquí también
+            if item and int(item['expires_at']) > now:
+                _remember(key, int(item['expires_at']), item['analyses'])
+                _count('hits', 'table_hits')
+                print(f"Verdict cache hit (DynamoDB): {key}")
+                return json.loads(item['analyses'])
+
+    _count('misses')
+    return None
+
+
+def put_verdict(keys, analyses, rejected):
+    """
+    Guarda el resultado del análisis de la imagen
+    La clave perceptual solo se guarda para rechazos: una colisión de dHash nunca aprueba una imagen
+    """
+    expires_at = int(time.time()) + VERDICT_CACHE_TTL
+    analyses_json = json.dumps(analyses)
+
+    store_keys = [keys['sha256']]
+    if rejected and 'dhash' in keys:
+        store_keys.append(keys['dhash'])
+
+    for key in store_keys:
+        _remember(key, expires_at, analyses_json)
+
+        if cache_table is None:
+            continue
+
+        try:
+            cache_table.put_item(
+                Item={
+                    'image_hash': key,
+                    'analyses': analyses_json,
+                    'expires_at': expires_at
+                }
+            )
+        except Exception as e:
+            print(f"Verdict cache write failed: {str(e)}")
+
+
+def emit_metrics():
+    """
+    Publica hits/misses de la invocación como CloudWatch Embedded Metric Format y reinicia contadores
+    """
+    with _lock:
+        counts = dict(stats)
+        for name in stats:
+            stats[name] = 0
+
+    lookups = counts['hits'] + counts['misses']
+    if not lookups:
+        return
+
+    metrics.emit(
+        {
+            'VerdictCacheHits': counts['hits'],
+            'VerdictCacheMisses': counts['misses'],
+            'VerdictCacheHitRate': round(100.0 * counts['hits'] / lookups, 2)
+        },
+        units={'VerdictCacheHitRate': 'Percent'},
+        properties={
+            'VerdictCacheMemoryHits': counts['memory_hits'],
+            'VerdictCacheTableHits': counts['table_hits']
+        }
+    )
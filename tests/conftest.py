@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los handlers se importan como módulos sueltos, igual que en el paquete de la Lambda
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda'))
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+moto = pytest.importorskip('moto')
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('RAW_BUCKET', 'test-raw')
+os.environ.setdefault('PROCESSED_BUCKET', 'test-processed')
+os.environ.setdefault('METADATA_TABLE', 'test-metadata')
+os.environ.setdefault('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:123456789012:test-filter')
+
+import aws_clients  # noqa: E402
+import confirm_upload  # noqa: E402
+import generate_upload_url  # noqa: E402
+import image_retrieval  # noqa: E402
+
+USER_ID = 'user-1'
+
+
+@pytest.fixture(autouse=True)
+def aws(monkeypatch):
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    monkeypatch.setattr(aws_clients, '_resources', {})
+    monkeypatch.setattr(aws_clients, '_tables', {})
+    monkeypatch.setattr(image_retrieval, '_response_cache', image_retrieval.OrderedDict())
+
+    with moto.mock_aws():
+        aws_clients.client('dynamodb').create_table(
+            TableName=os.environ['METADATA_TABLE'],
+            KeySchema=[{'AttributeName': 'screenshot_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'screenshot_id', 'AttributeType': 'S'},
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'upload_timestamp', 'AttributeType': 'S'},
+                {'AttributeName': 'status', 'AttributeType': 'S'},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': name,
+                    'KeySchema': [
+                        {'AttributeName': hash_key, 'KeyType': 'HASH'},
+                        {'AttributeName': 'upload_timestamp', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+                for name, hash_key in ((image_retrieval.USER_INDEX_NAME, 'user_id'),
+                                       (image_retrieval.STATUS_INDEX_NAME, 'status'))
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        aws_clients.client('sns').create_topic(Name=os.environ['SNS_TOPIC_ARN'].rsplit(':', 1)[1])
+        yield
+
+
+def api_event(body=None, query=None):
+    return {
+        'body': json.dumps(body) if body is not None else None,
+        'queryStringParameters': query,
+        'path': '/screenshots',
+        'requestContext': {'authorizer': {'claims': {'sub': USER_ID}}}
+    }
+
+
+def list_ids(status):
+    result = image_retrieval.lambda_handler(api_event(query={'status': status}), None)
+    assert result['statusCode'] == 200
+    return [item['screenshot_id'] for item in json.loads(result['body'])['screenshots']]
+
+
+def test_new_upload_invalidates_the_cached_gallery():
+    assert list_ids('PENDING_UPLOAD') == []
+
+    result = generate_upload_url.lambda_handler(api_event(body={'filename': 'shot.png'}), None)
+    screenshot_id = json.loads(result['body'])['screenshot_id']
+
+    assert list_ids('PENDING_UPLOAD') == [screenshot_id]
+
+
+def test_confirmation_invalidates_the_cached_gallery():
+    result = generate_upload_url.lambda_handler(api_event(body={'filename': 'shot.png'}), None)
+    upload = json.loads(result['body'])
+    assert list_ids('PROCESSING') == []
+
+    confirm_upload.handle_s3_event({'Records': [{
+        'eventName': 'ObjectCreated:Put',
+        's3': {'object': {'key': upload['s3_key'], 'size': 1024}}
+    }]})
+
+    assert list_ids('PROCESSING') == [upload['screenshot_id']]
+    assert list_ids('PENDING_UPLOAD') == []
@@ -0,0 +1,64 @@
+import io
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import index  # noqa: E402
+
+
+class RecordingExecutor:
+    """
+    Ejecuta cada trabajo en el acto y guarda la imagen que recibió
+    """
+    def __init__(self):
+        self.images = []
+
+    def submit(self, function, image, image_format, dest_bucket, dest_key):
+        self.images.append(image)
+        future = Future()
+        future.set_result((dest_key, 0))
+        return future
+
+
+class StubS3:
+    def __init__(self, body):
+        self.body = body
+
+    def get_object(self, **kwargs):
+        return {'Body': io.BytesIO(self.body)}
+
+
+class StubTable:
+    def put_item(self, Item):
+        self.item = Item
+
+
+class StubDynamoDB:
+    def Table(self, name):
+        return StubTable()
+
+
+@pytest.mark.parametrize('width', [2400, 200], ids=['large', 'small'])
+def test_encoding_jobs_never_share_an_image(width, monkeypatch):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, width // 2), 'navy').save(buffer, format='PNG')
+
+    executor = RecordingExecutor()
+    monkeypatch.setenv('PROCESSED_BUCKET', 'test-processed')
+    monkeypatch.setenv('METADATA_TABLE', 'test-metadata')
+    monkeypatch.setattr(index, 'DERIVATIVE_FORMATS', ['webp', 'avif'])
+    monkeypatch.setattr(index, 'upload_executor', executor)
+    monkeypatch.setattr(index, '_s3', StubS3(buffer.getvalue()))
+    monkeypatch.setattr(index, '_dynamodb', StubDynamoDB())
+
+    index.process_record({'s3': {'bucket': {'name': 'test-raw'}, 'object': {'key': 'player1/shot.png'}}})
+
+    assert len(executor.images) == len(index.DERIVATIVE_SIZES) * 2
+    assert len({id(image) for image in executor.images}) == len(executor.images)
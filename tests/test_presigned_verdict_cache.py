@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import io
+import os
+
+import pytest
+
+moto = pytest.importorskip('moto')
+requests = pytest.importorskip('requests')
+Image = pytest.importorskip('PIL.Image')
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('RAW_BUCKET', 'test-raw')
+os.environ.setdefault('PROCESSED_BUCKET', 'test-processed')
+os.environ.setdefault('METADATA_TABLE', 'test-metadata')
+os.environ.setdefault('NOTIFICATION_TOPIC_ARN', 'arn:aws:sns:us-east-1:123456789012:test-notify')
+
+import aws_clients  # noqa: E402
+import generate_upload_url  # noqa: E402
+import profanity_filter  # noqa: E402
+import verdict_cache  # noqa: E402
+
+from test_profanity_filter import StubRekognition  # noqa: E402
+
+VERDICT_TABLE = 'test-verdict-cache'
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    # Clientes nuevos dentro del mock (aws_clients los guarda por contenedor)
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    monkeypatch.setattr(aws_clients, '_resources', {})
+    monkeypatch.setattr(aws_clients, '_tables', {})
+    monkeypatch.setattr(verdict_cache, '_lru', verdict_cache.OrderedDict())
+    monkeypatch.setattr(verdict_cache, 'VERDICT_CACHE_TABLE', VERDICT_TABLE)
+    monkeypatch.setattr(verdict_cache, 'cache_table', aws_clients.lazy_table(VERDICT_TABLE))
+
+    with moto.mock_aws():
+        aws_clients.client('s3').create_bucket(Bucket=os.environ['RAW_BUCKET'])
+        aws_clients.client('dynamodb').create_table(
+            TableName=VERDICT_TABLE,
+            AttributeDefinitions=[{'AttributeName': 'image_hash', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'image_hash', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        rekognition = StubRekognition()
+        monkeypatch.setattr(profanity_filter, 'rekognition_client', rekognition)
+        yield rekognition
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1280, 720), 'darkgreen').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def presigned_upload(image):
+    """
+    Sube la imagen como lo hace el cliente: URL pre-firmada + upload_headers + x-amz-checksum-sha256
+    """
+    _, upload = generate_upload_url.build_upload('user-1', {'filename': 'shot.png'}, {}, 900)
+    headers = dict(upload['upload_headers'])
+    headers['x-amz-checksum-sha256'] = base64.b64encode(hashlib.sha256(image).digest()).decode()
+    result = requests.put(upload['upload_url'], data=image, headers=headers)
+    assert result.status_code == 200, result.text
+    return upload['s3_key']
+
+
+def test_second_identical_presigned_upload_hits_the_cache(aws):
+    image = png_bytes()
+
+    first, _ = profanity_filter.analyze_from_s3(os.environ['RAW_BUCKET'], presigned_upload(image))
+    calls_after_first = len(aws.calls)
+    assert calls_after_first > 0
+    assert first['is_video_game'] is True
+
+    # Sin la capa en memoria: el veredicto sale de la tabla compartida entre contenedores
+    verdict_cache._lru.clear()
+    second, cache_keys = profanity_filter.analyze_from_s3(os.environ['RAW_BUCKET'], presigned_upload(image))
+
+    assert len(aws.calls) == calls_after_first
+    assert cache_keys is not None
+    assert second['is_video_game'] is True
+
+
+def test_object_without_checksum_uses_the_bytes_path(aws):
+    s3_key = 'raw/user-1/no-checksum.png'
+    aws_clients.client('s3').put_object(Bucket=os.environ['RAW_BUCKET'], Key=s3_key, Body=png_bytes())
+
+    analyses, cache_keys = profanity_filter.analyze_from_s3(os.environ['RAW_BUCKET'], s3_key)
+
+    assert (analyses, cache_keys) == (None, None)
+    assert aws.calls == []
+
+
+def test_policy_change_uses_new_cache_keys(aws, monkeypatch):
+    image = png_bytes()
+    profanity_filter.analyze_from_s3(os.environ['RAW_BUCKET'], presigned_upload(image))
+    calls_after_first = len(aws.calls)
+
+    # Los veredictos guardados con la política anterior no se reutilizan
+    monkeypatch.setattr(profanity_filter, 'PRESCREEN_POLICY', 'skip_labels')
+    _, cache_keys = profanity_filter.analyze_from_s3(os.environ['RAW_BUCKET'], presigned_upload(image))
+
+    assert len(aws.calls) > calls_after_first
+    assert cache_keys['sha256'].startswith(verdict_cache.key_prefix(None, 'reject-skip_labels') + '#')
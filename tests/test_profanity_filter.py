@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+# Variables que profanity_filter lee al importarse
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('RAW_BUCKET', 'test-raw')
+os.environ.setdefault('PROCESSED_BUCKET', 'test-processed')
+os.environ.setdefault('METADATA_TABLE', 'test-metadata')
+os.environ.setdefault('NOTIFICATION_TOPIC_ARN', 'arn:aws:sns:us-east-1:123456789012:test-notify')
+
+import profanity_filter  # noqa: E402
+
+IMAGES = [
+    {'S3Object': {'Bucket': 'test-raw', 'Name': f'raw/user/{index}.png'}}
+    for index in range(3)
+]
+
+
+class StubRekognition:
+    """
+    Cliente de Rekognition que registra cada llamada
+    """
+    def __init__(self, moderation_labels=()):
+        self.moderation_labels = list(moderation_labels)
+        self.calls = []
+
+    def detect_moderation_labels(self, **kwargs):
+        self.calls.append(('detect_moderation_labels', kwargs))
+        min_confidence = kwargs.get('MinConfidence', 50.0)
+        return {'ModerationLabels': [
+            label for label in self.moderation_labels if label['Confidence'] >= min_confidence
+        ]}
+
+    def detect_labels(self, **kwargs):
+        self.calls.append(('detect_labels', kwargs))
+        return {'Labels': [{'Name': 'Video Game', 'Confidence': 95.0}]}
+
+    def detect_text(self, **kwargs):
+        self.calls.append(('detect_text', kwargs))
+        return {'TextDetections': []}
+
+    def moderation_calls(self):
+        return [kwargs for name, kwargs in self.calls if name == 'detect_moderation_labels']
+
+
+@pytest.fixture(params=[False, True], ids=['info', 'debug'])
+def rekognition(request, monkeypatch):
+    stub = StubRekognition([
+        {'Name': 'Smoking', 'ParentName': 'Drugs & Tobacco', 'Confidence': 90.0},
+        {'Name': 'Alcohol', 'ParentName': 'Alcohol', 'Confidence': 20.0},
+    ])
+    monkeypatch.setattr(profanity_filter, 'rekognition_client', stub)
+    monkeypatch.setattr(profanity_filter, 'DEBUG_LOGGING', request.param)
+    return stub
+
+
+def test_one_moderation_call_per_image(rekognition):
+    for image in IMAGES:
+        profanity_filter.check_moderation_labels(image)
+
+    calls = rekognition.moderation_calls()
+    assert len(calls) == len(IMAGES)
+    assert [call['Image'] for call in calls] == IMAGES
+
+
+def test_one_moderation_call_per_image_in_full_analysis(rekognition):
+    for image in IMAGES:
+        profanity_filter.run_image_analyses(image)
+
+    calls = rekognition.moderation_calls()
+    assert len(calls) == len(IMAGES)
+    assert sorted(call['Image']['S3Object']['Name'] for call in calls) == [image['S3Object']['Name'] for image in IMAGES]
+
+
+def test_threshold_applied_locally_at_any_log_level(rekognition):
+    # Con DEBUG se piden todas las etiquetas, pero solo rechazan las que superan el umbral
+    reasons = profanity_filter.check_moderation_labels(IMAGES[0])
+
+    assert len(reasons) == 1
+    assert reasons[0].startswith('Inappropriate visual content: Smoking (Drugs & Tobacco)')
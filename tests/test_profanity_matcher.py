@@ -0,0 +1,52 @@
+import pytest
+
+from profanity_matcher import ProfanityMatcher
+
+WORDS = ['ass', 'bot', 'hack', 'shit', 'kill', 'badword1']
+
+
+@pytest.fixture
+def matcher():
+    # Opciones por defecto de moderation_rules: leetspeak sí, límites de palabra no
+    return ProfanityMatcher(WORDS, word_boundary=False, leetspeak=True)
+
+
+@pytest.mark.parametrize('text', [
+    'score: 14550',
+    'gold 3455 xp',
+    'ammo 30/455',
+    'b07 enabled',
+    'hp 100/100  lvl 57',
+    'fps 144 | ping 15ms',
+])
+def test_numeric_hud_text_does_not_match(matcher, text):
+    assert matcher.find_all(text) == []
+
+
+@pytest.mark.parametrize('text, word', [
+    ('h4ck3r', 'hack'),
+    ('b0t detected', 'bot'),
+    ('@ss', 'ass'),
+    ('$h!t happens', 'shit'),
+    ('k1ll them', 'kill'),
+    ('badword1', 'badword1'),
+])
+def test_leetspeak_inside_words_matches(matcher, text, word):
+    assert word in [match.word for match in matcher.find_all(text)]
+
+
+def test_offsets_refer_to_original_text(matcher):
+    text = 'gold 3455 xp, h4ck'
+    [match] = matcher.find_all(text)
+    assert text[match.start:match.end] == 'h4ck'
+
+
+def test_without_leetspeak_digits_are_literal():
+    matcher = ProfanityMatcher(WORDS, leetspeak=False)
+    assert matcher.find_all('h4ck b0t') == []
+    assert [match.word for match in matcher.find_all('hack')] == ['hack']
+
+
+def test_find_in_segments_reports_segment(matcher):
+    matches = matcher.find_in_segments(['kills 12', 'ammo 30/455', 'sh1t'])
+    assert [(match.segment, match.word) for match in matches] == [(0, 'kill'), (2, 'shit')]
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('PROCESSED_BUCKET', 'test-processed')
+
+import url_signer  # noqa: E402
+
+
+@pytest.fixture
+def broken_signer(monkeypatch):
+    # Como un paquete sin cryptography: la carga del firmante falla
+    def missing_cryptography():
+        raise ImportError("No module named 'cryptography'")
+
+    monkeypatch.setattr(url_signer, 'CLOUDFRONT_DOMAIN', 'cdn.example.com')
+    monkeypatch.setattr(url_signer, '_get_cloudfront_signer', missing_cryptography)
+    monkeypatch.setattr(url_signer, '_url_cache', url_signer.OrderedDict())
+
+
+def test_signed_cookies_fail_soft(broken_signer, monkeypatch):
+    monkeypatch.setattr(url_signer, 'CLOUDFRONT_SIGNING_MODE', 'cookie')
+    assert url_signer.signed_cookies() == []
+
+
+def test_sign_url_fail_soft(broken_signer, monkeypatch):
+    monkeypatch.setattr(url_signer, 'CLOUDFRONT_SIGNING_MODE', 'url')
+    assert url_signer.sign_url('processed/user/1.png') is None